@@ -0,0 +1,450 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+#
+
+import asyncio
+import enum
+from collections import (
+    deque,
+)
+
+__all__ = (
+    'BufferPool',
+    'DatagramQueue',
+    'DropPolicy',
+    'MAX_DATAGRAM_SIZE',
+    'MTU',
+    'RecvRing',
+)
+
+
+#: Default size of send buffers in bytes: Ethernet MTU.
+MTU = 1500
+#: Maximum UDP payload size over IPv4 in bytes.
+MAX_DATAGRAM_SIZE = 65507
+
+
+class BufferPool(object):
+    """Pool of reusable fixed-size buffers for outgoing datagrams.
+
+    Buffers are handed out by :meth:`acquire` and must be returned back
+    with :meth:`release` once the data is sent. Up to `maxsize` released
+    buffers are kept for reuse, the rest are left for garbage collector.
+
+    :param int buffer_size: Size of each buffer in bytes
+    :param int maxsize: Maximum number of idle buffers kept in the pool
+    """
+
+    def __init__(self, buffer_size=MTU, maxsize=64):
+        if buffer_size <= 0:
+            raise ValueError('buffer size must be positive')
+        if maxsize < 0:
+            raise ValueError('maxsize must not be negative')
+        self._buffer_size = buffer_size
+        self._maxsize = maxsize
+        self._buffers = []
+        # Acquired buffers by id, so a buffer cannot be released twice
+        self._acquired = {}
+        self._hits = 0
+        self._misses = 0
+        self._high_water = 0
+
+    def __len__(self):
+        return len(self._buffers)
+
+    def __repr__(self):
+        return '<{} size={} idle={} in_use={} hits={} misses={}>'.format(
+            self.__class__.__name__, self._buffer_size, len(self._buffers),
+            len(self._acquired), self._hits, self._misses)
+
+    @property
+    def buffer_size(self):
+        """Size of the pool buffers in bytes."""
+        return self._buffer_size
+
+    @property
+    def maxsize(self):
+        """Maximum number of idle buffers kept in the pool."""
+        return self._maxsize
+
+    @property
+    def in_use(self):
+        """Number of acquired and not yet released buffers."""
+        return len(self._acquired)
+
+    @property
+    def hits(self):
+        """Number of acquires served by a reused buffer."""
+        return self._hits
+
+    @property
+    def misses(self):
+        """Number of acquires that had to allocate a new buffer."""
+        return self._misses
+
+    @property
+    def high_water(self):
+        """The highest number of buffers that were in use at once."""
+        return self._high_water
+
+    def acquire(self):
+        """Returns a buffer from the pool or allocates a new one.
+
+        :rtype: bytearray
+        """
+        if self._buffers:
+            buffer = self._buffers.pop()
+            self._hits += 1
+        else:
+            buffer = bytearray(self._buffer_size)
+            self._misses += 1
+        self._acquired[id(buffer)] = buffer
+        if len(self._acquired) > self._high_water:
+            self._high_water = len(self._acquired)
+        return buffer
+
+    def release(self, buffer):
+        """Returns the buffer back to the pool.
+
+        :param bytearray buffer: Buffer received from :meth:`acquire`
+        :raises ValueError: If the buffer is not acquired from the pool or
+                            is already released
+        """
+        if self._acquired.pop(id(buffer), None) is not buffer:
+            raise ValueError('buffer is not acquired from the pool')
+        if len(self._buffers) < self._maxsize:
+            self._buffers.append(buffer)
+
+
+class RecvRing(object):
+    """Preallocated ring of receive buffer slots.
+
+    Slots are handed out in rotation by :meth:`next_slot`, so a slot gets
+    overwritten once all the other slots were used. Data received into
+    a slot must be consumed or copied before that.
+
+    :param int slots: Number of slots
+    :param int slot_size: Size of each slot in bytes
+    """
+    __slots__ = ('_buffer', '_index', '_slots')
+
+    def __init__(self, slots, slot_size=MAX_DATAGRAM_SIZE):
+        if slots <= 0:
+            raise ValueError('number of slots must be positive')
+        if slot_size <= 0:
+            raise ValueError('slot size must be positive')
+        self._buffer = bytearray(slots * slot_size)
+        view = memoryview(self._buffer)
+        self._slots = [view[offset:offset + slot_size]
+                       for offset in range(0, len(view), slot_size)]
+        self._index = 0
+
+    def __len__(self):
+        return len(self._slots)
+
+    @property
+    def slot_size(self):
+        """Size of each slot in bytes."""
+        return len(self._slots[0])
+
+    def next_slot(self):
+        """Returns the next slot of the ring.
+
+        :rtype: memoryview
+        """
+        index = self._index
+        self._index = (index + 1) % len(self._slots)
+        return self._slots[index]
+
+    def detach(self, data):
+        """Returns data which stays valid once its slot is overwritten.
+        Data received into a slot of the ring is copied, any other data is
+        returned as is.
+
+        :param data: Received data
+        :returns: :class:`bytes` copy of the slot data or `data` itself
+        """
+        if isinstance(data, memoryview) and data.obj is self._buffer:
+            return bytes(data)
+        return data
+
+
+class DropPolicy(enum.Enum):
+    """Policy of :class:`DatagramQueue` to follow when it is full."""
+    #: Drop the oldest queued datagram to make room for the new one
+    oldest = 'oldest'
+    #: Drop the received datagram
+    newest = 'newest'
+    #: Drop the oldest datagram of the source which holds the most of
+    #: the queue, so a single chatty peer cannot starve the others
+    fair = 'fair'
+
+
+class DatagramQueue(object):
+    """Bounded FIFO queue of received ``(data, address)`` pairs.
+
+    Unlike :class:`asyncio.Queue` it never blocks the producer: when the
+    queue is full, a datagram is dropped according to the drop policy.
+    Only a single consumer coroutine may wait for datagrams at a time.
+
+    :param int maxsize: Maximum number of queued datagrams, ``0`` means
+                        no limit
+    :param DropPolicy drop_policy: What to drop when the queue is full
+    """
+
+    def __init__(self, maxsize=0, drop_policy=DropPolicy.oldest, *,
+                 loop=None):
+        if maxsize < 0:
+            raise ValueError('maxsize must not be negative')
+        if loop is None:
+            loop = asyncio.get_event_loop()
+        self._items = deque()
+        self._maxsize = maxsize
+        self._drop_policy = DropPolicy(drop_policy)
+        self._fair = self._drop_policy is DropPolicy.fair
+        self._loop = loop
+        self._waiter = None
+        self._dropped = 0
+        self._high_water = 0
+        # The fair drop policy keeps queued datagrams per source, while
+        # _items holds their sources in the arrival order. Sources of the
+        # evicted datagrams are left there as tombstones and skipped on get
+        self._sources = {}
+        self._skip = {}
+        self._tombstones = 0
+        self._size = 0
+        # Sources by the number of their queued datagrams
+        self._counts = {}
+        self._heaviest = 0
+
+    def __len__(self):
+        if self._fair:
+            return self._size
+        return len(self._items)
+
+    def __repr__(self):
+        return '<{} depth={} maxsize={} policy={} dropped={}>'.format(
+            self.__class__.__name__, len(self), self._maxsize,
+            self._drop_policy.value, self._dropped)
+
+    @property
+    def maxsize(self):
+        """Maximum number of queued datagrams."""
+        return self._maxsize
+
+    @property
+    def drop_policy(self):
+        """Drop policy of the full queue."""
+        return self._drop_policy
+
+    @property
+    def dropped(self):
+        """Number of dropped datagrams."""
+        return self._dropped
+
+    @property
+    def high_water(self):
+        """The highest number of datagrams that were queued at once."""
+        return self._high_water
+
+    def empty(self):
+        """Returns :const:`True` if the queue is empty."""
+        return not len(self)
+
+    def full(self):
+        """Returns :const:`True` if the queue has reached its limit."""
+        return 0 < self._maxsize <= len(self)
+
+    def put_nowait(self, item):
+        """Puts ``(data, address)`` pair into the queue.
+
+        :param tuple item: Received data and source address
+        :returns: :const:`False` if the item was dropped
+        :rtype: bool
+        """
+        if self._fair:
+            return self._put_fair(item)
+        items = self._items
+        if 0 < self._maxsize <= len(items):
+            self._dropped += 1
+            if self._drop_policy is DropPolicy.newest:
+                return False
+            items.popleft()
+        items.append(item)
+        if len(items) > self._high_water:
+            self._high_water = len(items)
+        self._wakeup()
+        return True
+
+    def get_nowait(self):
+        """Removes and returns the oldest ``(data, address)`` pair.
+
+        :raises asyncio.QueueEmpty: If the queue is empty
+        """
+        if self._fair:
+            if not self._size:
+                raise asyncio.QueueEmpty
+            return self._get_fair()
+        if not self._items:
+            raise asyncio.QueueEmpty
+        return self._items.popleft()
+
+    async def get(self):
+        """Removes and returns the oldest ``(data, address)`` pair waiting
+        for it if the queue is empty.
+
+        This method is :term:`awaitable`.
+        """
+        while self.empty():
+            await self._wait()
+        return self.get_nowait()
+
+    async def get_many(self, max_count, timeout=None):
+        """Removes and returns up to `max_count` oldest ``(data, address)``
+        pairs at once. If the queue is empty, waits for the first one no
+        longer than `timeout` seconds.
+
+        :param int max_count: Maximum number of returned items
+        :param float timeout: Seconds to wait for, :const:`None` means
+                              no limit
+        :returns: List of items, empty one on timeout
+        :rtype: list
+
+        This method is :term:`awaitable`.
+        """
+        if max_count < 1:
+            raise ValueError('max_count must be positive')
+        if self.empty():
+            if timeout is None:
+                while self.empty():
+                    await self._wait()
+            elif timeout > 0:
+                handle = self._loop.call_later(timeout, self._wakeup)
+                try:
+                    await self._wait()
+                finally:
+                    handle.cancel()
+        count = min(max_count, len(self))
+        if self._fair:
+            get = self._get_fair
+            return [get() for _ in range(count)]
+        popleft = self._items.popleft
+        return [popleft() for _ in range(count)]
+
+    async def _wait(self):
+        if self._waiter is not None:
+            raise RuntimeError('another coroutine is already waiting'
+                               ' for the queue')
+        self._waiter = asyncio.Future(loop=self._loop)
+        try:
+            await self._waiter
+        finally:
+            self._waiter = None
+
+    def _wakeup(self):
+        waiter = self._waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    def _put_fair(self, item):
+        source = item[1]
+        if 0 < self._maxsize <= self._size:
+            self._dropped += 1
+            if not self._evict_fair(source):
+                return False
+        queue = self._sources.get(source)
+        if queue is None:
+            queue = self._sources[source] = deque()
+        queue.append(item)
+        self._items.append(source)
+        self._size += 1
+        self._recount(source, len(queue) - 1, len(queue))
+        if self._size > self._high_water:
+            self._high_water = self._size
+        self._wakeup()
+        return True
+
+    def _get_fair(self):
+        popleft = self._items.popleft
+        skip = self._skip
+        while True:
+            source = popleft()
+            if source in skip:
+                # Tombstone of the evicted datagram
+                self._untombstone(source)
+                continue
+            return self._pop_source(source)
+
+    def _evict_fair(self, source):
+        queue = self._sources.get(source)
+        heaviest = self._heaviest
+        if queue is not None and len(queue) >= heaviest:
+            # The source of the new datagram already has the largest share
+            return False
+        victim = next(iter(self._counts[heaviest]))
+        # Evicted datagram is the oldest one of its source, so all the
+        # tombstones of the source precede its queued datagrams
+        self._pop_source(victim)
+        self._skip[victim] = self._skip.get(victim, 0) + 1
+        self._tombstones += 1
+        if self._tombstones > self._size:
+            self._compact()
+        return True
+
+    def _pop_source(self, source):
+        queue = self._sources[source]
+        item = queue.popleft()
+        if not queue:
+            del self._sources[source]
+        self._size -= 1
+        self._recount(source, len(queue) + 1, len(queue))
+        return item
+
+    def _untombstone(self, source):
+        count = self._skip[source] - 1
+        if count:
+            self._skip[source] = count
+        else:
+            del self._skip[source]
+        self._tombstones -= 1
+
+    def _compact(self):
+        # Keeps the memory bounded when the consumer doesn't keep up
+        skip = self._skip
+        items = deque()
+        append = items.append
+        for source in self._items:
+            if source in skip:
+                self._untombstone(source)
+            else:
+                append(source)
+        self._items = items
+
+    def _recount(self, source, old, new):
+        counts = self._counts
+        if old:
+            bucket = counts[old]
+            bucket.discard(source)
+            if not bucket:
+                del counts[old]
+        if new:
+            bucket = counts.get(new)
+            if bucket is None:
+                bucket = counts[new] = set()
+            bucket.add(source)
+        if new > self._heaviest:
+            self._heaviest = new
+        elif old == self._heaviest and old not in counts:
+            # Counts change by one, so the source is the heaviest still
+            self._heaviest = new
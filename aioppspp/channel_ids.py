@@ -14,7 +14,9 @@
 #
 
 import os
+import struct
 
+from . import validation
 from .constants import (
     DWORD,
 )
@@ -23,7 +25,9 @@ __all__ = (
     'ChannelID',
     'ZeroChannelID',
     'decode',
+    'decode_from',
     'encode',
+    'encode_into',
     'new',
 )
 
@@ -43,7 +47,20 @@ class ChannelID(bytes):
             raise TypeError('bytes expected, got {!r}'.format(data))
         if len(data) != DWORD:
             raise ValueError('channel id must be 4 bytes sized')
-        return super().__new__(cls, bytes(data))
+        return super().__new__(cls, data)
+
+    @classmethod
+    def _from_trusted(cls, data):
+        """Creates channel ID from the already validated 4 bytes without any
+        checks unless :mod:`strict validation <aioppspp.validation>` mode
+        is enabled.
+
+        :param data: Binary data
+        :rtype: :class:`ChannelID`
+        """
+        if validation.is_strict():
+            return cls(data)
+        return bytes.__new__(cls, data)
 
 
 #: All-zero channel ID is used for handshake procedure. If datagram is sent
@@ -57,6 +74,8 @@ class ChannelID(bytes):
 #:
 ZeroChannelID = ChannelID(b'\x00' * DWORD)
 
+_channel_id_struct = struct.Struct('{}s'.format(DWORD))
+
 
 def decode(data):
     """Decodes channel ID from PPSPP datagram.
@@ -65,8 +84,22 @@ def decode(data):
     :returns: :class:`ChannelID` instance and the remaining data
     :rtype: tuple
     """
-    channel_id, rest = data[:DWORD], data[DWORD:]
-    return ChannelID(channel_id), rest
+    channel_id, offset = decode_from(data)
+    return channel_id, data[offset:]
+
+
+def decode_from(data, offset=0):
+    """Decodes channel ID from PPSPP datagram at the specified offset.
+
+    :param memoryview data: Binary data
+    :param int offset: Position of channel ID within data
+    :returns: :class:`ChannelID` instance and the offset right after it
+    :rtype: tuple
+    """
+    end = offset + DWORD
+    if end > len(data):
+        raise ValueError('channel id must be 4 bytes sized')
+    return ChannelID._from_trusted(data[offset:end]), end
 
 
 def encode(channel_id):
@@ -78,6 +111,22 @@ def encode(channel_id):
     return bytes(ChannelID(channel_id))
 
 
+def encode_into(channel_id, buffer, offset=0):
+    """Encodes channel ID into the buffer at the specified offset.
+
+    :param ChannelID channel_id: Channel ID
+    :param buffer: Writable buffer: :class:`bytearray` or :class:`memoryview`
+    :param int offset: Position within buffer to write channel ID at
+    :returns: Number of written bytes
+    :rtype: int
+    :raises struct.error: If buffer is too small
+    """
+    if not isinstance(channel_id, ChannelID):
+        channel_id = ChannelID(channel_id)
+    _channel_id_struct.pack_into(buffer, offset, channel_id)
+    return DWORD
+
+
 def new():
     """Returns new random channel ID.
 
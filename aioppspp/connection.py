@@ -18,13 +18,23 @@ import ipaddress
 import sys
 import traceback
 import warnings
-from collections import namedtuple
+from collections import (
+    OrderedDict,
+    namedtuple,
+)
+
+from . import validation
 
 __all__ = (
+    'ADDRESS_CACHE_SIZE',
     'Address',
     'Connection',
+    'intern_address',
 )
 
+#: Maximum number of addresses kept by :func:`intern_address`.
+ADDRESS_CACHE_SIZE = 1024
+
 
 class Address(namedtuple('Address', ('ip', 'port'))):
     """Represents Peer address information as IP address (:class:`str`)
@@ -43,6 +53,49 @@ class Address(namedtuple('Address', ('ip', 'port'))):
     def __str__(self):
         return '{}:{}'.format(self.ip, self.port)
 
+    @classmethod
+    def from_sockaddr(cls, sockaddr):
+        """Creates address from the socket address returned by the kernel
+        without any checks unless :mod:`strict validation
+        <aioppspp.validation>` mode is enabled.
+
+        :param tuple sockaddr: ``(host, port)`` pair of AF_INET socket
+                               address or ``(host, port, flowinfo,
+                               scope_id)`` tuple of AF_INET6 one
+        :rtype: :class:`Address`
+        """
+        if validation.is_strict():
+            return cls(*sockaddr[:2])
+        return tuple.__new__(cls, sockaddr[:2])
+
+
+_address_cache = OrderedDict()
+
+
+def intern_address(sockaddr):
+    """Returns :class:`Address` instance for the socket address returned by
+    the kernel.
+
+    Up to :const:`ADDRESS_CACHE_SIZE` recently seen addresses are cached,
+    so datagrams of the same peer share a single address object. The cache
+    is bypassed in :mod:`strict validation <aioppspp.validation>` mode, so
+    addresses cached before it was enabled get validated too.
+
+    :param tuple sockaddr: Socket address
+    :rtype: :class:`Address`
+    """
+    if validation.is_strict():
+        return Address.from_sockaddr(sockaddr)
+    try:
+        address = _address_cache[sockaddr]
+    except KeyError:
+        address = _address_cache[sockaddr] = Address.from_sockaddr(sockaddr)
+        if len(_address_cache) > ADDRESS_CACHE_SIZE:
+            _address_cache.popitem(last=False)
+    else:
+        _address_cache.move_to_end(sockaddr)
+    return address
+
 
 class Connection(object):
     """Connection object is an interface to the underlying protocol
@@ -67,13 +120,17 @@ class Connection(object):
         self._protocol = protocol
 
     def __del__(self):
-        if self.closed:
+        if self._protocol is None:
             return
 
         if self._loop.is_closed():
             return
 
+        lost = self._protocol.closed
         self._connector.close_connection(self)
+        if lost:
+            # Transport was lost, so there is nothing left unclosed
+            return
 
         warnings.warn('Unclosed connection {!r}'.format(self), ResourceWarning)
         context = {'connection': self,
@@ -124,14 +181,19 @@ class Connection(object):
 
     def close(self):
         """Closes connection."""
-        if self.closed:
+        if self._protocol is None:
             return
+        # Connection still counts towards the connector limits if its
+        # transport is lost, so let the connector know anyway
         self._connector.close_connection(self)
         self._protocol = None
 
     def release(self):
-        """Releases connection and returns it back to the pool."""
-        if self.closed:
+        """Releases connection and returns it back to the pool.
+
+        Connection with the lost transport is just closed.
+        """
+        if self._protocol is None:
             return
         self._connector.release_connection(self)
         self._protocol = None
@@ -146,6 +208,23 @@ class Connection(object):
             raise ConnectionError('not connected')
         return await self._protocol.recv()
 
+    async def recv_many(self, max_count, timeout=None):
+        """Receives up to `max_count` incoming data items at once.
+        Returned items are depended on the underlying protocol
+        implementation.
+
+        :param int max_count: Maximum number of items to receive
+        :param float timeout: Seconds to wait for the first item,
+                              :const:`None` means no limit
+        :returns: List of received items, empty one on timeout
+        :rtype: list
+
+        This method is :term:`awaitable`.
+        """
+        if self.closed:
+            raise ConnectionError('not connected')
+        return await self._protocol.recv_many(max_count, timeout)
+
     async def send(self, data, remote_address=None):
         """Sends data to connected peer.
 
@@ -159,3 +238,24 @@ class Connection(object):
         if self.closed:
             raise ConnectionError('not connected')
         return await self._protocol.send(data, remote_address)
+
+    def send_nowait(self, data, remote_address=None):
+        """Sends data to connected peer without waiting for the protocol
+        write flow control.
+
+        Data type is depended on the underlying protocol implementation.
+        """
+        if self.closed:
+            raise ConnectionError('not connected')
+        return self._protocol.send_nowait(data, remote_address)
+
+    async def send_many(self, datagrams, remote_address=None):
+        """Sends a sequence of data to connected peer.
+
+        Data type is depended on the underlying protocol implementation.
+
+        This method is :term:`awaitable`.
+        """
+        if self.closed:
+            raise ConnectionError('not connected')
+        return await self._protocol.send_many(datagrams, remote_address)
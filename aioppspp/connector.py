@@ -18,7 +18,7 @@ import asyncio
 import sys
 import traceback
 import warnings
-from collections import defaultdict
+from collections import OrderedDict, defaultdict, deque
 from itertools import chain
 
 from .connection import (
@@ -29,8 +29,12 @@ from .connection import (
 __all__ = (
     'BaseConnector',
     'BaseProtocol',
+    'BulkConnect',
 )
 
+# Python 3.5.0 and 3.5.1 expect __aiter__ to return an awaitable
+PY_352 = sys.version_info >= (3, 5, 2)
+
 
 class BaseProtocol(asyncio.BaseProtocol, metaclass=abc.ABCMeta):
     """Base protocol interface.
@@ -43,6 +47,8 @@ class BaseProtocol(asyncio.BaseProtocol, metaclass=abc.ABCMeta):
     def __init__(self, *, loop=None):
         self._loop = loop
         self._transport = None
+        self._reset_addresses()
+        self._kernel_dropped = None
 
     @property
     def closed(self):
@@ -51,22 +57,46 @@ class BaseProtocol(asyncio.BaseProtocol, metaclass=abc.ABCMeta):
 
     @property
     def local_address(self):
-        """Returns local peer address or :const:`None` if not connected."""
+        """Returns local peer address or :const:`None` if not connected.
+
+        The address is looked up once per connection and cached.
+        """
         if self._transport is None:
             return None
-        return Address(*self._transport._sock.getsockname()[:2])
+        if self._local_address is ...:
+            sockname = self._transport._sock.getsockname()
+            self._local_address = Address.from_sockaddr(sockname)
+        return self._local_address
 
     @property
     def remote_address(self):
-        """Returns remote peer address or :const:`None` if not connected."""
+        """Returns remote peer address or :const:`None` if not connected.
+
+        The address is looked up once per connection and cached.
+        """
         if self._transport is None:
             return None
-        try:
-            return Address(*self._transport._sock.getpeername()[:2])
-        except OSError:
-            # Transport is in "server" mode and not bounded with any specific
-            # remote peer. No reason to crash then.
-            return None
+        if self._remote_address is ...:
+            try:
+                peername = self._transport._sock.getpeername()
+            except OSError:
+                # Transport is in "server" mode and not bounded with any
+                # specific remote peer. No reason to crash then.
+                self._remote_address = None
+            else:
+                self._remote_address = Address.from_sockaddr(peername)
+        return self._remote_address
+
+    @property
+    def kernel_dropped_count(self):
+        """Returns the number of datagrams dropped by the kernel because of
+        the socket receive buffer overrun or :const:`None` if the protocol
+        doesn't track that.
+
+        Unlike drops of the protocol receive buffer, these ones mean that
+        the event loop doesn't read the socket fast enough.
+        """
+        return self._kernel_dropped
 
     @property
     def transport(self):
@@ -76,12 +106,19 @@ class BaseProtocol(asyncio.BaseProtocol, metaclass=abc.ABCMeta):
     def connection_made(self, transport):
         """Called when a connection is made."""
         self._transport = transport
+        self._reset_addresses()
 
     def connection_lost(self, exc):
         """Called when the connection is lost or closed."""
         self._transport = None
+        self._reset_addresses()
         super().connection_lost(exc)
 
+    def _reset_addresses(self):
+        # Ellipsis marks the address which is not looked up yet
+        self._local_address = ...
+        self._remote_address = ...
+
     @abc.abstractmethod
     async def recv(self):
         """Receives data from remote peer. Must be implemented in subclass.
@@ -90,6 +127,26 @@ class BaseProtocol(asyncio.BaseProtocol, metaclass=abc.ABCMeta):
         """
         raise NotImplementedError
 
+    async def recv_many(self, max_count, timeout=None):
+        """Receives up to `max_count` pieces of data from remote peers
+        at once. Returns empty list if nothing was received in `timeout`
+        seconds.
+
+        Default implementation receives a single piece of data with
+        :meth:`recv`. Subclasses should override it to drain their
+        buffers in one go.
+
+        This method is :term:`awaitable`.
+        """
+        if max_count < 1:
+            raise ValueError('max_count must be positive')
+        try:
+            item = await asyncio.wait_for(self.recv(), timeout,
+                                          loop=self._loop)
+        except asyncio.TimeoutError:
+            return []
+        return [item]
+
     @abc.abstractmethod
     async def send(self, data, remote_address):
         """Sends data to remote peer. Must be implemented in subclass.
@@ -98,10 +155,21 @@ class BaseProtocol(asyncio.BaseProtocol, metaclass=abc.ABCMeta):
         """
         raise NotImplementedError
 
+    async def send_many(self, datagrams, remote_address=None):
+        """Sends a sequence of data to remote peer.
+
+        Default implementation sends them one by one with :meth:`send`.
+
+        This method is :term:`awaitable`.
+        """
+        for data in datagrams:
+            await self.send(data, remote_address)
+
     def close(self):
         """Closes protocol and the underlying transport."""
         self._transport.close()
         self._transport = None
+        self._reset_addresses()
 
 
 class BaseConnector(object, metaclass=abc.ABCMeta):
@@ -110,14 +178,44 @@ class BaseConnector(object, metaclass=abc.ABCMeta):
     Connector is used as connections managers: it spawns them, controls them
     and kills them when time has come.
 
+    The number of simultaneously acquired connections may be limited in
+    total and per key, which is the remote address for outgoing connections
+    and the local one for incoming. Once a limit is reached, further
+    acquirers wait in FIFO order till some connection is released or
+    closed. Waiting counts towards the connection timeout.
+
+    Released connections are kept open in the pool for reuse. The most
+    recently released endpoint of the key is reused first, so the rest age
+    out: endpoints which stay idle longer than the keepalive timeout are
+    closed and, when there are more idle endpoints than allowed, the oldest
+    of them are closed first.
+
     This is an :term:`abstract base class`.
+
+    :param float connection_timeout: Seconds to wait for a connection,
+                                     :const:`None` means no limit
+    :param int limit: Maximum number of acquired connections,
+                      :const:`None` means no limit
+    :param int limit_per_key: Maximum number of acquired connections with
+                              the same key, :const:`None` means no limit
+    :param float keepalive_timeout: Seconds to keep idle endpoints open,
+                                    :const:`None` means forever
+    :param int idle_limit: Maximum number of idle endpoints in the pool,
+                           :const:`None` means no limit
     """
     _closed = True
     _source_traceback = None
     connection_class = Connection
 
     def __init__(self, *, connection_class=None, connection_timeout=None,
-                 loop=None):
+                 limit=None, limit_per_key=None, keepalive_timeout=None,
+                 idle_limit=None, loop=None):
+        if limit is not None and limit <= 0:
+            raise ValueError('limit must be positive')
+        if limit_per_key is not None and limit_per_key <= 0:
+            raise ValueError('limit_per_key must be positive')
+        if idle_limit is not None and idle_limit < 0:
+            raise ValueError('idle_limit must not be negative')
         if loop is None:
             loop = asyncio.get_event_loop()
         if loop.get_debug():  # pragma: no cover
@@ -131,6 +229,17 @@ class BaseConnector(object, metaclass=abc.ABCMeta):
         self._loop = loop
         self._pool = {}
         self._connection_timeout = connection_timeout
+        self._limit = limit
+        self._limit_per_key = limit_per_key
+        # Connections acquired or being connected, in total and per key
+        self._slots = defaultdict(int)
+        self._slots_total = 0
+        self._waiters = deque()
+        self._keepalive_timeout = keepalive_timeout
+        self._idle_limit = idle_limit
+        # Idle endpoints in release order: protocol -> (key, released at)
+        self._idle = OrderedDict()
+        self._reaper = None
 
     def __del__(self):
         if self.closed:
@@ -159,6 +268,32 @@ class BaseConnector(object, metaclass=abc.ABCMeta):
     def loop(self):
         return self._loop
 
+    @property
+    def limit(self):
+        """Returns the limit of acquired connections."""
+        return self._limit
+
+    @property
+    def limit_per_key(self):
+        """Returns the limit of acquired connections per key."""
+        return self._limit_per_key
+
+    @property
+    def keepalive_timeout(self):
+        """Returns the number of seconds idle endpoints are kept open."""
+        return self._keepalive_timeout
+
+    @property
+    def idle_count(self):
+        """Returns the number of idle endpoints in the pool."""
+        return len(self._idle)
+
+    @property
+    def waiting_count(self):
+        """Returns the number of acquirers waiting for a free connection
+        slot."""
+        return sum(1 for _, waiter in self._waiters if not waiter.done())
+
     @abc.abstractmethod
     async def create_endpoint(self, *args, **kwargs):
         """This method must be implemented in subclass in order to create
@@ -179,6 +314,30 @@ class BaseConnector(object, metaclass=abc.ABCMeta):
         return await self._connect(remote_address,
                                    remote_address=remote_address, **kwargs)
 
+    def connect_many(self, addresses, *, concurrency=10, timeout=None,
+                     **kwargs):
+        """Connects to many remote peers in parallel.
+
+        Returns an :term:`asynchronous iterator` which yields connections
+        in order of completion, making no more than `concurrency` connects
+        at a time. Failed connects don't stop the others and are collected
+        in :attr:`BulkConnect.failures`::
+
+            bulk = connector.connect_many(peers, concurrency=50, timeout=1)
+            async for connection in bulk:
+                ...
+            for address, exc in bulk.failures:
+                ...
+
+        :param addresses: Iterable of remote peer addresses
+        :param int concurrency: Maximum number of simultaneous connects
+        :param float timeout: Seconds to wait for each connect, connector
+                              timeout by default
+        :rtype: :class:`BulkConnect`
+        """
+        return BulkConnect(self, addresses, concurrency=concurrency,
+                           timeout=timeout, **kwargs)
+
     async def listen(self, local_address, **kwargs):
         """Creates a new connection instance for incoming connections
         to the specified host and port pair.
@@ -197,6 +356,10 @@ class BaseConnector(object, metaclass=abc.ABCMeta):
             return
 
         try:
+            # Fail the waiters first, so slots freed by the connections
+            # closed below are not handed over to them
+            self._fail_waiters()
+
             if self._loop.is_closed():
                 return
 
@@ -211,8 +374,21 @@ class BaseConnector(object, metaclass=abc.ABCMeta):
         finally:
             self._pool.clear()
             self._acquired.clear()
+            self._idle.clear()
+            if self._reaper is not None:
+                self._reaper.cancel()
+                self._reaper = None
+            self._slots.clear()
+            self._slots_total = 0
+            self._fail_waiters()
             self._closed = True
 
+    def _fail_waiters(self):
+        while self._waiters:
+            _, waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_exception(ConnectionError('Connector is closed'))
+
     def close_connection(self, connection):
         """Closes the specified connection.
 
@@ -230,8 +406,11 @@ class BaseConnector(object, metaclass=abc.ABCMeta):
             # this may be result of undetermined order of objects
             # finalization due garbage collection.
             pass
+        else:
+            self._release_slot(key)
         finally:
-            connection.protocol.close()
+            if not connection.protocol.closed:
+                connection.protocol.close()
 
     def release_connection(self, connection):
         """Releases the connection and returns it back to the pool.
@@ -250,25 +429,49 @@ class BaseConnector(object, metaclass=abc.ABCMeta):
             # this may be result of undetermined order of objects
             # finalization due garbage collection.
             pass
+        else:
+            self._release_slot(key)
         finally:
-            protocols = self._pool.get(key, None)
-            if protocols is None:
-                protocols = self._pool[key] = []
-            protocols.append(connection.protocol)
+            if not connection.protocol.closed:
+                self._put_idle(key, connection.protocol)
+
+    def _put_idle(self, key, protocol):
+        protocols = self._pool.get(key, None)
+        if protocols is None:
+            protocols = self._pool[key] = deque()
+        protocols.append(protocol)
+        self._idle[protocol] = (key, self._loop.time())
+        self._evict_idle()
+        if self._keepalive_timeout is not None and self._reaper is None:
+            self._reaper = self._loop.call_later(
+                self._keepalive_timeout, self._reap_idle)
 
     async def _connect(self, key, **connection_kwargs):
+        deadline = None
+        if self._connection_timeout:
+            deadline = self._loop.time() + self._connection_timeout
         try:
-            connection = self._get_connection(key)
-            if connection is None:
-                connect_future = self.create_endpoint(**connection_kwargs)
-                if self._connection_timeout:
-                    connect_future = asyncio.wait_for(
-                        connect_future,
-                        self._connection_timeout,
-                        loop=self._loop)
-
-                protocol = await connect_future
+            await self._acquire_slot(key, deadline)
+            try:
+                if self.closed:
+                    raise ConnectionError('Connector is closed')
+                protocol = self._get_protocol(key)
+                if protocol is None:
+                    endpoint = self.create_endpoint(**connection_kwargs)
+                    if deadline is not None:
+                        endpoint = asyncio.wait_for(
+                            endpoint,
+                            max(0, deadline - self._loop.time()),
+                            loop=self._loop)
+                    protocol = await endpoint
+                    if self.closed:
+                        if not protocol.closed:
+                            protocol.close()
+                        raise ConnectionError('Connector is closed')
                 connection = self._spawn_connection(key, protocol)
+            except BaseException:
+                self._release_slot(key)
+                raise
 
         except asyncio.TimeoutError as exc:
             raise TimeoutError(
@@ -282,15 +485,225 @@ class BaseConnector(object, metaclass=abc.ABCMeta):
             self._acquired[key].add(connection)
             return connection
 
-    def _get_connection(self, key):
+    def _has_slot(self, key):
+        if self._limit is not None and self._slots_total >= self._limit:
+            return False
+        if (self._limit_per_key is not None
+                and self._slots[key] >= self._limit_per_key):
+            return False
+        return True
+
+    def _take_slot(self, key):
+        self._slots[key] += 1
+        self._slots_total += 1
+
+    def _release_slot(self, key):
+        if not self._slots[key]:
+            # Connector was closed meanwhile
+            del self._slots[key]
+            return
+        self._slots[key] -= 1
+        self._slots_total -= 1
+        if not self._slots[key]:
+            del self._slots[key]
+        self._wakeup_waiters()
+
+    def _wakeup_waiters(self):
+        # The freed slot is handed over to the first waiter which fits the
+        # limits, so newcomers cannot steal it before the waiter wakes up
+        for item in list(self._waiters):
+            key, waiter = item
+            if waiter.done():
+                # Cancelled or timed out
+                self._waiters.remove(item)
+                continue
+            if self._limit is not None and self._slots_total >= self._limit:
+                break
+            if self._has_slot(key):
+                self._waiters.remove(item)
+                self._take_slot(key)
+                waiter.set_result(None)
+
+    async def _acquire_slot(self, key, deadline=None):
+        if self._has_slot(key):
+            self._take_slot(key)
+            return
+        waiter = asyncio.Future(loop=self._loop)
+        self._waiters.append((key, waiter))
+        timeout = None
+        if deadline is not None:
+            timeout = max(0, deadline - self._loop.time())
+        try:
+            await asyncio.wait_for(waiter, timeout, loop=self._loop)
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                if waiter.exception() is None:
+                    # The slot was handed over right before the timeout
+                    self._release_slot(key)
+            else:
+                try:
+                    self._waiters.remove((key, waiter))
+                except ValueError:
+                    pass
+            raise
+
+    def _get_protocol(self, key):
         protocols = self._pool.get(key)
         while protocols:
             protocol = protocols.pop()
             if not protocols:
                 # The very last connection was reclaimed: drop the key
                 del self._pool[key]
-            return self._spawn_connection(key, protocol)
+            self._idle.pop(protocol, None)
+            return protocol
         assert key not in self._pool  # TODO: guard possible issue
 
+    def _evict_idle(self):
+        if self._idle_limit is None:
+            return
+        while len(self._idle) > self._idle_limit:
+            self._close_oldest_idle()
+
+    def _reap_idle(self):
+        self._reaper = None
+        deadline = self._loop.time() - self._keepalive_timeout
+        while self._idle:
+            _, released_at = next(iter(self._idle.values()))
+            if released_at > deadline:
+                # Wake up again when the oldest endpoint expires
+                self._reaper = self._loop.call_at(
+                    released_at + self._keepalive_timeout, self._reap_idle)
+                break
+            self._close_oldest_idle()
+
+    def _close_oldest_idle(self):
+        protocol, (key, _) = self._idle.popitem(last=False)
+        protocols = self._pool[key]
+        # Endpoints of the key are ordered by release time as well, so the
+        # globally oldest one is the oldest of its key
+        assert protocols[0] is protocol
+        protocols.popleft()
+        if not protocols:
+            del self._pool[key]
+        if not protocol.closed:
+            protocol.close()
+
     def _spawn_connection(self, key, protocol):
         return self.connection_class(self, key, protocol, loop=self._loop)
+
+
+class BulkConnect(object):
+    """Asynchronous iterator of connections made by
+    :meth:`BaseConnector.connect_many`.
+
+    Connects start on the first iteration. Connections which are made but
+    not yielded yet and pending connects are closed by :meth:`close`, so
+    call it if the iteration is stopped early.
+
+    :param BaseConnector connector: Connector to connect with
+    :param addresses: Iterable of remote peer addresses
+    :param int concurrency: Maximum number of simultaneous connects
+    :param float timeout: Seconds to wait for each connect, connector
+                          timeout by default
+    """
+
+    def __init__(self, connector, addresses, *, concurrency=10, timeout=None,
+                 **kwargs):
+        if concurrency <= 0:
+            raise ValueError('concurrency must be positive')
+        self._connector = connector
+        self._loop = connector.loop
+        self._addresses = iter(addresses)
+        self._concurrency = concurrency
+        self._timeout = timeout
+        self._kwargs = kwargs
+        self._pending = {}
+        self._ready = deque()
+        self._failures = []
+        self._times = []
+        self._started_at = None
+        self._closed = False
+
+    if PY_352:
+        def __aiter__(self):
+            return self
+    else:  # pragma: no cover
+        async def __aiter__(self):
+            return self
+
+    async def __anext__(self):
+        if self._started_at is None:
+            self._started_at = self._loop.time()
+        while not self._ready:
+            self._start_connects()
+            if not self._pending:
+                raise StopAsyncIteration
+            done, _ = await asyncio.wait(self._pending, loop=self._loop,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                address = self._pending.pop(task)
+                if task.cancelled():
+                    continue
+                exc = task.exception()
+                if exc is not None:
+                    self._failures.append((address, exc))
+                else:
+                    self._ready.append(task.result())
+        self._times.append(self._loop.time() - self._started_at)
+        return self._ready.popleft()
+
+    @property
+    def failures(self):
+        """Returns list of ``(address, exception)`` pairs of the failed
+        connects."""
+        return self._failures
+
+    @property
+    def pending(self):
+        """Returns the number of connects in progress."""
+        return sum(1 for task in self._pending if not task.done())
+
+    @property
+    def times(self):
+        """Returns list of seconds since the start of iteration till each
+        connection was yielded, so ``times[n - 1]`` is the time to the
+        first `n` peers."""
+        return self._times
+
+    def close(self):
+        """Stops connecting and closes connections which are not yielded
+        yet."""
+        self._closed = True
+        for task in self._pending:
+            task.cancel()
+            task.add_done_callback(_close_connection)
+        self._pending.clear()
+        while self._ready:
+            self._ready.popleft().close()
+
+    def _start_connects(self):
+        while not self._closed and len(self._pending) < self._concurrency:
+            try:
+                address = next(self._addresses)
+            except StopIteration:
+                break
+            task = asyncio.ensure_future(self._connect(address),
+                                         loop=self._loop)
+            self._pending[task] = address
+
+    async def _connect(self, address):
+        attempt = self._connector.connect(address, **self._kwargs)
+        if self._timeout is None:
+            return await attempt
+        try:
+            return await asyncio.wait_for(attempt, self._timeout,
+                                          loop=self._loop)
+        except asyncio.TimeoutError as exc:
+            raise TimeoutError(
+                'Connection timeout to host %s:%s' % address) from exc
+
+
+def _close_connection(task):
+    # Connect may complete right before the cancellation
+    if not task.cancelled() and task.exception() is None:
+        task.result().close()
@@ -19,6 +19,7 @@ from collections import (
 
 from . import channel_ids
 from . import messages
+from . import validation
 from .channel_ids import (
     ChannelID,
 )
@@ -28,8 +29,11 @@ from .messages import (
 
 __all__ = (
     'Datagram',
+    'LazyDatagram',
     'decode',
+    'decode_lazy',
     'encode',
+    'encode_into',
 )
 
 
@@ -48,6 +52,97 @@ class Datagram(namedtuple('Datagram', ('channel_id', 'messages'))):
         assert all(isinstance(message, Message) for message in messages)
         return super().__new__(cls, ChannelID(channel_id), tuple(messages))
 
+    @classmethod
+    def _from_trusted(cls, channel_id, messages):
+        """Creates datagram from the already validated values without any
+        checks unless :mod:`strict validation <aioppspp.validation>` mode
+        is enabled.
+
+        :param ChannelID channel_id: Channel ID
+        :param tuple messages: Tuple of messages
+        :rtype: :class:`Datagram`
+        """
+        if validation.is_strict():
+            return cls(channel_id, messages)
+        return tuple.__new__(cls, (channel_id, messages))
+
+
+class LazyDatagram(object):
+    """Datagram which messages are decoded on demand.
+
+    Channel ID is decoded right away, so the datagram could be routed or
+    dropped without paying for the messages decoding. The messages are
+    decoded on the first access to :attr:`messages` or on iteration and
+    are cached after that. Use :meth:`peek_types` to look at the message
+    types without decoding the messages.
+
+    The datagram keeps a reference to the binary data, so the data must
+    not be modified while messages are not decoded yet.
+
+    :param memoryview data: Binary data
+    """
+    __slots__ = ('_data', '_offset', '_messages', 'channel_id')
+
+    def __init__(self, data):
+        self.channel_id, self._offset = channel_ids.decode_from(data)
+        self._data = data
+        self._messages = None
+
+    def __eq__(self, other):
+        if isinstance(other, (Datagram, LazyDatagram)):
+            if self.channel_id != other.channel_id:
+                return False
+            return self.messages == other.messages
+        return NotImplemented
+
+    __hash__ = None
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    def __len__(self):
+        return len(self.messages)
+
+    def __repr__(self):
+        return '<{} channel_id={!r} decoded={}>'.format(
+            self.__class__.__name__, self.channel_id, self.is_decoded)
+
+    @property
+    def is_decoded(self):
+        """Tells if the messages are already decoded."""
+        return self._messages is not None
+
+    @property
+    def messages(self):
+        """Returns tuple of datagram messages decoding them on first
+        access.
+
+        :raises ValueError: If messages cannot be decoded
+        """
+        if self._messages is None:
+            self._messages, _ = messages.decode_from(self._data, self._offset)
+            self._data = None
+        return self._messages
+
+    def peek_types(self):
+        """Returns iterator over datagram message types.
+
+        If messages are not decoded yet, only the message type bytes are
+        looked at, the message payloads are skipped.
+
+        :returns: Iterator of :class:`aioppspp.messages.MessageType`
+        """
+        if self._messages is not None:
+            return (message.type for message in self._messages)
+        return messages.peek_types(self._data, self._offset)
+
+    def decode(self):
+        """Decodes all the messages and returns regular datagram.
+
+        :rtype: :class:`Datagram`
+        """
+        return Datagram._from_trusted(self.channel_id, self.messages)
+
 
 def decode(data):
     """Decodes bytes into datagram instance.
@@ -55,8 +150,19 @@ def decode(data):
     :param memoryview data: Binary data
     :rtype: :class:`Datagram`
     """
-    channel_id, rest = channel_ids.decode(data)
-    return Datagram(channel_id, messages.decode(rest))
+    channel_id, offset = channel_ids.decode_from(data)
+    payload, _ = messages.decode_from(data, offset)
+    return Datagram._from_trusted(channel_id, payload)
+
+
+def decode_lazy(data):
+    """Decodes bytes into datagram instance which messages are decoded
+    on demand.
+
+    :param memoryview data: Binary data
+    :rtype: :class:`LazyDatagram`
+    """
+    return LazyDatagram(data)
 
 
 def encode(datagram):
@@ -65,7 +171,22 @@ def encode(datagram):
     :param Datagram datagram: Datagram instance
     :rtype: bytes
     """
-    data = bytearray()
-    data.extend(channel_ids.encode(datagram.channel_id))
-    data.extend(messages.encode(datagram.messages))
-    return bytes(data)
+    data = channel_ids.encode(datagram.channel_id)
+    return data + messages.encode(datagram.messages)
+
+
+def encode_into(datagram, buffer, offset=0):
+    """Encodes datagram instance into the buffer at the specified offset.
+
+    This allows to reuse preallocated buffer for sending datagrams.
+
+    :param Datagram datagram: Datagram instance
+    :param buffer: Writable buffer: :class:`bytearray` or :class:`memoryview`
+    :param int offset: Position within buffer to write datagram at
+    :returns: Number of written bytes
+    :rtype: int
+    :raises struct.error: If buffer is too small
+    """
+    size = channel_ids.encode_into(datagram.channel_id, buffer, offset)
+    size += messages.encode_into(datagram.messages, buffer, offset + size)
+    return size
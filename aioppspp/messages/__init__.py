@@ -14,9 +14,7 @@
 #
 
 import abc
-from itertools import (
-    chain,
-)
+import struct
 
 from . import handshake
 from .handshake import (
@@ -24,6 +22,7 @@ from .handshake import (
 )
 from .types import (
     MessageType,
+    MessageTypeSet,
 )
 from ..constants import (
     BYTE,
@@ -32,8 +31,13 @@ from ..constants import (
 __all__ = (
     'Message',
     'MessageType',
+    'MessageTypeSet',
     'decode',
+    'decode_from',
     'encode',
+    'encode_into',
+    'peek_types',
+    'register',
 )
 
 
@@ -60,32 +64,91 @@ class Message(tuple, metaclass=abc.ABCMeta):
 
 Message.register(Handshake)
 
+# Codec tables indexed by message type code. They are filled once by
+# register() calls, so dispatching a message costs a single list lookup.
+_decoders = [None] * 256
+_encoders = [None] * 256
+_encoders_into = [None] * 256
+_skippers = [None] * 256
+_types = [None] * 256
+
+_msgtype_struct = struct.Struct('B')
+
 
 def decode(data, *, handlers=None):
     """Decodes binary data into list of messages.
 
     :param memoryview data: Binary data
-    :param dict handlers: Decode handlers mapping
+    :param dict handlers: Decode handlers mapping. If omitted, the codecs
+                          from the messages registry are used
     :returns: Tuple of :class:`Message`
     :rtype: tuple
     """
+    messages, _ = decode_from(data, handlers=handlers)
+    return messages
+
+
+def decode_from(data, offset=0, *, handlers=None):
+    """Decodes all the messages from the specified offset till the end of
+    binary data.
+
+    :param memoryview data: Binary data
+    :param int offset: Position of the first message within data
+    :param dict handlers: Decode handlers mapping. If omitted, the codecs
+                          from the messages registry are used
+    :returns: Tuple of :class:`Message` and the offset of the data end
+    :rtype: tuple
+    """
     messages = []
-    while data:
-        message, data = decode_message(data, handlers=handlers)
+    end = len(data)
+    while offset < end:
+        message, offset = decode_message(data, offset, handlers=handlers)
         messages.append(message)
-    return tuple(messages)
+    return tuple(messages), offset
+
+
+def decode_message(data, offset=0, *, handlers=None):
+    code = data[offset]
+    if handlers is not None:
+        return handlers[MessageType(code)](data, offset + BYTE)
+    decoder = _decoders[code]
+    if decoder is None:
+        raise ValueError('unknown message type {}'.format(code))
+    return decoder(data, offset + BYTE)
+
 
+def peek_types(data, offset=0):
+    """Iterates over types of the messages from the specified offset till
+    the end of binary data.
 
-def decode_message(data, *, handlers=None):
-    handlers = handlers or decode_message_handlers()
-    return handlers[MessageType(data[0])](data[BYTE:])
+    Messages are skipped without being decoded if their codec provides
+    the skipper, see :func:`register`. Stop the iteration early to avoid
+    looking at the rest of messages at all.
+
+    :param memoryview data: Binary data
+    :param int offset: Position of the first message within data
+    :returns: Iterator of :class:`MessageType`
+    """
+    end = len(data)
+    while offset < end:
+        code = data[offset]
+        msgtype = _types[code]
+        if msgtype is None or _decoders[code] is None:
+            raise ValueError('unknown message type {}'.format(code))
+        yield msgtype
+        skipper = _skippers[code]
+        if skipper is None:
+            _, offset = _decoders[code](data, offset + BYTE)
+        else:
+            offset = skipper(data, offset + BYTE)
 
 
 def encode(messages, *, handlers=None):
     """Encodes list of messages into bytes.
 
     :param tuple messages: List of :class:`Message`
-    :param dict handlers: Encode handlers mapping
+    :param dict handlers: Encode handlers mapping. If omitted, the codecs
+                          from the messages registry are used
     :rtype: bytearray
     """
     data = bytearray()
@@ -95,20 +158,101 @@ def encode(messages, *, handlers=None):
 
 
 def encode_message(message, *, handlers=None):
-    handlers = handlers or encode_message_handlers()
-    return bytearray(chain.from_iterable([
-        [message.type.value],
-        handlers[message.type](message),
-    ]))
+    if handlers is not None:
+        encoder = handlers[message.type]
+    else:
+        encoder = _encoders[message.type]
+        if encoder is None:
+            raise ValueError('unknown message type {}'.format(
+                int(message.type)))
+    data = bytearray((message.type,))
+    data.extend(encoder(message))
+    return data
+
+
+def encode_into(messages, buffer, offset=0):
+    """Encodes list of messages into the buffer at the specified offset.
+
+    :param tuple messages: List of :class:`Message`
+    :param buffer: Writable buffer: :class:`bytearray` or :class:`memoryview`
+    :param int offset: Position within buffer to write messages at
+    :returns: Number of written bytes
+    :rtype: int
+    :raises struct.error: If buffer is too small
+    """
+    start = offset
+    for message in messages:
+        offset += encode_message_into(message, buffer, offset)
+    return offset - start
+
+
+def encode_message_into(message, buffer, offset=0):
+    msgtype = message.type
+    encoder = _encoders_into[msgtype]
+    if encoder is not None:
+        _msgtype_struct.pack_into(buffer, offset, msgtype)
+        return BYTE + encoder(message, buffer, offset + BYTE)
+    encoder = _encoders[msgtype]
+    if encoder is None:
+        raise ValueError('unknown message type {}'.format(int(msgtype)))
+    # Message type has no in-place encoder, so fallback to copy its payload
+    payload = encoder(message)
+    size = BYTE + len(payload)
+    if offset + size > len(buffer):
+        raise struct.error('encode_into requires a buffer of at least'
+                           ' {} bytes'.format(offset + size))
+    _msgtype_struct.pack_into(buffer, offset, msgtype)
+    buffer[offset + BYTE:offset + size] = payload
+    return size
+
+
+def register(msgtype, decoder, encoder, encoder_into=None, skipper=None):
+    """Registers codec functions for the specified message type.
+
+    Registered codecs are used by :func:`decode` and :func:`encode` when no
+    explicit handlers are passed. Registering a codec for the type that
+    already has one replaces it.
+
+    :param MessageType msgtype: Message type
+    :param decoder: Callable that receives binary data and offset of the
+                    message payload (right after the message type byte) and
+                    returns tuple of decoded message and the offset right
+                    after it
+    :param encoder: Callable that receives message instance and returns
+                    its binary payload without the message type byte
+    :param encoder_into: Optional callable that receives message instance,
+                         writable buffer and offset, writes the message
+                         payload without the message type byte there and
+                         returns the number of written bytes. If omitted,
+                         :func:`encode_into` copies the ``encoder`` result
+    :param skipper: Optional callable that receives binary data and offset
+                    of the message payload and returns the offset right
+                    after it without decoding the message. If omitted,
+                    :func:`peek_types` decodes the message to skip it
+    """
+    msgtype = MessageType(msgtype)
+    _decoders[msgtype] = decoder
+    _encoders[msgtype] = encoder
+    _encoders_into[msgtype] = encoder_into
+    _skippers[msgtype] = skipper
 
 
 def decode_message_handlers():
-    return {
-        MessageType.HANDSHAKE: handshake.decode
-    }
+    return {MessageType(code): decoder
+            for code, decoder in enumerate(_decoders)
+            if decoder is not None}
 
 
 def encode_message_handlers():
-    return {
-        MessageType.HANDSHAKE: handshake.encode
-    }
+    return {MessageType(code): encoder
+            for code, encoder in enumerate(_encoders)
+            if encoder is not None}
+
+
+for _msgtype in MessageType:
+    _types[_msgtype] = _msgtype
+del _msgtype
+
+register(MessageType.HANDSHAKE,
+         handshake.decode_from, handshake.encode, handshake.encode_into,
+         handshake.skip_from)
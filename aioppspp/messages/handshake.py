@@ -13,27 +13,34 @@
 # the License.
 #
 
+import struct
 from collections import (
     namedtuple,
 )
-from itertools import (
-    chain,
-)
 
 from . import protocol_options
 from .. import channel_ids
+from .. import validation
 from .protocol_options import (
     ProtocolOptions,
 )
 from .types import (
     MessageType,
 )
+from ..constants import (
+    BYTE,
+    DWORD,
+)
 
 __all__ = (
     'Handshake',
+    'HandshakeTemplate',
     'decode',
+    'decode_from',
     'encode',
+    'encode_into',
     'new',
+    'skip_from',
 )
 
 
@@ -68,6 +75,96 @@ class Handshake(namedtuple('Handshake', (
             protocol_options = ProtocolOptions(**protocol_options)
         return super().__new__(cls, type, source_channel_id, protocol_options)
 
+    @classmethod
+    def _from_trusted(cls, source_channel_id, protocol_options):
+        """Creates HANDSHAKE message from the already validated values
+        without any checks unless :mod:`strict validation
+        <aioppspp.validation>` mode is enabled.
+
+        :param aioppspp.channel_ids.ChannelID source_channel_id:
+            Source channel ID
+        :param ProtocolOptions protocol_options: Protocol options
+        :rtype: :class:`Handshake`
+        """
+        if validation.is_strict():
+            return cls(MessageType.HANDSHAKE,
+                       source_channel_id, protocol_options)
+        return tuple.__new__(cls, (MessageType.HANDSHAKE,
+                                   source_channel_id, protocol_options))
+
+
+class HandshakeTemplate(object):
+    """Pre-encoded HANDSHAKE message for the specific protocol options.
+
+    All the handshakes sent for a swarm carry the same protocol options and
+    differ only by source channel ID. The template keeps the whole message,
+    including the message type byte, encoded once and only patches the
+    source channel ID in for each new peer.
+
+    To produce a handshake datagram, write the destination channel ID first
+    and the template right after it::
+
+        size = channel_ids.encode_into(ZeroChannelID, buffer)
+        size += template.encode_into(channel_id, buffer, size)
+
+    :param ProtocolOptions protocol_options: Protocol options
+    """
+    __slots__ = ('_data', '_protocol_options', '_struct')
+
+    def __init__(self, protocol_options):
+        if not isinstance(protocol_options, ProtocolOptions):
+            protocol_options = ProtocolOptions(**protocol_options)
+        data = bytearray((MessageType.HANDSHAKE,))
+        data.extend(encode(new(channel_ids.ZeroChannelID, protocol_options)))
+        self._data = bytes(data)
+        self._protocol_options = protocol_options
+        self._struct = struct.Struct('{}s'.format(len(data)))
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def protocol_options(self):
+        """Returns protocol options of the template."""
+        return self._protocol_options
+
+    def new(self, source_channel_id):
+        """Creates new Handshake message from the template.
+
+        :param aioppspp.channel_ids.ChannelID source_channel_id:
+            Source channel ID
+        :rtype: :class:`Handshake`
+        """
+        return new(source_channel_id, self._protocol_options)
+
+    def encode(self, source_channel_id):
+        """Encodes HANDSHAKE message with the message type byte.
+
+        :param aioppspp.channel_ids.ChannelID source_channel_id:
+            Source channel ID
+        :rtype: bytearray
+        """
+        data = bytearray(self._data)
+        channel_ids.encode_into(source_channel_id, data, BYTE)
+        return data
+
+    def encode_into(self, source_channel_id, buffer, offset=0):
+        """Encodes HANDSHAKE message with the message type byte into the
+        buffer at the specified offset.
+
+        :param aioppspp.channel_ids.ChannelID source_channel_id:
+            Source channel ID
+        :param buffer: Writable buffer: :class:`bytearray` or
+                       :class:`memoryview`
+        :param int offset: Position within buffer to write message at
+        :returns: Number of written bytes
+        :rtype: int
+        :raises struct.error: If buffer is too small
+        """
+        self._struct.pack_into(buffer, offset, self._data)
+        channel_ids.encode_into(source_channel_id, buffer, offset + BYTE)
+        return self._struct.size
+
 
 def decode(data):
     """Decodes HANDSHAKE message from bytes.
@@ -76,6 +173,19 @@ def decode(data):
     :returns: Tuple of :class:`Handshake` message and the rest of the data
     :rtype: tuple
     """
+    message, offset = decode_from(data)
+    return message, data[offset:]
+
+
+def decode_from(data, offset=0):
+    """Decodes HANDSHAKE message payload at the specified offset.
+
+    :param memoryview data: Binary data
+    :param int offset: Position of the message payload within data
+    :returns: Tuple of :class:`Handshake` message and the offset right
+              after it
+    :rtype: tuple
+    """
     # 8.4.  HANDSHAKE
     #
     # 0                   1                   2                   3
@@ -90,10 +200,9 @@ def decode(data):
     # |                                                               |
     # +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
     #
-    channel_id, rest = channel_ids.decode(data)
-    options, rest = protocol_options.decode(rest)
-    handshake = Handshake(MessageType.HANDSHAKE, channel_id, options)
-    return handshake, rest
+    channel_id, offset = channel_ids.decode_from(data, offset)
+    options, offset = protocol_options.decode_from(data, offset)
+    return Handshake._from_trusted(channel_id, options), offset
 
 
 def encode(message):
@@ -102,10 +211,37 @@ def encode(message):
     :param Handshake message: Handshake message instance
     :rtype: bytearray
     """
-    return bytearray(chain.from_iterable([
-        channel_ids.encode(message.source_channel_id),
-        protocol_options.encode(message.protocol_options)
-    ]))
+    data = bytearray(channel_ids.encode(message.source_channel_id))
+    data.extend(protocol_options.encode(message.protocol_options))
+    return data
+
+
+def encode_into(message, buffer, offset=0):
+    """Encodes HANDSHAKE message into the buffer at the specified offset.
+
+    :param Handshake message: Handshake message instance
+    :param buffer: Writable buffer: :class:`bytearray` or :class:`memoryview`
+    :param int offset: Position within buffer to write message at
+    :returns: Number of written bytes
+    :rtype: int
+    :raises struct.error: If buffer is too small
+    """
+    size = channel_ids.encode_into(message.source_channel_id, buffer, offset)
+    size += protocol_options.encode_into(message.protocol_options,
+                                         buffer, offset + size)
+    return size
+
+
+def skip_from(data, offset=0):
+    """Skips HANDSHAKE message payload at the specified offset without
+    decoding it.
+
+    :param memoryview data: Binary data
+    :param int offset: Position of the message payload within data
+    :returns: Offset right after the message
+    :rtype: int
+    """
+    return protocol_options.skip_from(data, offset + DWORD)
 
 
 def new(source_channel_id, protocol_options):
@@ -14,13 +14,16 @@
 #
 
 import enum
+import functools
+import struct
 from collections import (
     namedtuple,
 )
 
 from .types import (
-    MessageType,
+    MessageTypeSet,
 )
+from .. import validation
 from ..constants import (
     BYTE,
     WORD,
@@ -305,13 +308,13 @@ class ProtocolOptions(namedtuple('ProtocolOptions', (
     def __new__(cls,
                 version: Version=None,
                 minimum_version: Version=None,
-                swarm_identifier: bytes=None,
+                swarm_identifier: (bytes, memoryview)=None,
                 content_integrity_protection_method: CIPM=None,
                 merkle_hash_tree_function: MHTF=None,
                 live_signature_algorithm: LSA=None,
                 chunk_addressing_method: CAM=None,
                 live_discard_window: int=None,
-                supported_messages: set=None,
+                supported_messages: MessageTypeSet=None,
                 chunk_size: int=None):
 
         params = {key: value for key, value in locals().items()
@@ -324,6 +327,10 @@ class ProtocolOptions(namedtuple('ProtocolOptions', (
             typespec = cls.__new__.__annotations__[param]
             if isinstance(value, typespec):
                 continue
+            if isinstance(typespec, tuple):
+                # The first type is the one to cast to, the rest ones are
+                # accepted as is.
+                typespec = typespec[0]
 
             try:
                 params[param] = typespec(value)
@@ -333,27 +340,144 @@ class ProtocolOptions(namedtuple('ProtocolOptions', (
 
         return super().__new__(cls, **params)
 
+    @classmethod
+    def _from_trusted(cls, *values):
+        """Creates protocol options record from the already validated values
+        without any checks unless :mod:`strict validation
+        <aioppspp.validation>` mode is enabled.
+
+        :param values: Option values in the order of their codes
+        :rtype: :class:`ProtocolOptions`
+        """
+        if validation.is_strict():
+            return cls(*values)
+        return tuple.__new__(cls, values)
+
 
 def decode(data):
-    handlers = decode_handlers()
-    offset = 0
-    options = {key.name: None for key in ProtocolOptionsId
-               if key is not ProtocolOptionsId.end_option}
+    """Decodes protocol options from bytes.
+
+    :param memoryview data: Binary data
+    :returns: Tuple of :class:`ProtocolOptions` and the rest of the data
+    :rtype: tuple
+    """
+    options, offset = decode_from(data)
+    return options, data[offset:]
+
+
+def decode_from(data, offset=0):
+    """Decodes protocol options at the specified offset.
+
+    Variable-length options, like swarm identifier, are returned as
+    :class:`memoryview` slices of the data without copying.
+
+    :param memoryview data: Binary data
+    :param int offset: Position of the first option within data
+    :returns: Tuple of :class:`ProtocolOptions` and the offset right after
+              the end option
+    :rtype: tuple
+    """
+    decoders = _decoders
+    options = [None] * len(ProtocolOptions._fields)
     while True:
-        option_id, offset = decode_value(data, offset, BYTE)
-        option = ProtocolOptionsId(option_id[0])
-        if option is ProtocolOptionsId.end_option:
+        option_id, offset = decode_struct(_byte_struct, data, offset)
+        if option_id == ProtocolOptionsId.end_option:
             break
-        if options[option.name] is not None:
-            raise ValueError('duplicate option {!r} provided'.format(option))
-        value, offset = handlers[option](data, offset, options)
-        options[option.name] = value
-    return ProtocolOptions(**options), data[offset:]
+        decoder = decoders[option_id]
+        if decoder is None:
+            raise ValueError('unknown option {}'.format(option_id))
+        if options[option_id] is not None:
+            raise ValueError('duplicate option {!r} provided'
+                             ''.format(ProtocolOptionsId(option_id)))
+        options[option_id], offset = decoder(data, offset, options)
+    return ProtocolOptions._from_trusted(*options), offset
+
+
+def skip_from(data, offset=0):
+    """Skips protocol options at the specified offset without decoding
+    their values.
+
+    :param memoryview data: Binary data
+    :param int offset: Position of the first option within data
+    :returns: Offset right after the end option
+    :rtype: int
+    """
+    method = None
+    while True:
+        option_id, offset = decode_struct(_byte_struct, data, offset)
+        if option_id == ProtocolOptionsId.end_option:
+            break
+        elif option_id == ProtocolOptionsId.swarm_identifier:
+            length, offset = decode_struct(_word_struct, data, offset)
+            offset += length
+        elif option_id == ProtocolOptionsId.supported_messages:
+            length, offset = decode_struct(_byte_struct, data, offset)
+            offset += length
+        elif option_id == ProtocolOptionsId.chunk_addressing_method:
+            method, offset = decode_enum(CAM, _cams, data, offset)
+        elif option_id == ProtocolOptionsId.live_discard_window:
+            if method is None:
+                raise ValueError('chunk addressing method option must precede'
+                                 ' live discard window one')
+            offset += _window_structs[method].size
+        else:
+            size = _option_sizes[option_id]
+            if size is None:
+                raise ValueError('unknown option {}'.format(option_id))
+            offset += size
+    return offset
 
 
 def encode(options):
+    """Encodes protocol options to bytes.
+
+    Encoded options are memoized, see :func:`encode_into` for details.
+
+    :param ProtocolOptions options: Protocol options
+    :rtype: bytearray
+    """
+    data, _ = _encoded(options)
+    return bytearray(data)
+
+
+def encode_into(options, buffer, offset=0):
+    """Encodes protocol options into the buffer at the specified offset.
+
+    Handshakes for a swarm usually carry the same options, so the encoded
+    options are memoized in a bounded cache keyed by the options record and
+    encoding is reduced to a single copy. Swarm identifier views are copied
+    into the cache key, so it never keeps the underlying buffers alive.
+    Options with other unhashable values are encoded every time.
+
+    :param ProtocolOptions options: Protocol options
+    :param buffer: Writable buffer: :class:`bytearray` or :class:`memoryview`
+    :param int offset: Position within buffer to write options at
+    :returns: Number of written bytes
+    :rtype: int
+    :raises struct.error: If buffer is too small
+    """
+    data, packer = _encoded(options)
+    packer.pack_into(buffer, offset, data)
+    return packer.size
+
+
+def _encoded(options):
+    swarm_identifier = options.swarm_identifier
+    if isinstance(swarm_identifier, memoryview):
+        # Decoded options refer to the receive buffer, which the cache must
+        # not hold on to. Writable views are also unhashable.
+        options = options._replace(swarm_identifier=bytes(swarm_identifier))
+    try:
+        return _encode_cached(options)
+    except TypeError:
+        # Unhashable options record, e.g. with a set of supported messages,
+        # can't be cached
+        return _encode(options)
+
+
+def _encode(options):
     data = bytearray()
-    handlers = encode_handlers()
+    handlers = _encode_handlers
     for option_id, value in zip(ProtocolOptionsId, options):
         if value is None:
             continue
@@ -362,7 +486,13 @@ def encode(options):
             data.append(option_id.value)
             data.extend(value)
     data.append(ProtocolOptionsId.end_option.value)
-    return data
+    return bytes(data), struct.Struct('{}s'.format(len(data)))
+
+
+#: Maximum number of memoized encoded protocol options
+ENCODE_CACHE_SIZE = 256
+
+_encode_cached = functools.lru_cache(maxsize=ENCODE_CACHE_SIZE)(_encode)
 
 
 def decode_handlers():
@@ -424,8 +554,7 @@ def decode_version(data, offset, _):
     # |0 0 0 0 0 0 0 0|  Version (8)  |
     # +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
     #
-    value, offset = decode_value(data, offset, BYTE)
-    return Version(value[0]), offset
+    return decode_enum(Version, _versions, data, offset)
 
 
 def encode_version(version, _):
@@ -441,8 +570,7 @@ def decode_minimum_version(data, offset, _):
     # |0 0 0 0 0 0 0 1| Min. Ver. (8) |
     # +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
     #
-    value, offset = decode_value(data, offset, BYTE)
-    return Version(value[0]), offset
+    return decode_enum(Version, _versions, data, offset)
 
 
 def encode_minimum_version(version, _):
@@ -465,10 +593,9 @@ def decode_swarm_id(data, offset, _):
     # Identifier that follows in bytes.  The Length field is 16 bits wide
     # to allow for large public keys as identifiers in live streaming.
     #
-    swarm_id_length, offset = decode_value(data, offset, WORD)
-    swarm_id_length = int.from_bytes(swarm_id_length, 'big')
+    swarm_id_length, offset = decode_struct(_word_struct, data, offset)
     swarm_id, offset = decode_value(data, offset, swarm_id_length)
-    return bytes(swarm_id), offset
+    return swarm_id, offset
 
 
 def encode_swarm_id(swarm_id: bytes, _):
@@ -485,8 +612,7 @@ def decode_content_integrity_protection_method(data, offset, _):
     # |0 0 0 0 0 0 1 1|   CIPM (8)    |
     # +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
     #
-    value, offset = decode_value(data, offset, BYTE)
-    return ContentIntegrityProtectionMethod(value[0]), offset
+    return decode_enum(CIPM, _cipms, data, offset)
 
 
 def encode_content_integrity_protection_method(cipm, _):
@@ -502,8 +628,7 @@ def decode_merkle_hash_tree_function(data, offset, _):
     # |0 0 0 0 0 1 0 0|    MHF (8)    |
     # +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
     #
-    value, offset = decode_value(data, offset, BYTE)
-    return MerkleHashTreeFunction(value[0]), offset
+    return decode_enum(MHTF, _mhtfs, data, offset)
 
 
 def encode_merkle_hash_tree_function(mhtf, _):
@@ -519,8 +644,7 @@ def decode_live_signature_algorithm(data, offset, _):
     # |0 0 0 0 0 1 0 1|    LSA (8)    |
     # +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
     #
-    value, offset = decode_value(data, offset, BYTE)
-    return LiveSignatureAlgorithm(value[0]), offset
+    return decode_enum(LSA, _lsas, data, offset)
 
 
 def encode_live_signature_algorithm(lsa: LSA, _):
@@ -536,8 +660,7 @@ def decode_chunk_addressing_method(data, offset, _):
     # |0 0 0 0 0 1 1 0|    CAM (8)    |
     # +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
     #
-    value, offset = decode_value(data, offset, BYTE)
-    return ChunkAddressingMethod(value[0]), offset
+    return decode_enum(CAM, _cams, data, offset)
 
 
 def encode_chunk_addressing_method(cam, _):
@@ -562,10 +685,11 @@ def decode_live_discard_window(data, offset, options):
     # ~                                                               ~
     # +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
     #
-    method = options[ProtocolOptionsId.chunk_addressing_method.name]
-    window_size = LiveDiscardWindowSize[method.name].value
-    value, offset = decode_value(data, offset, window_size)
-    return int.from_bytes(value, 'big'), offset
+    method = options[ProtocolOptionsId.chunk_addressing_method]
+    if method is None:
+        raise ValueError('chunk addressing method option must precede'
+                         ' live discard window one')
+    return decode_struct(_window_structs[method], data, offset)
 
 
 def encode_live_discard_window(live_discard_window, options):
@@ -597,27 +721,16 @@ def decode_supported_messages(data, offset, _):
     # ~            Supported Messages Bitmap (variable, max 256)      ~
     # +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
     #
-    message_types_length, offset = decode_value(data, offset, BYTE)
-    message_types_length = int.from_bytes(message_types_length, 'big')
-    all_message_types = list(MessageType)
-    supported_messages = set()
-    for n in range(message_types_length):
-        value, offset = decode_value(data, offset, BYTE)
-        value = int.from_bytes(value, 'big')
-        message_types = all_message_types[n * 8: n * 8 + 8]
-        mapping = list(zip(map(int, bin(value)[2:]), message_types))
-        supported_messages |= {msgtype for bit, msgtype in mapping if bit}
-    return supported_messages, offset
+    bitmap_length, offset = decode_struct(_byte_struct, data, offset)
+    bitmap, offset = decode_value(data, offset, bitmap_length)
+    return MessageTypeSet.from_bytes(bitmap), offset
 
 
 def encode_supported_messages(messages, _):
-    mask = [1 if msgtype in messages else 0 for msgtype in MessageType]
-    fits = len(mask) % 8 == 0
-    mask += [0] * (0 if fits else 8 - len(mask) % 8)
-    supported_messages = int(''.join(map(str, mask)), 2)
-    supported_messages = supported_messages.to_bytes(len(mask) // 8, 'big')
-    supported_messages_length = len(supported_messages).to_bytes(BYTE, 'big')
-    return supported_messages_length + supported_messages
+    if not isinstance(messages, MessageTypeSet):
+        messages = MessageTypeSet(messages)
+    bitmap = messages.to_bytes()
+    return len(bitmap).to_bytes(BYTE, 'big') + bitmap
 
 
 def decode_chunk_size(data, offset, _):
@@ -635,17 +748,93 @@ def decode_chunk_size(data, offset, _):
     # ~               |
     # +-+-+-+-+-+-+-+-+
     #
-    value, offset = decode_value(data, offset, DWORD)
-    return int.from_bytes(value, 'big'), offset
+    return decode_struct(_dword_struct, data, offset)
 
 
 def encode_chunk_size(chunk_size, _):
     return chunk_size.to_bytes(DWORD, 'big')
 
 
+def decode_struct(fmt, data, offset):
+    """Decodes single value of the specified binary format.
+
+    :param struct.Struct fmt: Value format
+    :param memoryview data: Binary data
+    :param int offset: Position of the value within data
+    :returns: Decoded value and the offset right after it
+    :rtype: tuple
+    """
+    try:
+        value, = fmt.unpack_from(data, offset)
+    except struct.error:
+        raise ValueError('Expected read {} bytes, got only {}'
+                         ''.format(fmt.size, max(len(data) - offset, 0)))
+    return value, offset + fmt.size
+
+
+def decode_enum(enum, table, data, offset):
+    """Decodes single byte enumeration value.
+
+    :param enum: Enumeration class
+    :param list table: Enumeration members indexed by their values
+    :param memoryview data: Binary data
+    :param int offset: Position of the value within data
+    :returns: Enumeration member and the offset right after it
+    :rtype: tuple
+    """
+    value, offset = decode_struct(_byte_struct, data, offset)
+    member = table[value]
+    if member is None:
+        raise ValueError('{} is not a valid {}'.format(value, enum.__name__))
+    return member, offset
+
+
+def enum_table(enum):
+    table = [None] * 256
+    for member in enum:
+        table[member.value] = member
+    return table
+
+
 def decode_value(data, offset, length):
     value = data[offset:offset + length]
     if len(value) != length:
         raise ValueError('Expected read {} bytes, got only {}'
                          ''.format(length, len(value)))
     return value, offset + length
+
+
+_encode_handlers = encode_handlers()
+
+_byte_struct = struct.Struct('>B')
+_word_struct = struct.Struct('>H')
+_dword_struct = struct.Struct('>I')
+_qword_struct = struct.Struct('>Q')
+
+# Flat tables indexed by the option code or by the option value byte
+_decoders = [None] * 256
+for _option_id, _decoder in decode_handlers().items():
+    _decoders[_option_id] = _decoder
+del _option_id, _decoder
+
+# Sizes of the fixed-size option values
+_option_sizes = [None] * 256
+for _option_id in (ProtocolOptionsId.version,
+                   ProtocolOptionsId.minimum_version,
+                   ProtocolOptionsId.content_integrity_protection_method,
+                   ProtocolOptionsId.merkle_hash_tree_function,
+                   ProtocolOptionsId.live_signature_algorithm):
+    _option_sizes[_option_id] = BYTE
+_option_sizes[ProtocolOptionsId.chunk_size] = DWORD
+del _option_id
+
+_versions = enum_table(Version)
+_cipms = enum_table(CIPM)
+_mhtfs = enum_table(MHTF)
+_lsas = enum_table(LSA)
+_cams = enum_table(CAM)
+_window_structs = {
+    method: {DWORD: _dword_struct, QWORD: _qword_struct}[
+        LiveDiscardWindowSize[method.name]]
+    for method in CAM
+}
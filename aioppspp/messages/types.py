@@ -14,9 +14,13 @@
 #
 
 import enum
+from collections.abc import (
+    Set,
+)
 
 __all__ = (
     'MessageType',
+    'MessageTypeSet',
 )
 
 
@@ -41,3 +45,125 @@ class MessageType(enum.IntEnum):
     UNCHOKE = 11
     PEX_RESv6 = 12
     PEX_REScert = 13
+
+
+class MessageTypeSet(Set):
+    """Immutable set of message types backed by an integer bitmask, where
+    bit N is set when message type with code N is included.
+
+    Membership test, intersection, union and difference are plain integer
+    operations, so checking whether peer supports some message is cheap.
+
+    Instances are compared equal to regular sets of the same message types.
+
+    .. seealso:
+
+        - :rfc:`7574#section-7.10`
+    """
+    __slots__ = ('_mask', '_hash')
+
+    def __init__(self, message_types=()):
+        mask = 0
+        for msgtype in message_types:
+            mask |= 1 << MessageType(msgtype)
+        self._mask = mask
+        self._hash = None
+
+    @classmethod
+    def from_mask(cls, mask):
+        """Creates set from the bitmask. Bits of unknown message types
+        are ignored.
+
+        :param int mask: Bitmask
+        :rtype: :class:`MessageTypeSet`
+        """
+        self = cls.__new__(cls)
+        self._mask = mask & _known_mask
+        self._hash = None
+        return self
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Creates set from the compressed bitmap of supported messages.
+
+        :param data: Bitmap bytes, message type 0 is the most significant
+                     bit of the first byte
+        :rtype: :class:`MessageTypeSet`
+        """
+        data = bytes(data).translate(_reversed_bits)
+        return cls.from_mask(int.from_bytes(data, 'little'))
+
+    @property
+    def mask(self):
+        """Returns the bitmask."""
+        return self._mask
+
+    def to_bytes(self):
+        """Returns compressed bitmap of the message types, truncated to
+        the last non-zero byte.
+
+        :rtype: bytes
+        """
+        mask = self._mask
+        data = mask.to_bytes((mask.bit_length() + 7) // 8, 'little')
+        return data.translate(_reversed_bits)
+
+    def __contains__(self, msgtype):
+        if not isinstance(msgtype, int) or msgtype < 0:
+            return False
+        return bool(self._mask >> msgtype & 1)
+
+    def __iter__(self):
+        mask = self._mask
+        for msgtype in MessageType:
+            if mask >> msgtype & 1:
+                yield msgtype
+
+    def __len__(self):
+        return bin(self._mask).count('1')
+
+    def __bool__(self):
+        return bool(self._mask)
+
+    def __hash__(self):
+        # Must match the hash of the equal frozenset
+        if self._hash is None:
+            self._hash = hash(frozenset(self))
+        return self._hash
+
+    def __eq__(self, other):
+        if isinstance(other, MessageTypeSet):
+            return self._mask == other._mask
+        return super().__eq__(other)
+
+    def __and__(self, other):
+        if isinstance(other, MessageTypeSet):
+            return self.from_mask(self._mask & other._mask)
+        return super().__and__(other)
+
+    def __or__(self, other):
+        if isinstance(other, MessageTypeSet):
+            return self.from_mask(self._mask | other._mask)
+        return super().__or__(other)
+
+    def __sub__(self, other):
+        if isinstance(other, MessageTypeSet):
+            return self.from_mask(self._mask & ~other._mask)
+        return super().__sub__(other)
+
+    def __xor__(self, other):
+        if isinstance(other, MessageTypeSet):
+            return self.from_mask(self._mask ^ other._mask)
+        return super().__xor__(other)
+
+    def __repr__(self):
+        return '{}({{{}}})'.format(self.__class__.__name__,
+                                   ', '.join(msgtype.name for msgtype in self))
+
+
+_known_mask = sum(1 << msgtype for msgtype in MessageType)
+
+# Maps each byte to the one with reversed bits order: the bitmap on the wire
+# starts from the most significant bit, while the mask starts from the least.
+_reversed_bits = bytes(int('{:08b}'.format(value)[::-1], 2)
+                       for value in range(256))
@@ -13,40 +13,263 @@
 # the License.
 #
 
+import asyncio
+import functools
+import struct
+
 from . import datagrams
 from . import udp
+from .buffers import (
+    BufferPool,
+)
+from .connection import (
+    intern_address,
+)
+from .constants import (
+    DWORD,
+)
 
 __all__ = (
     'Connector',
     'Protocol',
+    'as_handler',
 )
 
 
+def as_handler(handler):
+    """Returns datagram handler for the specified callable or queue.
+
+    :param handler: Callable that receives datagram and remote peer address
+                    or :class:`asyncio.Queue` to put such pairs into
+    :rtype: callable
+    """
+    if isinstance(handler, asyncio.Queue):
+        put_nowait = handler.put_nowait
+        return lambda datagram, address: put_nowait((datagram, address))
+    if not callable(handler):
+        raise TypeError('handler must be callable or asyncio.Queue, got {!r}'
+                        ''.format(handler))
+    return handler
+
+
 class Protocol(udp.Protocol):
-    """PPSPP application protocol implementation over UDP."""
+    """PPSPP application protocol implementation over UDP.
+
+    By default all received datagrams are buffered for :meth:`recv`. Once
+    a channel handler is registered with :meth:`register_channel` or the
+    handshake handler is set with :meth:`set_handshake_handler`, received
+    datagrams are demultiplexed by their channel ID: datagrams of the
+    registered channels are passed to the channel handlers, the rest go to
+    the handshake handler. When no handler is found, the datagram is
+    passed to the protocol handler in handler mode or buffered for
+    :meth:`recv` otherwise. Handlers receive decoded datagram and remote
+    peer address. Malformed datagrams are dropped and counted by
+    :attr:`malformed_count` unless they are buffered for :meth:`recv`.
+
+    With the ring reader enabled, datagrams are copied out of the ring
+    slot before they are decoded for handlers, since handlers such as
+    :class:`asyncio.Queue` keep them past the call.
+
+    :param aioppspp.buffers.BufferPool buffer_pool: Pool of buffers to encode
+                                                    outgoing datagrams into
+    :param bool lazy: Receive :class:`aioppspp.datagrams.LazyDatagram`
+                      which messages are decoded on demand
+    """
+
+    def __init__(self, *, buffer_pool=None, lazy=False, **kwargs):
+        super().__init__(**kwargs)
+        if buffer_pool is None:
+            buffer_pool = BufferPool()
+        self._buffer_pool = buffer_pool
+        self._decode = datagrams.decode_lazy if lazy else datagrams.decode
+        self._channels = {}
+        self._handshake_handler = None
+        self._malformed_count = 0
+
+    @property
+    def channels(self):
+        """Returns the number of registered channels."""
+        return len(self._channels)
+
+    @property
+    def malformed_count(self):
+        """Returns the number of dropped malformed datagrams."""
+        return self._malformed_count
+
+    def register_channel(self, channel_id, handler):
+        """Registers handler for datagrams of the specified channel.
+
+        The handler is called with the received datagram and remote peer
+        address right from the event loop callback, so it must not block.
+        An :class:`asyncio.Queue` may be passed instead of a callable, then
+        the ``(datagram, address)`` pairs are put into it.
+
+        :param aioppspp.channel_ids.ChannelID channel_id: Channel ID
+        :param handler: Callable or :class:`asyncio.Queue`
+        :raises ValueError: If the channel is already registered
+        """
+        if channel_id in self._channels:
+            raise ValueError('channel {!r} is already registered'
+                             ''.format(channel_id))
+        self._channels[channel_id] = as_handler(handler)
+
+    def unregister_channel(self, channel_id):
+        """Removes handler of the specified channel if there is any.
+
+        :param aioppspp.channel_ids.ChannelID channel_id: Channel ID
+        """
+        self._channels.pop(channel_id, None)
+
+    def set_handshake_handler(self, handler):
+        """Sets handler for datagrams of the unregistered channels, which
+        are supposed to carry HANDSHAKE messages of the new peers.
+
+        :param handler: Callable, :class:`asyncio.Queue` or :const:`None` to
+                        buffer such datagrams for :meth:`recv`
+        """
+        if handler is not None:
+            handler = as_handler(handler)
+        self._handshake_handler = handler
+
+    def datagram_received(self, data, addr):
+        """Called when some datagram is received."""
+        if self._channels or self._handshake_handler is not None:
+            # Channel ID is a bytes subclass, so the raw prefix is a valid
+            # key. Data may be a memoryview of the writable receive buffer
+            handler = self._channels.get(bytes(data[:DWORD]),
+                                         self._handshake_handler)
+            if handler is None:
+                handler = self._handler
+        else:
+            handler = self._handler
+        if handler is None:
+            self._enqueue(data, addr)
+            return
+        try:
+            datagram = self._decode(memoryview(self._detach(data)))
+        except ValueError:
+            self._malformed_count += 1
+            return
+        handler(datagram, intern_address(addr))
 
     async def recv(self):
         """Receives a datagram from remote peer.
 
-        :rtype: :class:`aioppspp.datagrams.Datagram`
+        :rtype: :class:`aioppspp.datagrams.Datagram` or
+                :class:`aioppspp.datagrams.LazyDatagram` in lazy mode
 
         This method is :term:`awaitable`.
         """
         data, addr = await super().recv()
-        return datagrams.decode(memoryview(data)), addr
+        return self._decode(memoryview(data)), addr
+
+    async def recv_many(self, max_count, timeout=None):
+        """Receives a batch of datagrams from remote peers.
+
+        Malformed datagrams of the batch are dropped and counted by
+        :attr:`malformed_count`, so the batch may contain less datagrams
+        than there were received.
+
+        :param int max_count: Maximum number of datagrams to receive
+        :param float timeout: Seconds to wait for the first datagram,
+                              :const:`None` means no limit
+        :returns: List of pairs of datagram and remote peer address, empty
+                  one on timeout
+        :rtype: list
+
+        This method is :term:`awaitable`.
+        """
+        batch = await super().recv_many(max_count, timeout)
+        decode = self._decode
+        result = []
+        append = result.append
+        for data, addr in batch:
+            try:
+                append((decode(memoryview(data)), addr))
+            except ValueError:
+                self._malformed_count += 1
+        return result
 
     async def send(self, datagram, remote_address=None):
         """Sends a datagram to remote peer.
 
+        Waits for the transport write buffer to drain if writing is paused.
+        The datagram is encoded into a buffer taken from the buffer pool,
+        which is returned back once the data is passed to the transport.
+
         :param aioppspp.datagrams.Datagram datagram: PPSPP datagram
         :param aioppspp.connection.Address remote_address: Remote peer address
 
         This method is :term:`awaitable`.
         """
-        return await super().send(datagrams.encode(datagram), remote_address)
+        await self.drain()
+        self.send_nowait(datagram, remote_address)
+
+    def send_nowait(self, datagram, remote_address=None):
+        """Sends a datagram to remote peer without waiting for the transport
+        write buffer to drain.
+
+        :param aioppspp.datagrams.Datagram datagram: PPSPP datagram
+        :param aioppspp.connection.Address remote_address: Remote peer address
+        """
+        buffer = self._buffer_pool.acquire()
+        try:
+            try:
+                size = datagrams.encode_into(datagram, buffer)
+            except struct.error:
+                # Datagram doesn't fit into the buffer
+                data = datagrams.encode(datagram)
+            else:
+                data = memoryview(buffer)[:size]
+            # Transport copies the data if it cannot send it right away
+            super().send_nowait(data, remote_address)
+        finally:
+            self._buffer_pool.release(buffer)
+
+    async def send_many(self, batch, remote_address=None):
+        """Sends a sequence of datagrams to remote peer.
+
+        :param list batch: PPSPP datagrams
+        :param aioppspp.connection.Address remote_address: Remote peer address
+
+        This method is :term:`awaitable`.
+        """
+        encode = datagrams.encode
+        return await super().send_many([encode(datagram)
+                                        for datagram in batch],
+                                       remote_address)
 
 
 class Connector(udp.Connector):
-    """PPSPP connector that implements application protocol."""
+    """PPSPP connector that implements application protocol.
+
+    :param aioppspp.buffers.BufferPool buffer_pool: Pool of send buffers
+                                                    shared by all the
+                                                    connector endpoints
+    :param bool lazy: Decode messages of received datagrams on demand
+    """
 
     protocol_class = Protocol
+
+    def __init__(self, *, buffer_pool=None, lazy=False, **kwargs):
+        super().__init__(**kwargs)
+        if buffer_pool is None:
+            buffer_pool = BufferPool()
+        self._buffer_pool = buffer_pool
+        self._lazy = lazy
+
+    @property
+    def buffer_pool(self):
+        """Returns the send buffers pool."""
+        return self._buffer_pool
+
+    @property
+    def lazy(self):
+        """Tells if received datagrams are decoded lazily."""
+        return self._lazy
+
+    def protocol_factory(self) -> functools.partial:
+        """Produces factory for protocol implementation."""
+        return functools.partial(super().protocol_factory(),
+                                 buffer_pool=self._buffer_pool,
+                                 lazy=self._lazy)
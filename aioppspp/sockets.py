@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+#
+
+"""Linux specific UDP socket features.
+
+Python :mod:`socket` module doesn't export all of the options used here,
+so their values are taken from the Linux headers.
+"""
+
+import socket
+import struct
+import sys
+from collections import (
+    namedtuple,
+)
+
+__all__ = (
+    'ANCBUFSIZE',
+    'GRO_BUFFER_SIZE',
+    'GSO_MAX_SEGMENTS',
+    'GSO_MAX_SIZE',
+    'IPV6_TCLASS',
+    'SOL_UDP',
+    'SO_BUSY_POLL',
+    'SO_RCVBUFFORCE',
+    'SO_RXQ_OVFL',
+    'SO_SNDBUFFORCE',
+    'SocketOptions',
+    'UDP_GRO',
+    'UDP_SEGMENT',
+    'apply_socket_options',
+    'enable_gro',
+    'enable_rxq_ovfl',
+    'gro_segment_size',
+    'gso_batches',
+    'gso_supported',
+    'parse_ancdata',
+    'recv_segments',
+    'send_segments',
+    'split_segments',
+)
+
+#: UDP socket options level.
+SOL_UDP = getattr(socket, 'SOL_UDP', 17)
+#: Generic segmentation offload socket option, Linux 4.18+.
+UDP_SEGMENT = getattr(socket, 'UDP_SEGMENT', 103)
+#: Generic receive offload socket option, Linux 5.0+.
+UDP_GRO = getattr(socket, 'UDP_GRO', 104)
+#: Socket buffer size options which ignore system limits, require
+#: CAP_NET_ADMIN.
+SO_RCVBUFFORCE = getattr(socket, 'SO_RCVBUFFORCE', 33)
+SO_SNDBUFFORCE = getattr(socket, 'SO_SNDBUFFORCE', 32)
+#: Busy polling timeout in microseconds socket option.
+SO_BUSY_POLL = getattr(socket, 'SO_BUSY_POLL', 46)
+#: Socket option to receive the number of datagrams dropped by the kernel.
+SO_RXQ_OVFL = getattr(socket, 'SO_RXQ_OVFL', 40)
+#: IPv6 traffic class socket option, the IPv6 counterpart of IP_TOS.
+IPV6_TCLASS = getattr(socket, 'IPV6_TCLASS', 67)
+#: Maximum number of segments the kernel accepts in a single send.
+GSO_MAX_SEGMENTS = 64
+#: Maximum payload size of a single send: IP datagram limit minus headers.
+GSO_MAX_SIZE = 65507
+
+#: Size of the buffer to read coalesced datagrams into.
+GRO_BUFFER_SIZE = 65535
+
+_segment_size_struct = struct.Struct('=H')
+_gro_size_struct = struct.Struct('=i')
+_ovfl_struct = struct.Struct('=I')
+
+try:
+    #: Size of the ancillary data buffer enough for all the control
+    #: messages parsed by :func:`parse_ancdata`.
+    ANCBUFSIZE = socket.CMSG_SPACE(_gro_size_struct.size)
+    ANCBUFSIZE += socket.CMSG_SPACE(_ovfl_struct.size)
+except AttributeError:  # pragma: no cover
+    # Not a POSIX platform, none of these is supported there anyway
+    ANCBUFSIZE = 0
+
+
+class SocketOptions(namedtuple('SocketOptions', (
+    'rcvbuf',
+    'sndbuf',
+    'busy_poll',
+    'tos',
+))):
+    """UDP socket tuning options. Options set to :const:`None` are left
+    intact.
+
+    - `rcvbuf`, `sndbuf`: receive and send buffer sizes in bytes. Forced
+      over the system limits when the process is permitted to
+    - `busy_poll`: microseconds to busy poll the device queue on receive
+    - `tos`: DSCP/ECN byte set as IPv4 TOS or IPv6 traffic class
+    """
+    __slots__ = ()
+
+    def __new__(cls, rcvbuf=None, sndbuf=None, busy_poll=None, tos=None):
+        return super().__new__(cls, rcvbuf, sndbuf, busy_poll, tos)
+
+
+def gso_supported():
+    """Tells if the platform may support UDP generic segmentation offload.
+    The kernel may still refuse it in runtime.
+
+    :rtype: bool
+    """
+    if not sys.platform.startswith('linux'):
+        return False
+    return hasattr(socket.socket, 'sendmsg')
+
+
+def gso_batches(datagrams):
+    """Groups consecutive datagrams into batches suitable for a single
+    segmented send.
+
+    All the datagrams of a batch but the last one have the same size.
+    The last one may be shorter, which is allowed by the kernel.
+
+    :param list datagrams: Sequence of binary datagrams
+    :returns: Iterator of ``(segment_size, datagrams)`` pairs
+    """
+    batch = []
+    segment_size = 0
+    for data in datagrams:
+        if batch and not _fits_batch(batch, segment_size, len(data)):
+            yield segment_size, batch
+            batch = []
+        if not batch:
+            segment_size = len(data)
+        batch.append(data)
+    if batch:
+        yield segment_size, batch
+
+
+def _fits_batch(batch, segment_size, size):
+    if size > segment_size or len(batch[-1]) < segment_size:
+        # Only the very last segment may be shorter than the others
+        return False
+    if len(batch) >= GSO_MAX_SEGMENTS:
+        return False
+    return (len(batch) + 1) * segment_size <= GSO_MAX_SIZE
+
+
+def send_segments(sock, segment_size, datagrams, address=None):
+    """Sends datagrams with a single ``sendmsg`` call asking the kernel to
+    split the data into `segment_size` long UDP datagrams.
+
+    :param socket.socket sock: UDP socket
+    :param int segment_size: Size of each datagram but the last one
+    :param list datagrams: Datagrams to send
+    :param tuple address: Recipient address for not connected socket
+    :returns: Number of sent bytes
+    :rtype: int
+    :raises OSError: If the kernel refuses the segmented send
+    """
+    ancdata = [(SOL_UDP, UDP_SEGMENT,
+                _segment_size_struct.pack(segment_size))]
+    if address is None:
+        return sock.sendmsg(datagrams, ancdata)
+    return sock.sendmsg(datagrams, ancdata, 0, address)
+
+
+def enable_gro(sock):
+    """Asks the kernel to deliver coalesced datagrams to the socket.
+
+    :param socket.socket sock: UDP socket
+    :returns: :const:`False` if the kernel doesn't support it
+    :rtype: bool
+    """
+    if not gso_supported():
+        return False
+    try:
+        sock.setsockopt(SOL_UDP, UDP_GRO, 1)
+    except OSError:
+        return False
+    return True
+
+
+def apply_socket_options(sock, options):
+    """Applies tuning options to the socket.
+
+    :param socket.socket sock: UDP socket
+    :param SocketOptions options: Options to apply
+    :raises OSError: If some option cannot be set
+    """
+    if options.rcvbuf is not None:
+        _set_buffer_size(sock, SO_RCVBUFFORCE, socket.SO_RCVBUF,
+                         options.rcvbuf)
+    if options.sndbuf is not None:
+        _set_buffer_size(sock, SO_SNDBUFFORCE, socket.SO_SNDBUF,
+                         options.sndbuf)
+    if options.busy_poll is not None:
+        sock.setsockopt(socket.SOL_SOCKET, SO_BUSY_POLL, options.busy_poll)
+    if options.tos is not None:
+        if sock.family == socket.AF_INET6:
+            sock.setsockopt(socket.IPPROTO_IPV6, IPV6_TCLASS, options.tos)
+        else:
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_TOS, options.tos)
+
+
+def _set_buffer_size(sock, force_option, option, size):
+    if sys.platform.startswith('linux'):
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, force_option, size)
+        except PermissionError:
+            pass
+        else:
+            return
+    sock.setsockopt(socket.SOL_SOCKET, option, size)
+
+
+def enable_rxq_ovfl(sock):
+    """Asks the kernel to report the number of dropped datagrams with
+    every received one.
+
+    :param socket.socket sock: UDP socket
+    :returns: :const:`False` if the kernel doesn't support it
+    :rtype: bool
+    """
+    if not hasattr(socket.socket, 'recvmsg'):
+        return False
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, SO_RXQ_OVFL, 1)
+    except OSError:
+        return False
+    return True
+
+
+def parse_ancdata(ancdata):
+    """Parses the ancillary data received with ``recvmsg``.
+
+    :param list ancdata: Ancillary data items
+    :returns: Pair of the coalesced datagrams size and the number of
+              datagrams dropped by the socket so far. Each of them is
+              :const:`None` if there is no such control message
+    :rtype: tuple
+    """
+    segment_size = dropped = None
+    for level, kind, data in ancdata:
+        if level == SOL_UDP and kind == UDP_GRO:
+            segment_size = _gro_size_struct.unpack_from(data)[0]
+        elif level == socket.SOL_SOCKET and kind == SO_RXQ_OVFL:
+            dropped = _ovfl_struct.unpack_from(data)[0]
+    return segment_size, dropped
+
+
+def gro_segment_size(ancdata):
+    """Returns size of the coalesced datagrams from the ancillary data
+    received with ``recvmsg`` or :const:`None` if the data wasn't
+    coalesced by the kernel.
+
+    :param list ancdata: Ancillary data items
+    :rtype: int
+    """
+    return parse_ancdata(ancdata)[0]
+
+
+def split_segments(data, segment_size):
+    """Splits coalesced datagrams into the memoryview segments without
+    copying the data. Data which wasn't coalesced is returned as is.
+
+    :param bytes data: Received data
+    :param int segment_size: Size of each segment but the last one
+    :rtype: list
+    """
+    if segment_size is None or segment_size >= len(data):
+        return [data]
+    view = memoryview(data)
+    return [view[offset:offset + segment_size]
+            for offset in range(0, len(data), segment_size)]
+
+
+def recv_segments(sock, bufsize=GRO_BUFFER_SIZE):
+    """Receives data from the socket with ``recvmsg`` and splits it into
+    datagrams if the kernel has coalesced them.
+
+    :param socket.socket sock: UDP socket
+    :param int bufsize: Maximum number of bytes to receive
+    :returns: Tuple of list of datagrams, remote peer socket address and
+              the number of datagrams dropped by the socket, if reported
+    :rtype: tuple
+    :raises OSError: If the receive fails
+    """
+    data, ancdata, _, addr = sock.recvmsg(bufsize, ANCBUFSIZE)
+    segment_size, dropped = parse_ancdata(ancdata)
+    return split_segments(data, segment_size), addr, dropped
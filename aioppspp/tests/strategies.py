@@ -139,7 +139,7 @@ def option_ldw(cam):
 def option_supported_messages():
     return tuples(*[
         tuples(just(msgtype), booleans()) for msgtype in MessageType
-    ]).filter(lambda i: i[1]).map(lambda i: {v for v, _ in i})
+    ]).map(lambda i: {v for v, supported in i if supported})
 
 
 def option_chunk_size():
@@ -20,6 +20,7 @@ import hypothesis
 import hypothesis.strategies as st
 
 import aioppspp.connection
+import aioppspp.validation
 
 
 def ipaddr():
@@ -62,3 +63,39 @@ class AddressTestCase(unittest.TestCase):
     def test_bad_port_value(self):
         with self.assertRaises(ValueError):
             aioppspp.connection.Address('0.0.0.0', -1)
+
+    def test_from_sockaddr(self):
+        addr = aioppspp.connection.Address.from_sockaddr(('::1', 42, 0, 0))
+        self.assertIsInstance(addr, aioppspp.connection.Address)
+        self.assertEqual(addr, ('::1', 42))
+
+    def test_from_sockaddr_strict(self):
+        self.addCleanup(aioppspp.validation.set_strict,
+                        aioppspp.validation.is_strict())
+        aioppspp.validation.set_strict(True)
+        with self.assertRaises(ValueError):
+            aioppspp.connection.Address.from_sockaddr(('bad', 42))
+
+    def test_intern_address(self):
+        sockaddr = ('127.0.0.1', 4242)
+        addr = aioppspp.connection.intern_address(sockaddr)
+        self.assertEqual(addr, sockaddr)
+        self.assertIs(aioppspp.connection.intern_address(sockaddr), addr)
+
+    def test_intern_address_strict(self):
+        self.addCleanup(aioppspp.validation.set_strict,
+                        aioppspp.validation.is_strict())
+        aioppspp.validation.set_strict(False)
+        sockaddr = ('localhost', 4242)
+        aioppspp.connection.intern_address(sockaddr)
+        aioppspp.validation.set_strict()
+        with self.assertRaises(ValueError):
+            aioppspp.connection.intern_address(sockaddr)
+
+    def test_intern_address_bounded(self):
+        size = aioppspp.connection.ADDRESS_CACHE_SIZE
+        for port in range(size + 10):
+            aioppspp.connection.intern_address(('127.0.0.1', port))
+        self.assertEqual(len(aioppspp.connection._address_cache), size)
+        self.assertNotIn(('127.0.0.1', 0),
+                         aioppspp.connection._address_cache)
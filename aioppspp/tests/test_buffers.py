@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+#
+
+import asyncio
+import collections
+import unittest
+
+import hypothesis
+import hypothesis.strategies as st
+
+import aioppspp.buffers
+import aioppspp.tests.utils
+
+
+class BufferPoolTestCase(unittest.TestCase):
+
+    def test_acquire(self):
+        pool = aioppspp.buffers.BufferPool()
+        buffer = pool.acquire()
+        self.assertIsInstance(buffer, bytearray)
+        self.assertEqual(len(buffer), aioppspp.buffers.MTU)
+        self.assertEqual(pool.in_use, 1)
+        self.assertEqual(pool.misses, 1)
+        self.assertEqual(pool.hits, 0)
+
+    def test_release_reuse(self):
+        pool = aioppspp.buffers.BufferPool(buffer_size=16)
+        buffer = pool.acquire()
+        pool.release(buffer)
+        self.assertEqual(len(pool), 1)
+        self.assertEqual(pool.in_use, 0)
+        self.assertIs(pool.acquire(), buffer)
+        self.assertEqual(pool.hits, 1)
+        self.assertEqual(pool.misses, 1)
+
+    def test_release_twice(self):
+        pool = aioppspp.buffers.BufferPool(buffer_size=16)
+        buffer = pool.acquire()
+        pool.release(buffer)
+        with self.assertRaises(ValueError):
+            pool.release(buffer)
+        self.assertEqual(len(pool), 1)
+        self.assertEqual(pool.in_use, 0)
+        self.assertIsNot(pool.acquire(), pool.acquire())
+
+    def test_release_foreign(self):
+        pool = aioppspp.buffers.BufferPool(buffer_size=16)
+        pool.acquire()
+        with self.assertRaises(ValueError):
+            pool.release(bytearray(16))
+        self.assertEqual(len(pool), 0)
+        self.assertEqual(pool.in_use, 1)
+
+    def test_high_water(self):
+        pool = aioppspp.buffers.BufferPool(buffer_size=16)
+        buffers = [pool.acquire() for _ in range(3)]
+        for buffer in buffers:
+            pool.release(buffer)
+        pool.acquire()
+        self.assertEqual(pool.high_water, 3)
+        self.assertEqual(pool.in_use, 1)
+
+    def test_maxsize(self):
+        pool = aioppspp.buffers.BufferPool(buffer_size=16, maxsize=2)
+        buffers = [pool.acquire() for _ in range(3)]
+        for buffer in buffers:
+            pool.release(buffer)
+        self.assertEqual(len(pool), pool.maxsize)
+        self.assertEqual(pool.buffer_size, 16)
+
+    def test_bad_params(self):
+        with self.assertRaises(ValueError):
+            aioppspp.buffers.BufferPool(buffer_size=0)
+        with self.assertRaises(ValueError):
+            aioppspp.buffers.BufferPool(maxsize=-1)
+
+
+class DatagramQueueTestCase(aioppspp.tests.utils.TestCase):
+
+    def new_queue(self, *args, **kwargs):
+        return aioppspp.buffers.DatagramQueue(*args, loop=self.loop, **kwargs)
+
+    def test_unbounded(self):
+        queue = self.new_queue()
+        for idx in range(100):
+            self.assertTrue(queue.put_nowait((idx, 'a')))
+        self.assertEqual(len(queue), 100)
+        self.assertFalse(queue.full())
+        self.assertEqual(queue.dropped, 0)
+        self.assertEqual(queue.get_nowait(), (0, 'a'))
+
+    def test_defaults(self):
+        queue = aioppspp.buffers.DatagramQueue()
+        self.assertEqual(queue.maxsize, 0)
+        self.assertIs(queue.drop_policy, aioppspp.buffers.DropPolicy.oldest)
+        self.assertIs(queue._loop, self.loop)
+
+    def test_get_nowait_empty(self):
+        for drop_policy in aioppspp.buffers.DropPolicy:
+            queue = self.new_queue(2, drop_policy)
+            self.assertEqual(queue.maxsize, 2)
+            self.assertIs(queue.drop_policy, drop_policy)
+            self.assertTrue(queue.empty())
+            with self.assertRaises(asyncio.QueueEmpty):
+                queue.get_nowait()
+
+    def test_drop_oldest(self):
+        queue = self.new_queue(2, aioppspp.buffers.DropPolicy.oldest)
+        for idx in range(4):
+            self.assertTrue(queue.put_nowait((idx, 'a')))
+        self.assertTrue(queue.full())
+        self.assertEqual(queue.dropped, 2)
+        self.assertEqual(queue.high_water, 2)
+        self.assertEqual([queue.get_nowait(), queue.get_nowait()],
+                         [(2, 'a'), (3, 'a')])
+
+    def test_drop_newest(self):
+        queue = self.new_queue(2, 'newest')
+        results = [queue.put_nowait((idx, 'a')) for idx in range(4)]
+        self.assertEqual(results, [True, True, False, False])
+        self.assertEqual(queue.dropped, 2)
+        self.assertEqual([queue.get_nowait(), queue.get_nowait()],
+                         [(0, 'a'), (1, 'a')])
+
+    def test_drop_fair(self):
+        queue = self.new_queue(4, aioppspp.buffers.DropPolicy.fair)
+        for idx in range(4):
+            queue.put_nowait((idx, 'a'))
+        # Chatty source gives its oldest datagram up for the quiet one
+        self.assertTrue(queue.put_nowait((0, 'b')))
+        self.assertTrue(queue.put_nowait((1, 'b')))
+        # Both sources hold the same share now
+        self.assertFalse(queue.put_nowait((4, 'a')))
+        self.assertFalse(queue.put_nowait((2, 'b')))
+        self.assertEqual(queue.dropped, 4)
+        items = [queue.get_nowait() for _ in range(4)]
+        self.assertEqual(items, [(2, 'a'), (3, 'a'), (0, 'b'), (1, 'b')])
+        self.assertEqual(queue._sources, {})
+
+    @hypothesis.given(st.lists(st.one_of(st.sampled_from('abc'),
+                                         st.none())))
+    def test_drop_fair_model(self, ops):
+        # None stands for get, source name for put
+        queue = self.new_queue(3, 'fair')
+        model = []
+        for idx, op in enumerate(ops):
+            if op is None:
+                if model:
+                    self.assertEqual(queue.get_nowait(), model.pop(0))
+            else:
+                self.check_fair_put(queue, model, (idx, op))
+            self.assertEqual(len(queue), len(model))
+            self.assertLessEqual(len(queue._items), 2 * len(model) + 1)
+        self.assertEqual([queue.get_nowait() for _ in range(len(queue))],
+                         model)
+
+    def check_fair_put(self, queue, model, item):
+        counts = collections.Counter(source for _, source in model)
+        put = queue.put_nowait(item)
+        if len(model) < 3:
+            self.assertTrue(put)
+        elif counts[item[1]] >= max(counts.values()):
+            self.assertFalse(put)
+        else:
+            self.assertTrue(put)
+            heaviest = max(counts.values())
+            victims = [source for source, count in counts.items()
+                       if count == heaviest
+                       and len(queue._sources.get(source, ())) < count]
+            self.assertEqual(len(victims), 1)
+            model.remove([queued for queued in model
+                          if queued[1] == victims[0]][0])
+        if put:
+            model.append(item)
+
+    def test_drop_fair_flood(self):
+        queue = self.new_queue(4, 'fair')
+        for idx in range(1000):
+            queue.put_nowait((idx, 'a'))
+            queue.put_nowait((idx, idx))
+            # Tombstones of the evicted datagrams are compacted away
+            self.assertLessEqual(len(queue._items), 9)
+        items = [queue.get_nowait() for _ in range(4)]
+        self.assertEqual(items, sorted(items))
+        self.assertEqual(len({source for _, source in items}), 4)
+        self.assertTrue(queue.empty())
+        self.assertEqual(queue._sources, {})
+        self.assertEqual(queue._counts, {})
+
+    def test_bad_maxsize(self):
+        with self.assertRaises(ValueError):
+            self.new_queue(-1)
+
+    async def test_get_waits(self):
+        queue = self.new_queue()
+        self.loop.call_soon(queue.put_nowait, (b'data', 'a'))
+        self.assertEqual(await queue.get(), (b'data', 'a'))
+        self.assertIsNone(queue._waiter)
+
+    async def test_single_waiter(self):
+        queue = self.new_queue()
+        task = self.loop.create_task(queue.get())
+        await asyncio.sleep(0, loop=self.loop)
+        with self.assertRaises(RuntimeError):
+            await queue.get()
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertIsNone(queue._waiter)
+
+    async def test_get_many(self):
+        queue = self.new_queue(drop_policy='fair')
+        for idx in range(5):
+            queue.put_nowait((idx, 'a'))
+        batch = await queue.get_many(3)
+        self.assertEqual(batch, [(0, 'a'), (1, 'a'), (2, 'a')])
+        batch = await queue.get_many(3)
+        self.assertEqual(batch, [(3, 'a'), (4, 'a')])
+        self.assertEqual(queue._sources, {})
+
+    async def test_get_many_waits(self):
+        queue = self.new_queue()
+        self.loop.call_soon(queue.put_nowait, (b'data', 'a'))
+        self.assertEqual(await queue.get_many(3), [(b'data', 'a')])
+
+    async def test_get_many_timeout(self):
+        queue = self.new_queue()
+        self.assertEqual(await queue.get_many(3, 0.01), [])
+        self.assertEqual(await queue.get_many(3, 0), [])
+        self.assertIsNone(queue._waiter)
+        self.loop.call_soon(queue.put_nowait, (b'data', 'a'))
+        self.assertEqual(await queue.get_many(3, 1), [(b'data', 'a')])
+
+    async def test_get_many_bad_count(self):
+        with self.assertRaises(ValueError):
+            await self.new_queue().get_many(0)
+
+
+class RecvRingTestCase(unittest.TestCase):
+
+    def test_rotation(self):
+        ring = aioppspp.buffers.RecvRing(3, 10)
+        self.assertEqual(len(ring), 3)
+        self.assertEqual(ring.slot_size, 10)
+        slots = [ring.next_slot() for _ in range(4)]
+        self.assertTrue(all(isinstance(slot, memoryview) for slot in slots))
+        self.assertIs(slots[3], slots[0])
+        slots[1][:2] = b'ab'
+        self.assertEqual(ring._buffer[10:12], b'ab')
+
+    def test_detach(self):
+        ring = aioppspp.buffers.RecvRing(2, 10)
+        slot = ring.next_slot()
+        slot[:3] = b'abc'
+        data = ring.detach(slot[:3])
+        self.assertIs(type(data), bytes)
+        slot[:3] = b'xyz'
+        self.assertEqual(data, b'abc')
+
+        other = memoryview(bytearray(b'abc'))
+        self.assertIs(ring.detach(other), other)
+        self.assertIs(ring.detach(data), data)
+
+    def test_bad_params(self):
+        with self.assertRaises(ValueError):
+            aioppspp.buffers.RecvRing(0)
+        with self.assertRaises(ValueError):
+            aioppspp.buffers.RecvRing(1, 0)
@@ -30,11 +30,30 @@ class ChannelIDTestCase(unittest.TestCase):
         self.assertEqual(channel_id, b'1234')
         self.assertEqual(rest.tobytes(), b'5678')
 
+    def test_decode_from(self):
+        data = memoryview(b'12345678')
+        channel_id, offset = aioppspp.channel_ids.decode_from(data, 2)
+        self.assertIsInstance(channel_id, aioppspp.channel_ids.ChannelID)
+        self.assertEqual(channel_id, b'3456')
+        self.assertEqual(offset, 6)
+
+    def test_decode_from_truncated(self):
+        with self.assertRaises(ValueError):
+            aioppspp.channel_ids.decode_from(memoryview(b'12345678'), 6)
+
     def test_encode(self):
         channel_id = aioppspp.channel_ids.new()
         data = aioppspp.channel_ids.encode(channel_id)
         self.assertEqual(data, bytes(channel_id))
 
+    def test_encode_into(self):
+        buffer = bytearray(6)
+        size = aioppspp.channel_ids.encode_into(b'1234', buffer, 1)
+        self.assertEqual(size, 4)
+        self.assertEqual(buffer, b'\x001234\x00')
+        with self.assertRaises(ValueError):
+            aioppspp.channel_ids.encode_into(b'123', buffer)
+
     def test_new(self):
         channel_id = aioppspp.channel_ids.new()
         self.assertIsInstance(channel_id, aioppspp.channel_ids.ChannelID)
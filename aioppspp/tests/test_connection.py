@@ -59,6 +59,21 @@ class TestConnection(aioppspp.tests.utils.TestCase):
                'message': 'Unclosed connection'}
         exc_handler.assert_called_with(self.loop, msg)
 
+    def test_del_connection_lost(self):
+        connection = self.new_connection()
+        connection.protocol.connection_made(unittest.mock.Mock())
+        connection.protocol.connection_lost(None)
+        connector = connection._connector
+        connector.close_connection = unittest.mock.Mock()
+        exc_handler = unittest.mock.Mock()
+        self.loop.set_exception_handler(exc_handler)
+
+        del connection
+        gc.collect()
+
+        self.assertTrue(connector.close_connection.called)
+        self.assertFalse(exc_handler.called)
+
     def test_del_with_closed_loop(self):
         connection = self.new_connection()
         connection.protocol.connection_made(unittest.mock.Mock())
@@ -172,6 +187,22 @@ class TestConnection(aioppspp.tests.utils.TestCase):
         self.assertTrue(connection.protocol.recv.called)
         connection.close()
 
+    async def test_recv_many_not_connected(self):
+        connector = self.new_connector()
+        address = aioppspp.connection.Address('0.0.0.0', 0)
+        connection = await connector.connect(address)
+        with self.assertRaises(ConnectionError):
+            await connection.recv_many(10)
+
+    async def test_recv_many(self):
+        connector = self.new_connector()
+        address = aioppspp.connection.Address('0.0.0.0', 0)
+        connection = await connector.connect(address)
+        connection.protocol.connection_made(unittest.mock.Mock())
+        result = await connection.recv_many(10, 1)
+        self.assertEqual(result, [None])
+        connection.close()
+
     async def test_send_not_connected(self):
         connector = self.new_connector()
         address = aioppspp.connection.Address('0.0.0.0', 0)
@@ -189,3 +220,38 @@ class TestConnection(aioppspp.tests.utils.TestCase):
         await connection.send(b'...', None)
         self.assertTrue(connection.protocol.send.called)
         connection.close()
+
+    async def test_send_many_not_connected(self):
+        connector = self.new_connector()
+        address = aioppspp.connection.Address('0.0.0.0', 0)
+        connection = await connector.connect(address)
+        with self.assertRaises(ConnectionError):
+            await connection.send_many([b'...'])
+
+    async def test_send_many(self):
+        connector = self.new_connector()
+        address = aioppspp.connection.Address('0.0.0.0', 0)
+        connection = await connector.connect(address)
+        connection.protocol.connection_made(unittest.mock.Mock())
+        connection.protocol.send = unittest.mock.Mock(
+            wraps=connection.protocol.send)
+        await connection.send_many([b'.', b'..'], None)
+        self.assertEqual(connection.protocol.send.call_count, 2)
+        connection.close()
+
+    async def test_send_nowait_not_connected(self):
+        connector = self.new_connector()
+        address = aioppspp.connection.Address('0.0.0.0', 0)
+        connection = await connector.connect(address)
+        with self.assertRaises(ConnectionError):
+            connection.send_nowait(b'...')
+
+    async def test_send_nowait(self):
+        connector = self.new_connector()
+        address = aioppspp.connection.Address('0.0.0.0', 0)
+        connection = await connector.connect(address)
+        connection.protocol.connection_made(unittest.mock.Mock())
+        connection.protocol.send_nowait = unittest.mock.Mock()
+        connection.send_nowait(b'...')
+        connection.protocol.send_nowait.assert_called_once_with(b'...', None)
+        connection.close()
@@ -13,6 +13,7 @@
 # the License.
 #
 
+import asyncio
 import gc
 import unittest.mock
 
@@ -66,6 +67,17 @@ class TestProtocol(aioppspp.tests.utils.TestCase):
         protocol.connection_lost(ConnectionError)
         self.assertTrue(protocol.closed)
 
+    async def test_recv_many_timeout(self):
+        protocol = Protocol(loop=self.loop)
+        protocol.recv = unittest.mock.Mock(
+            return_value=asyncio.sleep(1, loop=self.loop))
+        self.assertEqual(await protocol.recv_many(10, 0.01), [])
+
+    async def test_recv_many_bad_count(self):
+        protocol = Protocol(loop=self.loop)
+        with self.assertRaises(ValueError):
+            await protocol.recv_many(0)
+
     def test_local_address_not_connected(self):
         protocol = self.new_protocol()
         self.assertIsNone(protocol.local_address)
@@ -80,6 +92,21 @@ class TestProtocol(aioppspp.tests.utils.TestCase):
                               aioppspp.connection.Address)
         self.assertEqual(protocol.local_address, ipaddrport)
 
+    def test_local_address_cached(self):
+        protocol = self.new_protocol()
+        transport = unittest.mock.Mock()
+        transport._sock.getsockname.return_value = ('127.0.0.1', 4242)
+        protocol.connection_made(transport)
+        address = protocol.local_address
+        self.assertIs(protocol.local_address, address)
+        self.assertEqual(transport._sock.getsockname.call_count, 1)
+
+        transport._sock.getsockname.return_value = ('127.0.0.1', 4343)
+        protocol.connection_lost(None)
+        self.assertIsNone(protocol.local_address)
+        protocol.connection_made(transport)
+        self.assertEqual(protocol.local_address, ('127.0.0.1', 4343))
+
     def test_remote_address_not_connected(self):
         protocol = self.new_protocol()
         self.assertIsNone(protocol.remote_address)
@@ -100,6 +127,8 @@ class TestProtocol(aioppspp.tests.utils.TestCase):
         transport._sock.getpeername.side_effect = OSError
         protocol.connection_made(transport)
         self.assertIsNone(protocol.remote_address)
+        self.assertIsNone(protocol.remote_address)
+        self.assertEqual(transport._sock.getpeername.call_count, 1)
 
 
 class TestConnector(aioppspp.tests.utils.TestCase):
@@ -269,3 +298,463 @@ class TestConnector(aioppspp.tests.utils.TestCase):
             return_value=self.future(exception=OSError('...')))
         with self.assertRaises(ConnectionError):
             await connector.connect(address)
+
+    def test_bad_limits(self):
+        with self.assertRaises(ValueError):
+            Connector(limit=0, loop=self.loop)
+        with self.assertRaises(ValueError):
+            Connector(limit_per_key=0, loop=self.loop)
+
+    def test_limits(self):
+        connector = Connector(limit=2, limit_per_key=1, loop=self.loop)
+        self.assertEqual(connector.limit, 2)
+        self.assertEqual(connector.limit_per_key, 1)
+        connector = Connector(loop=self.loop)
+        self.assertIsNone(connector.limit)
+        self.assertIsNone(connector.limit_per_key)
+
+    async def test_limit_waits_for_release(self):
+        connector = Connector(limit=1, loop=self.loop)
+        address0 = aioppspp.connection.Address('127.0.0.1', 1)
+        address1 = aioppspp.connection.Address('127.0.0.1', 2)
+        connection = await connector.connect(address0)
+        connection.protocol.connection_made(unittest.mock.Mock())
+        task = self.loop.create_task(connector.connect(address1))
+        await asyncio.sleep(0, loop=self.loop)
+        self.assertFalse(task.done())
+        self.assertEqual(connector.waiting_count, 1)
+        connection.release()
+        await task
+        self.assertEqual(connector.waiting_count, 0)
+        connector.close()
+
+    async def test_limit_per_key(self):
+        connector = Connector(limit_per_key=1, loop=self.loop)
+        address0 = aioppspp.connection.Address('127.0.0.1', 1)
+        address1 = aioppspp.connection.Address('127.0.0.1', 2)
+        connection = await connector.connect(address0)
+        connection.protocol.connection_made(unittest.mock.Mock())
+        task = self.loop.create_task(connector.connect(address0))
+        await asyncio.sleep(0, loop=self.loop)
+        self.assertFalse(task.done())
+        # Other keys are not affected
+        await connector.connect(address1)
+        connection.close()
+        self.assertIsNot(await task, connection)
+        connector.close()
+
+    async def test_limit_waiter_fails_on_close(self):
+        connector = Connector(limit=1, loop=self.loop)
+        address = aioppspp.connection.Address('127.0.0.1', 1)
+        connection = await connector.connect(address)
+        connection.protocol.connection_made(unittest.mock.Mock())
+        connector.create_endpoint = unittest.mock.Mock(
+            wraps=connector.create_endpoint)
+        task = self.loop.create_task(connector.connect(address))
+        await asyncio.sleep(0, loop=self.loop)
+        self.assertEqual(connector.waiting_count, 1)
+        connector.close()
+        self.assertTrue(connection.closed)
+        with self.assertRaises(ConnectionError):
+            await task
+        self.assertFalse(connector.create_endpoint.called)
+
+    async def test_connect_when_closed(self):
+        connector = Connector(limit=1, loop=self.loop)
+        address = aioppspp.connection.Address('127.0.0.1', 1)
+        connector.close()
+        with self.assertRaises(ConnectionError):
+            await connector.connect(address)
+        self.assertFalse(connector._slots)
+
+    async def test_closed_while_connecting(self):
+        address = aioppspp.connection.Address('127.0.0.1', 1)
+        for lost in (False, True):
+            connector = Connector(loop=self.loop)
+            protocol = Protocol(loop=self.loop)
+            protocol.connection_made(unittest.mock.Mock())
+            if lost:
+                protocol.connection_lost(None)
+            protocol.close = unittest.mock.Mock(wraps=protocol.close)
+            created = self.future()
+            connector.create_endpoint = unittest.mock.Mock(
+                return_value=created)
+            task = self.loop.create_task(connector.connect(address))
+            await asyncio.sleep(0, loop=self.loop)
+            connector.close()
+            created.set_result(protocol)
+            with self.assertRaises(ConnectionError):
+                await task
+            self.assertTrue(protocol.closed)
+            self.assertEqual(protocol.close.called, not lost)
+
+    async def test_limit_fifo(self):
+        connector = Connector(limit=1, loop=self.loop)
+        address = aioppspp.connection.Address('127.0.0.1', 1)
+        connection = await connector.connect(address)
+        connection.protocol.connection_made(unittest.mock.Mock())
+        tasks = [self.loop.create_task(connector.connect(address))
+                 for _ in range(3)]
+        await asyncio.sleep(0, loop=self.loop)
+        self.assertEqual(connector.waiting_count, 3)
+        connection.close()
+        done, _ = await asyncio.wait(tasks, loop=self.loop,
+                                     return_when=asyncio.FIRST_COMPLETED)
+        self.assertEqual(done, {tasks[0]})
+        # Newcomers must not take the slot before the waiters
+        self.assertEqual(connector.waiting_count, 2)
+        connector.close()
+        for task in tasks[1:]:
+            with self.assertRaises(ConnectionError):
+                await task
+
+    async def test_limit_per_key_waiter_skipped(self):
+        connector = Connector(limit=2, limit_per_key=1, loop=self.loop)
+        address0 = aioppspp.connection.Address('127.0.0.1', 1)
+        address1 = aioppspp.connection.Address('127.0.0.1', 2)
+        connection0 = await connector.connect(address0)
+        connection1 = await connector.connect(address1)
+        task0 = self.loop.create_task(connector.connect(address0))
+        task1 = self.loop.create_task(connector.connect(address1))
+        await asyncio.sleep(0, loop=self.loop)
+        self.assertEqual(connector.waiting_count, 2)
+        # The first waiter still exceeds its key limit
+        connection1.close()
+        await task1
+        self.assertFalse(task0.done())
+        connection0.close()
+        await task0
+        connector.close()
+
+    async def test_limit_cancelled_waiter(self):
+        connector = Connector(limit=1, loop=self.loop)
+        address = aioppspp.connection.Address('127.0.0.1', 1)
+        connection = await connector.connect(address)
+        tasks = [self.loop.create_task(connector.connect(address))
+                 for _ in range(2)]
+        await asyncio.sleep(0, loop=self.loop)
+        tasks[0].cancel()
+        # The slot goes to the next waiter before the cancelled one wakes up
+        connection.close()
+        with self.assertRaises(asyncio.CancelledError):
+            await tasks[0]
+        await tasks[1]
+        self.assertEqual(connector.waiting_count, 0)
+        connector.close()
+
+    async def test_limit_waiter_cancelled_on_close(self):
+        connector = Connector(limit=1, loop=self.loop)
+        address = aioppspp.connection.Address('127.0.0.1', 1)
+        await connector.connect(address)
+        task = self.loop.create_task(connector.connect(address))
+        await asyncio.sleep(0, loop=self.loop)
+        task.cancel()
+        connector.close()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+    async def test_limit_cancelled_after_handover(self):
+        connector = Connector(limit=1, loop=self.loop)
+        address = aioppspp.connection.Address('127.0.0.1', 1)
+        connection = await connector.connect(address)
+        task = self.loop.create_task(connector.connect(address))
+        await asyncio.sleep(0, loop=self.loop)
+        connection.close()
+        # The slot is handed over, but the waiter doesn't wake up in time
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertEqual(connector._slots_total, 0)
+        await connector.connect(address)
+        connector.close()
+
+    async def test_limit_wait_timeout(self):
+        connector = Connector(limit=1, connection_timeout=0.01,
+                              loop=self.loop)
+        address = aioppspp.connection.Address('127.0.0.1', 1)
+        connection = await connector.connect(address)
+        with self.assertRaises(TimeoutError):
+            await connector.connect(address)
+        self.assertEqual(connector.waiting_count, 0)
+        connection.protocol.connection_made(unittest.mock.Mock())
+        connection.release()
+        await connector.connect(address)
+        connector.close()
+
+    async def test_limit_slot_released_on_connection_lost(self):
+        connector = Connector(limit=1, connection_timeout=0.01,
+                              loop=self.loop)
+        address = aioppspp.connection.Address('127.0.0.1', 1)
+        for finalize in ('close', 'release'):
+            connection = await connector.connect(address)
+            connection.protocol.connection_made(unittest.mock.Mock())
+            connection.protocol.connection_lost(None)
+            self.assertTrue(connection.closed)
+            getattr(connection, finalize)()
+            self.assertFalse(connector._acquired[address])
+            self.assertEqual(connector.idle_count, 0)
+        await connector.connect(address)
+        connector.close()
+
+    async def test_limit_slot_released_on_error(self):
+        connector = Connector(limit=1, loop=self.loop)
+        address = aioppspp.connection.Address('127.0.0.1', 1)
+        create_endpoint = connector.create_endpoint
+        connector.create_endpoint = unittest.mock.Mock(
+            return_value=self.future(exception=OSError('...')))
+        with self.assertRaises(ConnectionError):
+            await connector.connect(address)
+        connector.create_endpoint = create_endpoint
+        await connector.connect(address)
+        connector.close()
+
+    async def released_protocols(self, connector, addresses):
+        connections = []
+        for address in addresses:
+            connection = await connector.connect(address)
+            connection.protocol.connection_made(unittest.mock.Mock())
+            connections.append(connection)
+        protocols = [connection.protocol for connection in connections]
+        for connection in connections:
+            connection.release()
+        return protocols
+
+    def test_bad_idle_limit(self):
+        with self.assertRaises(ValueError):
+            Connector(idle_limit=-1, loop=self.loop)
+
+    async def test_release_reuses_most_recent(self):
+        connector = self.new_connector()
+        address = aioppspp.connection.Address('127.0.0.1', 1)
+        protocols = await self.released_protocols(connector, [address] * 3)
+        self.assertEqual(connector.idle_count, 3)
+        connection = await connector.connect(address)
+        self.assertIs(connection.protocol, protocols[-1])
+        self.assertEqual(connector.idle_count, 2)
+        connector.close()
+        self.assertEqual(connector.idle_count, 0)
+
+    async def test_idle_limit_evicts_oldest(self):
+        connector = Connector(idle_limit=2, loop=self.loop)
+        address0 = aioppspp.connection.Address('127.0.0.1', 1)
+        address1 = aioppspp.connection.Address('127.0.0.1', 2)
+        protocols = await self.released_protocols(
+            connector, [address0, address1, address0])
+        self.assertEqual(connector.idle_count, 2)
+        self.assertTrue(protocols[0].closed)
+        self.assertFalse(protocols[1].closed)
+        self.assertFalse(protocols[2].closed)
+        self.assertEqual(list(connector._pool[address0]),
+                         [protocols[2]])
+        connector.close()
+
+    async def test_idle_limit_evicts_lost(self):
+        connector = Connector(idle_limit=1, loop=self.loop)
+        address0 = aioppspp.connection.Address('127.0.0.1', 1)
+        address1 = aioppspp.connection.Address('127.0.0.1', 2)
+        lost, = await self.released_protocols(connector, [address0])
+        lost.connection_lost(None)
+        lost.close = unittest.mock.Mock()
+        await self.released_protocols(connector, [address1])
+        self.assertEqual(connector.idle_count, 1)
+        self.assertNotIn(address0, connector._pool)
+        self.assertFalse(lost.close.called)
+        connector.close()
+
+    async def test_idle_limit_zero(self):
+        connector = Connector(idle_limit=0, loop=self.loop)
+        address = aioppspp.connection.Address('127.0.0.1', 1)
+        protocols = await self.released_protocols(connector, [address])
+        self.assertTrue(protocols[0].closed)
+        self.assertNotIn(address, connector._pool)
+        connector.close()
+
+    async def test_keepalive_timeout(self):
+        now = [100.0]
+        connector = Connector(keepalive_timeout=10, loop=self.loop)
+        self.assertEqual(connector.keepalive_timeout, 10)
+        address0 = aioppspp.connection.Address('127.0.0.1', 1)
+        address1 = aioppspp.connection.Address('127.0.0.1', 2)
+        with unittest.mock.patch.object(self.loop, 'time',
+                                        side_effect=lambda: now[0]):
+            old, = await self.released_protocols(connector, [address0])
+            self.assertEqual(connector._reaper._when, 110)
+            now[0] = 106
+            new, = await self.released_protocols(connector, [address1])
+            # Single reaper serves all the idle endpoints
+            self.assertEqual(connector._reaper._when, 110)
+
+            now[0] = 110
+            connector._reap_idle()
+            self.assertTrue(old.closed)
+            self.assertFalse(new.closed)
+            self.assertEqual(connector.idle_count, 1)
+            # Rescheduled for the expiry of the oldest remaining endpoint
+            self.assertEqual(connector._reaper._when, 116)
+
+            now[0] = 116
+            connector._reap_idle()
+            self.assertTrue(new.closed)
+            self.assertEqual(connector.idle_count, 0)
+            self.assertFalse(connector._pool)
+            self.assertIsNone(connector._reaper)
+        connector.close()
+
+    async def test_close_cancels_reaper(self):
+        connector = Connector(keepalive_timeout=10, loop=self.loop)
+        address = aioppspp.connection.Address('127.0.0.1', 1)
+        await self.released_protocols(connector, [address])
+        reaper = connector._reaper
+        connector.close()
+        self.assertTrue(reaper._cancelled)
+
+
+class SlowEndpointsTestCase(aioppspp.tests.utils.TestCase):
+
+    def new_slow_connector(self, delay, **kwargs):
+        # Endpoint creation takes abs(delay(remote_address)) seconds and
+        # fails if the delay is negative
+        connector = Connector(loop=self.loop, **kwargs)
+        self.running = self.max_running = 0
+
+        async def create_endpoint(remote_address, **_):
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            try:
+                seconds = delay(remote_address)
+                await asyncio.sleep(abs(seconds), loop=self.loop)
+                if seconds < 0:
+                    raise OSError('...')
+            finally:
+                self.running -= 1
+            protocol = Protocol(loop=self.loop)
+            protocol.connection_made(unittest.mock.Mock())
+            return protocol
+
+        connector.create_endpoint = unittest.mock.Mock(
+            side_effect=create_endpoint)
+        return connector
+
+
+class TestConnectMany(SlowEndpointsTestCase):
+
+    def new_connector(self, delays, **kwargs):
+        return self.new_slow_connector(
+            lambda address: delays[address.port], **kwargs)
+
+    def addresses(self, count):
+        return [aioppspp.connection.Address('127.0.0.1', port)
+                for port in range(count)]
+
+    async def collect(self, bulk):
+        connections = []
+        async for connection in bulk:
+            connections.append(connection)
+        return connections
+
+    def test_bad_concurrency(self):
+        connector = Connector(loop=self.loop)
+        with self.assertRaises(ValueError):
+            connector.connect_many([], concurrency=0)
+
+    async def test_empty(self):
+        connector = Connector(loop=self.loop)
+        bulk = connector.connect_many([])
+        self.assertEqual(await self.collect(bulk), [])
+        self.assertEqual(bulk.times, [])
+
+    async def test_aiter(self):
+        connector = Connector(loop=self.loop)
+        bulk = connector.connect_many([])
+        if aioppspp.connector.PY_352:
+            self.assertIs(bulk.__aiter__(), bulk)
+        else:  # pragma: no cover
+            self.assertIs(await bulk.__aiter__(), bulk)
+
+    async def test_completion_order(self):
+        connector = self.new_connector([0.03, 0.01, 0.02])
+        bulk = connector.connect_many(self.addresses(3))
+        connections = await self.collect(bulk)
+        self.assertEqual([connection.key.port for connection in connections],
+                         [1, 2, 0])
+        self.assertEqual(len(bulk.times), 3)
+        self.assertEqual(bulk.times, sorted(bulk.times))
+        self.assertFalse(bulk.failures)
+        connector.close()
+
+    async def test_concurrency(self):
+        connector = self.new_connector([0.01] * 10)
+        bulk = connector.connect_many(self.addresses(10), concurrency=3)
+        connections = await self.collect(bulk)
+        self.assertEqual(len(connections), 10)
+        self.assertEqual(self.max_running, 3)
+        connector.close()
+
+    async def test_failures(self):
+        connector = self.new_connector([0.01, -0.01, 1, 0.02])
+        bulk = connector.connect_many(self.addresses(4), timeout=0.2)
+        connections = await self.collect(bulk)
+        self.assertEqual([connection.key.port for connection in connections],
+                         [0, 3])
+        failures = dict(bulk.failures)
+        self.assertEqual(len(failures), 2)
+        self.assertIsInstance(failures[self.addresses(2)[1]],
+                              ConnectionError)
+        self.assertIsInstance(failures[self.addresses(3)[2]], TimeoutError)
+        connector.close()
+
+    async def test_reuse_pooled_endpoints(self):
+        connector = self.new_connector([0] * 2)
+        connection = await connector.connect(self.addresses(1)[0])
+        protocol = connection.protocol
+        connection.release()
+        connections = await self.collect(
+            connector.connect_many(self.addresses(2)))
+        self.assertEqual(connector.create_endpoint.call_count, 2)
+        self.assertIn(protocol, [connection.protocol
+                                 for connection in connections])
+        connector.close()
+
+    async def test_close(self):
+        connector = self.new_connector([0, 0.01, 1])
+        bulk = connector.connect_many(self.addresses(3))
+        first = await bulk.__anext__()
+        await asyncio.sleep(0.02, loop=self.loop)
+        self.assertEqual(bulk.pending, 1)
+        bulk.close()
+        self.assertEqual(bulk.pending, 0)
+        with self.assertRaises(StopAsyncIteration):
+            await bulk.__anext__()
+        await asyncio.sleep(0, loop=self.loop)
+        self.assertEqual(connector.create_endpoint.call_count, 3)
+        self.assertEqual(self.running, 0)
+        self.assertFalse(first.closed)
+        connector.close()
+
+    async def test_close_not_yielded(self):
+        connector = self.new_connector([0, 0.01, 0.01])
+        bulk = connector.connect_many(self.addresses(3))
+        await bulk.__anext__()
+        await asyncio.sleep(0.02, loop=self.loop)
+        # Both connects are collected at once, but only one is yielded
+        second = await bulk.__anext__()
+        self.assertFalse(second.closed)
+        acquired = connector._acquired.values
+        self.assertEqual(sum(map(len, acquired())), 3)
+        bulk.close()
+        self.assertEqual(sum(map(len, acquired())), 2)
+        self.assertFalse(second.closed)
+        connector.close()
+
+    async def test_cancelled_connect(self):
+        connector = Connector(loop=self.loop)
+        created = self.future()
+        connector.create_endpoint = unittest.mock.Mock(return_value=created)
+        bulk = connector.connect_many(self.addresses(1))
+        task = self.loop.create_task(self.collect(bulk))
+        await asyncio.sleep(0, loop=self.loop)
+        created.cancel()
+        # Cancelled connect is neither a connection nor a failure
+        self.assertEqual(await task, [])
+        self.assertFalse(bulk.failures)
+        connector.close()
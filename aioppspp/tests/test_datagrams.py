@@ -13,10 +13,16 @@
 # the License.
 #
 
+import struct
 import unittest
 
 import aioppspp.channel_ids
 import aioppspp.datagrams
+import aioppspp.messages
+import aioppspp.messages.handshake
+from aioppspp.messages.protocol_options import (
+    ProtocolOptions,
+)
 
 
 class DatagramsTestCase(unittest.TestCase):
@@ -34,3 +40,104 @@ class DatagramsTestCase(unittest.TestCase):
         encoded_datagram = aioppspp.datagrams.encode(datagram)
         self.assertIsInstance(encoded_datagram, bytes)
         self.assertEqual(encoded_datagram, data)
+
+    def test_decode_encode_handshake(self):
+        message = aioppspp.messages.handshake.new(
+            aioppspp.channel_ids.new(),
+            ProtocolOptions(swarm_identifier=b'swarm', chunk_size=1024))
+        datagram = aioppspp.datagrams.Datagram(
+            aioppspp.channel_ids.ZeroChannelID, [message])
+        data = memoryview(aioppspp.datagrams.encode(datagram))
+
+        result = aioppspp.datagrams.decode(data)
+        self.assertEqual(result, datagram)
+        # Variable-length fields refer to the original buffer
+        swarm_id = result.messages[0].protocol_options.swarm_identifier
+        self.assertIsInstance(swarm_id, memoryview)
+        self.assertIs(swarm_id.obj, data.obj)
+
+    def test_encode_into(self):
+        message = aioppspp.messages.handshake.new(
+            aioppspp.channel_ids.new(),
+            ProtocolOptions(swarm_identifier=b'swarm', chunk_size=1024))
+        datagram = aioppspp.datagrams.Datagram(
+            aioppspp.channel_ids.ZeroChannelID, [message])
+        expected = aioppspp.datagrams.encode(datagram)
+
+        buffer = bytearray(1500)
+        size = aioppspp.datagrams.encode_into(datagram, buffer, 10)
+        self.assertEqual(size, len(expected))
+        self.assertEqual(buffer[10:10 + size], expected)
+        self.assertEqual(len(buffer), 1500)
+
+        view = memoryview(bytearray(size))
+        self.assertEqual(aioppspp.datagrams.encode_into(datagram, view), size)
+        self.assertEqual(view.tobytes(), expected)
+
+    def test_encode_into_small_buffer(self):
+        datagram = aioppspp.datagrams.Datagram(aioppspp.channel_ids.new(), [])
+        with self.assertRaises(struct.error):
+            aioppspp.datagrams.encode_into(datagram, bytearray(3))
+
+    def test_decode_lazy(self):
+        message = aioppspp.messages.handshake.new(
+            aioppspp.channel_ids.new(),
+            ProtocolOptions(swarm_identifier=b'swarm', chunk_size=1024))
+        datagram = aioppspp.datagrams.Datagram(
+            aioppspp.channel_ids.ZeroChannelID, [message, message])
+        data = memoryview(aioppspp.datagrams.encode(datagram))
+
+        result = aioppspp.datagrams.decode_lazy(data)
+        self.assertIsInstance(result, aioppspp.datagrams.LazyDatagram)
+        self.assertEqual(result.channel_id, datagram.channel_id)
+        self.assertFalse(result.is_decoded)
+        self.assertEqual(list(result.peek_types()),
+                         [aioppspp.messages.MessageType.HANDSHAKE] * 2)
+        self.assertFalse(result.is_decoded)
+
+        self.assertEqual(list(result), [message, message])
+        self.assertTrue(result.is_decoded)
+        self.assertEqual(result, datagram)
+        self.assertEqual(result.decode(), datagram)
+        self.assertEqual(list(result.peek_types()),
+                         [aioppspp.messages.MessageType.HANDSHAKE] * 2)
+        self.assertEqual(aioppspp.datagrams.encode(result), data)
+
+    def test_lazy_equality(self):
+        message = aioppspp.messages.handshake.new(
+            aioppspp.channel_ids.new(),
+            ProtocolOptions(swarm_identifier=b'swarm', chunk_size=1024))
+        datagram = aioppspp.datagrams.Datagram(
+            aioppspp.channel_ids.ZeroChannelID, [message])
+        data = memoryview(aioppspp.datagrams.encode(datagram))
+        lazy = aioppspp.datagrams.decode_lazy(data)
+
+        self.assertTrue(lazy == datagram)
+        self.assertTrue(datagram == lazy)
+        self.assertFalse(lazy != datagram)
+        self.assertEqual(lazy, aioppspp.datagrams.decode_lazy(data))
+        self.assertNotEqual(lazy, datagram._replace(messages=()))
+
+        other_channel = aioppspp.datagrams.Datagram(
+            aioppspp.channel_ids.new(), [message])
+        other = aioppspp.datagrams.decode_lazy(
+            memoryview(aioppspp.datagrams.encode(other_channel)))
+        self.assertTrue(lazy != other)
+        self.assertFalse(lazy == other)
+        self.assertNotEqual(lazy, other_channel)
+
+        self.assertFalse(lazy == object())
+        self.assertTrue(lazy != object())
+        self.assertNotEqual(lazy, tuple(datagram))
+
+    def test_decode_lazy_malformed_messages(self):
+        data = memoryview(bytes(aioppspp.channel_ids.new()) + b'\x00\x01')
+        result = aioppspp.datagrams.decode_lazy(data)
+        with self.assertRaises(ValueError):
+            result.messages
+        with self.assertRaises(ValueError):
+            list(result.peek_types())
+
+    def test_decode_lazy_truncated_channel_id(self):
+        with self.assertRaises(ValueError):
+            aioppspp.datagrams.decode_lazy(memoryview(b'\x00\x01'))
@@ -18,6 +18,7 @@ import unittest
 import hypothesis
 
 import aioppspp.channel_ids
+import aioppspp.datagrams
 import aioppspp.messages
 import aioppspp.messages.handshake
 import aioppspp.messages.protocol_options as protocol_options
@@ -38,6 +39,22 @@ class HandshakeTestCase(unittest.TestCase):
         self.assertIsInstance(result, aioppspp.messages.Handshake)
         self.assertEqual(message, result)
 
+    @hypothesis.given(st.handshake())
+    def test_decode_from(self, message):
+        data = b'\xcc' + aioppspp.messages.handshake.encode(message)
+        result, offset = aioppspp.messages.handshake.decode_from(
+            memoryview(data), 1)
+        self.assertEqual(message, result)
+        self.assertEqual(offset, len(data))
+
+    @hypothesis.given(st.handshake())
+    def test_encode_into(self, message):
+        data = aioppspp.messages.handshake.encode(message)
+        buffer = bytearray(len(data) + 1)
+        size = aioppspp.messages.handshake.encode_into(message, buffer, 1)
+        self.assertEqual(size, len(data))
+        self.assertEqual(buffer[1:], data)
+
     def test_init_with_bad_type(self):
         with self.assertRaises(ValueError):
             msgtype = 42
@@ -53,3 +70,42 @@ class HandshakeTestCase(unittest.TestCase):
                               aioppspp.channel_ids.ChannelID)
         self.assertIsInstance(message.protocol_options,
                               protocol_options.ProtocolOptions)
+
+
+class HandshakeTemplateTestCase(unittest.TestCase):
+
+    def new_template(self):
+        return aioppspp.messages.handshake.HandshakeTemplate(
+            protocol_options.ProtocolOptions(
+                version=protocol_options.Version.rfc7574,
+                swarm_identifier=b'swarm',
+                chunk_size=1024))
+
+    def test_encode(self):
+        template = self.new_template()
+        channel_id = aioppspp.channel_ids.new()
+        message = template.new(channel_id)
+        self.assertIsInstance(message, aioppspp.messages.Handshake)
+        self.assertEqual(message.source_channel_id, channel_id)
+        self.assertIs(message.protocol_options, template.protocol_options)
+
+        data = template.encode(channel_id)
+        self.assertEqual(data, aioppspp.messages.encode([message]))
+        self.assertEqual(len(data), len(template))
+
+    def test_encode_into(self):
+        template = self.new_template()
+        buffer = bytearray(100)
+        size = aioppspp.channel_ids.encode_into(
+            aioppspp.channel_ids.ZeroChannelID, buffer)
+        for _ in range(2):
+            channel_id = aioppspp.channel_ids.new()
+            size = 4 + template.encode_into(channel_id, buffer, 4)
+            datagram = aioppspp.datagrams.decode(memoryview(buffer)[:size])
+            self.assertEqual(datagram.messages, (template.new(channel_id),))
+
+    def test_init_from_mapping(self):
+        template = aioppspp.messages.handshake.HandshakeTemplate(
+            {'chunk_size': 1024})
+        self.assertIsInstance(template.protocol_options,
+                              protocol_options.ProtocolOptions)
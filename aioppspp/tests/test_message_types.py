@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+#
+
+import unittest
+
+import hypothesis
+
+from aioppspp.messages import (
+    MessageType,
+    MessageTypeSet,
+)
+from . import strategies as st
+
+
+class MessageTypeSetTestCase(unittest.TestCase):
+
+    def test_empty(self):
+        msgtypes = MessageTypeSet()
+        self.assertFalse(msgtypes)
+        self.assertEqual(len(msgtypes), 0)
+        self.assertEqual(msgtypes.mask, 0)
+        self.assertEqual(msgtypes.to_bytes(), b'')
+
+    def test_contains(self):
+        msgtypes = MessageTypeSet([MessageType.HANDSHAKE, 8])
+        self.assertIn(MessageType.HANDSHAKE, msgtypes)
+        self.assertIn(MessageType.REQUEST, msgtypes)
+        self.assertNotIn(MessageType.DATA, msgtypes)
+        self.assertNotIn(-1, msgtypes)
+        self.assertNotIn('HANDSHAKE', msgtypes)
+        self.assertEqual(list(msgtypes),
+                         [MessageType.HANDSHAKE, MessageType.REQUEST])
+
+    def test_bad_message_type(self):
+        with self.assertRaises(ValueError):
+            MessageTypeSet([42])
+
+    def test_from_mask_ignores_unknown_types(self):
+        msgtypes = MessageTypeSet.from_mask(1 << 42 | 1)
+        self.assertEqual(msgtypes, {MessageType.HANDSHAKE})
+
+    @hypothesis.given(st.option_supported_messages(),
+                      st.option_supported_messages())
+    def test_set_operations(self, a, b):
+        x, y = MessageTypeSet(a), MessageTypeSet(b)
+        self.assertEqual(x, a)
+        self.assertEqual(x & y, a & b)
+        self.assertEqual(x | y, a | b)
+        self.assertEqual(x - y, a - b)
+        self.assertEqual(x ^ y, a ^ b)
+        self.assertEqual(x & b, a & b)
+        self.assertEqual(x | b, a | b)
+        self.assertEqual(x - b, a - b)
+        self.assertEqual(x ^ b, a ^ b)
+        self.assertIsInstance(x & y, MessageTypeSet)
+        self.assertEqual(len(x), len(a))
+        self.assertEqual(x <= y, a <= b)
+        self.assertEqual(x == y, a == b)
+
+    @hypothesis.given(st.option_supported_messages())
+    def test_bytes(self, messages):
+        msgtypes = MessageTypeSet(messages)
+        data = msgtypes.to_bytes()
+        self.assertTrue(not data or data[-1])
+        self.assertEqual(MessageTypeSet.from_bytes(memoryview(data)),
+                         msgtypes)
+
+    def test_hash(self):
+        self.assertEqual(hash(MessageTypeSet([0, 1])),
+                         hash(MessageTypeSet([1, 0])))
+
+    def test_hash_matches_frozenset(self):
+        msgtypes = MessageTypeSet([0, 1])
+        regular = frozenset([MessageType(0), MessageType(1)])
+        self.assertEqual(msgtypes, regular)
+        self.assertEqual(hash(msgtypes), hash(regular))
+        self.assertEqual(len({msgtypes, regular}), 1)
+        self.assertEqual(hash(MessageTypeSet()), hash(frozenset()))
+        self.assertEqual(hash(MessageTypeSet.from_mask(0b11)),
+                         hash(regular))
@@ -13,9 +13,12 @@
 # the License.
 #
 
+import struct
 import unittest
 
+import aioppspp.channel_ids
 import aioppspp.messages
+import aioppspp.messages.handshake
 
 
 class MessagesTestCase(unittest.TestCase):
@@ -35,7 +38,7 @@ class MessagesTestCase(unittest.TestCase):
         with self.assertRaises(ValueError):
             aioppspp.messages.decode(memoryview(b'\xcc'))
 
-        with self.assertRaises(KeyError):
+        with self.assertRaises(ValueError):
             aioppspp.messages.encode([Message()])
 
     def test_dummy_message(self):
@@ -47,7 +50,7 @@ class MessagesTestCase(unittest.TestCase):
         data = Message().type.value.to_bytes(1, 'big')
         messages = aioppspp.messages.decode(
             memoryview(data),
-            handlers={Message().type: lambda d: (Message(), d)})
+            handlers={Message().type: lambda d, o: (Message(), o)})
         self.assertIsInstance(messages[0], Message)
 
         result = aioppspp.messages.encode(
@@ -55,3 +58,93 @@ class MessagesTestCase(unittest.TestCase):
             handlers={Message().type: lambda m: b''})
         self.assertIsInstance(result, bytearray)
         self.assertEqual(result, data)
+
+    def test_encode_into_fallback(self):
+        class Message(aioppspp.messages.Message):
+            @property
+            def type(self):
+                return aioppspp.messages.MessageType.CHOKE
+
+        msgtype = Message().type
+        self.addCleanup(aioppspp.messages.register, msgtype, None, None)
+        aioppspp.messages.register(msgtype, ..., lambda m: b'\x01\x02')
+
+        buffer = bytearray(5)
+        size = aioppspp.messages.encode_into([Message()], buffer, 1)
+        self.assertEqual(size, 3)
+        self.assertEqual(buffer, b'\x00\x0a\x01\x02\x00')
+
+        size = aioppspp.messages.encode_into([Message()],
+                                             memoryview(buffer), 2)
+        self.assertEqual(size, 3)
+        self.assertEqual(buffer, b'\x00\x0a\x0a\x01\x02')
+
+        with self.assertRaises(struct.error):
+            aioppspp.messages.encode_into([Message()], buffer, 3)
+        self.assertEqual(len(buffer), 5)
+
+    def test_encode_into_unknown_message_type(self):
+        class Message(aioppspp.messages.Message):
+            @property
+            def type(self):
+                return aioppspp.messages.MessageType.ACK
+
+        with self.assertRaises(ValueError):
+            aioppspp.messages.encode_into([Message()], bytearray(10))
+
+    def test_register(self):
+        class Message(aioppspp.messages.Message):
+            @property
+            def type(self):
+                return aioppspp.messages.MessageType.CHOKE
+
+        msgtype = Message().type
+        self.addCleanup(aioppspp.messages.register, msgtype, None, None)
+        aioppspp.messages.register(msgtype,
+                                   lambda d, o: (Message(), o),
+                                   lambda m: b'')
+        self.assertIn(msgtype, aioppspp.messages.decode_message_handlers())
+        self.assertIn(msgtype, aioppspp.messages.encode_message_handlers())
+
+        data = aioppspp.messages.encode([Message()])
+        self.assertEqual(data, msgtype.value.to_bytes(1, 'big'))
+        messages = aioppspp.messages.decode(memoryview(data))
+        self.assertIsInstance(messages[0], Message)
+
+    def test_register_bad_type(self):
+        with self.assertRaises(ValueError):
+            aioppspp.messages.register(42, ..., ...)
+
+    def test_decode_from(self):
+        data = memoryview(b'\xcc' + b'\x00\x00')
+        messages, offset = aioppspp.messages.decode_from(data, 3)
+        self.assertEqual(messages, tuple())
+        self.assertEqual(offset, 3)
+
+    def test_peek_types(self):
+        message = aioppspp.messages.handshake.new(
+            aioppspp.channel_ids.new(), {'swarm_identifier': b'swarm',
+                                         'chunk_addressing_method': 2,
+                                         'live_discard_window': 10,
+                                         'supported_messages': {1, 2}})
+        data = memoryview(aioppspp.messages.encode([message, message]))
+        self.assertEqual(list(aioppspp.messages.peek_types(data)),
+                         [aioppspp.messages.MessageType.HANDSHAKE] * 2)
+
+    def test_peek_types_without_skipper(self):
+        class Message(aioppspp.messages.Message):
+            @property
+            def type(self):
+                return aioppspp.messages.MessageType.CHOKE
+
+        msgtype = Message().type
+        self.addCleanup(aioppspp.messages.register, msgtype, None, None)
+        aioppspp.messages.register(msgtype, lambda d, o: (Message(), o), ...)
+
+        data = memoryview(bytes([msgtype, msgtype]))
+        self.assertEqual(list(aioppspp.messages.peek_types(data)),
+                         [msgtype, msgtype])
+
+    def test_peek_types_unknown_message_type(self):
+        with self.assertRaises(ValueError):
+            list(aioppspp.messages.peek_types(memoryview(b'\xcc')))
@@ -13,9 +13,14 @@
 # the License.
 #
 
+import asyncio
+import unittest.mock
+
+import aioppspp.buffers
 import aioppspp.channel_ids
 import aioppspp.connection
 import aioppspp.datagrams
+import aioppspp.messages.handshake
 import aioppspp.ppspp
 import aioppspp.tests.utils
 
@@ -50,3 +55,317 @@ class PPSPPTestCase(aioppspp.tests.utils.TestCase):
         peer1.close()
         peer2.close()
         connector.close()
+
+    async def test_send_reuses_buffers(self):
+        connector = self.new_connector()
+        peer1 = await connector.listen(
+            aioppspp.connection.Address('127.0.0.1', 0))
+        peer2 = await connector.connect(peer1.local_address)
+
+        datagram = aioppspp.datagrams.Datagram(aioppspp.channel_ids.new(), [])
+        for _ in range(3):
+            await peer2.send(datagram)
+            result, _ = await peer1.recv()
+            self.assertEqual(result, datagram)
+
+        pool = connector.buffer_pool
+        self.assertIs(peer2.protocol._buffer_pool, pool)
+        self.assertEqual(pool.misses, 1)
+        self.assertEqual(pool.hits, 2)
+        self.assertEqual(pool.in_use, 0)
+
+        peer1.close()
+        peer2.close()
+        connector.close()
+
+    async def test_send_datagram_larger_than_buffer(self):
+        pool = aioppspp.buffers.BufferPool(buffer_size=8)
+        connector = aioppspp.ppspp.Connector(buffer_pool=pool, loop=self.loop)
+        peer1 = await connector.listen(
+            aioppspp.connection.Address('127.0.0.1', 0))
+        peer2 = await connector.connect(peer1.local_address)
+
+        message = aioppspp.messages.handshake.new(
+            aioppspp.channel_ids.new(), {'swarm_identifier': b'swarm'})
+        datagram = aioppspp.datagrams.Datagram(
+            aioppspp.channel_ids.ZeroChannelID, [message])
+        await peer2.send(datagram)
+        result, _ = await peer1.recv()
+        self.assertEqual(result, datagram)
+        self.assertEqual(pool.in_use, 0)
+
+        peer1.close()
+        peer2.close()
+        connector.close()
+
+    async def test_lazy_recv(self):
+        connector = aioppspp.ppspp.Connector(lazy=True, loop=self.loop)
+        self.assertTrue(connector.lazy)
+        peer1 = await connector.listen(
+            aioppspp.connection.Address('127.0.0.1', 0))
+        peer2 = await connector.connect(peer1.local_address)
+
+        message = aioppspp.messages.handshake.new(
+            aioppspp.channel_ids.new(), {'swarm_identifier': b'swarm'})
+        datagram = aioppspp.datagrams.Datagram(
+            aioppspp.channel_ids.ZeroChannelID, [message])
+        await peer2.send(datagram)
+        result, _ = await peer1.recv()
+        self.assertIsInstance(result, aioppspp.datagrams.LazyDatagram)
+        self.assertEqual(result.channel_id, datagram.channel_id)
+        self.assertEqual(result.decode(), datagram)
+
+        peer1.close()
+        peer2.close()
+        connector.close()
+
+    async def test_demux_channels(self):
+        connector = self.new_connector()
+        peer1 = await connector.listen(
+            aioppspp.connection.Address('127.0.0.1', 0))
+        peer2 = await connector.connect(peer1.local_address)
+
+        channel_id1 = aioppspp.channel_ids.new()
+        channel_id2 = aioppspp.channel_ids.new()
+        received = []
+        queue = asyncio.Queue(loop=self.loop)
+        handshakes = asyncio.Queue(loop=self.loop)
+        protocol = peer1.protocol
+        protocol.register_channel(
+            channel_id1, lambda datagram, addr: received.append(datagram))
+        protocol.register_channel(channel_id2, queue)
+        protocol.set_handshake_handler(handshakes)
+        self.assertEqual(protocol.channels, 2)
+        with self.assertRaises(ValueError):
+            protocol.register_channel(channel_id1, queue)
+
+        datagram1 = aioppspp.datagrams.Datagram(channel_id1, [])
+        datagram2 = aioppspp.datagrams.Datagram(channel_id2, [])
+        datagram3 = aioppspp.datagrams.Datagram(
+            aioppspp.channel_ids.ZeroChannelID, [])
+        await peer2.send(datagram2)
+        await peer2.send(datagram3)
+        await peer2.send(datagram1)
+
+        datagram, address = await queue.get()
+        self.assertEqual(datagram, datagram2)
+        self.assertEqual(address, peer2.local_address)
+        datagram, _ = await handshakes.get()
+        self.assertEqual(datagram, datagram3)
+        await asyncio.sleep(0.01, loop=self.loop)
+        self.assertEqual(received, [datagram1])
+
+        protocol.unregister_channel(channel_id1)
+        protocol.unregister_channel(channel_id1)
+        protocol.set_handshake_handler(None)
+        await peer2.send(datagram1)
+        datagram, _ = await peer1.recv()
+        self.assertEqual(datagram, datagram1)
+
+        peer1.close()
+        peer2.close()
+        connector.close()
+
+    def test_demux_malformed_datagram(self):
+        protocol = aioppspp.ppspp.Protocol(loop=self.loop)
+        handler = unittest.mock.Mock()
+        protocol.set_handshake_handler(handler)
+        protocol.datagram_received(b'\x00\x00', ('127.0.0.1', 1))
+        protocol.datagram_received(b'\x00\x00\x00\x00\xcc',
+                                   ('127.0.0.1', 1))
+        self.assertEqual(protocol.malformed_count, 2)
+        self.assertFalse(handler.called)
+
+    def test_bad_handler(self):
+        protocol = aioppspp.ppspp.Protocol(loop=self.loop)
+        with self.assertRaises(TypeError):
+            protocol.register_channel(aioppspp.channel_ids.new(), object())
+
+    async def test_recv_many(self):
+        connector = self.new_connector()
+        peer1 = await connector.listen(
+            aioppspp.connection.Address('127.0.0.1', 0))
+        peer2 = await connector.connect(peer1.local_address)
+
+        datagrams = [aioppspp.datagrams.Datagram(aioppspp.channel_ids.new(),
+                                                 [])
+                     for _ in range(3)]
+        for datagram in datagrams:
+            await peer2.send(datagram)
+        peer2.protocol.transport.sendto(b'\x00\x00')
+        while peer1.protocol.queue_depth < 4:
+            await asyncio.sleep(0.01, loop=self.loop)
+
+        batch = await peer1.recv_many(10, 1)
+        self.assertEqual([datagram for datagram, _ in batch], datagrams)
+        self.assertEqual(peer1.protocol.malformed_count, 1)
+        self.assertEqual(await peer1.recv_many(10, 0.01), [])
+
+        peer1.close()
+        peer2.close()
+        connector.close()
+
+    def test_handler_mode(self):
+        handler = unittest.mock.Mock()
+        protocol = aioppspp.ppspp.Protocol(handler=handler, loop=self.loop)
+        channel_handler = unittest.mock.Mock()
+        channel_id = aioppspp.channel_ids.new()
+        protocol.register_channel(channel_id, channel_handler)
+
+        datagram1 = aioppspp.datagrams.Datagram(channel_id, [])
+        datagram2 = aioppspp.datagrams.Datagram(
+            aioppspp.channel_ids.new(), [])
+        address = aioppspp.connection.Address('127.0.0.1', 1)
+        protocol.datagram_received(aioppspp.datagrams.encode(datagram1),
+                                   ('127.0.0.1', 1))
+        protocol.datagram_received(aioppspp.datagrams.encode(datagram2),
+                                   ('127.0.0.1', 1))
+        protocol.datagram_received(b'\x00', ('127.0.0.1', 1))
+        channel_handler.assert_called_once_with(datagram1, address)
+        handler.assert_called_once_with(datagram2, address)
+        self.assertEqual(protocol.malformed_count, 1)
+        self.assertEqual(protocol.queue_depth, 0)
+
+    async def test_send_many(self):
+        connector = self.new_connector()
+        peer1 = await connector.listen(
+            aioppspp.connection.Address('127.0.0.1', 0))
+        peer2 = await connector.connect(peer1.local_address)
+
+        datagrams = [aioppspp.datagrams.Datagram(aioppspp.channel_ids.new(),
+                                                 [])
+                     for _ in range(3)]
+        await peer2.send_many(datagrams)
+        batch = []
+        while len(batch) < len(datagrams):
+            batch.extend(await peer1.recv_many(10))
+        self.assertEqual([datagram for datagram, _ in batch], datagrams)
+
+        peer1.close()
+        peer2.close()
+        connector.close()
+
+    async def test_gro_demux(self):
+        connector = aioppspp.ppspp.Connector(gso=True, gro=True,
+                                             loop=self.loop)
+        peer1 = await connector.listen(
+            aioppspp.connection.Address('127.0.0.1', 0))
+        peer2 = await connector.connect(peer1.local_address)
+        await asyncio.sleep(0, loop=self.loop)
+
+        channel_id = aioppspp.channel_ids.new()
+        queue = asyncio.Queue(loop=self.loop)
+        peer1.protocol.register_channel(channel_id, queue)
+        datagrams = [aioppspp.datagrams.Datagram(channel_id, [])] * 3
+        await peer2.send_many(datagrams)
+        for datagram in datagrams:
+            result, _ = await queue.get()
+            self.assertEqual(result, datagram)
+
+        peer1.close()
+        peer2.close()
+        connector.close()
+
+    async def test_ring_reader_demux(self):
+        connector = aioppspp.ppspp.Connector(ring_slots=4, loop=self.loop)
+        peer1 = await connector.listen(
+            aioppspp.connection.Address('127.0.0.1', 0))
+        peer2 = await connector.connect(peer1.local_address)
+        await asyncio.sleep(0, loop=self.loop)
+
+        channel_id = aioppspp.channel_ids.new()
+        queue = asyncio.Queue(loop=self.loop)
+        peer1.protocol.register_channel(channel_id, queue)
+        datagram = aioppspp.datagrams.Datagram(channel_id, [])
+        await peer2.send(datagram)
+        result, _ = await queue.get()
+        self.assertEqual(result, datagram)
+
+        peer1.protocol.unregister_channel(channel_id)
+        await peer2.send(datagram)
+        result, _ = await peer1.recv()
+        self.assertEqual(result, datagram)
+
+        peer1.close()
+        peer2.close()
+        connector.close()
+
+    async def test_ring_reader_queue_handler(self):
+        connector = aioppspp.ppspp.Connector(ring_slots=2, loop=self.loop)
+        peer1 = await connector.listen(
+            aioppspp.connection.Address('127.0.0.1', 0))
+        peer2 = await connector.connect(peer1.local_address)
+        await asyncio.sleep(0, loop=self.loop)
+
+        handshakes = asyncio.Queue(loop=self.loop)
+        peer1.protocol.set_handshake_handler(handshakes)
+        datagrams = []
+        for swarm_id in (b'AAAA', b'BBBB', b'CCCC'):
+            handshake = aioppspp.messages.handshake.new(
+                aioppspp.channel_ids.new(),
+                {'version': 1, 'swarm_identifier': b'swarm-' + swarm_id})
+            datagram = aioppspp.datagrams.Datagram(
+                aioppspp.channel_ids.ZeroChannelID, [handshake])
+            datagrams.append(datagram)
+            await peer2.send(datagram)
+        while handshakes.qsize() < len(datagrams):
+            await asyncio.sleep(0.01, loop=self.loop)
+
+        # More datagrams than ring slots: queued ones must not be overwritten
+        for datagram in datagrams:
+            result, _ = handshakes.get_nowait()
+            self.assertEqual(result, datagram)
+            expected = datagram.messages[0].protocol_options
+            options = result.messages[0].protocol_options
+            self.assertEqual(options.swarm_identifier,
+                             expected.swarm_identifier)
+            self.assertEqual(hash(options), hash(expected))
+
+        peer1.close()
+        peer2.close()
+        connector.close()
+
+    async def test_send_waits_before_encoding(self):
+        protocol = aioppspp.ppspp.Protocol(loop=self.loop)
+        transport = unittest.mock.Mock()
+        protocol.connection_made(transport)
+        protocol.pause_writing()
+
+        datagram = aioppspp.datagrams.Datagram(aioppspp.channel_ids.new(), [])
+        task = self.loop.create_task(protocol.send(datagram))
+        await asyncio.sleep(0, loop=self.loop)
+        self.assertEqual(protocol._buffer_pool.in_use, 0)
+        self.assertFalse(transport.sendto.called)
+
+        protocol.send_nowait(datagram)
+        self.assertEqual(transport.sendto.call_count, 1)
+        protocol.resume_writing()
+        await task
+        self.assertEqual(transport.sendto.call_count, 2)
+        data, _ = transport.sendto.call_args[0]
+        self.assertEqual(bytes(data), aioppspp.datagrams.encode(datagram))
+
+    async def test_shared_sockets(self):
+        servers_connector = self.new_connector()
+        address = aioppspp.connection.Address('127.0.0.1', 0)
+        servers = [await servers_connector.listen(address) for _ in range(2)]
+        connector = aioppspp.ppspp.Connector(shared_sockets=1,
+                                             loop=self.loop)
+        clients = [await connector.connect(server.local_address)
+                   for server in servers]
+        multiplexer, = connector.multiplexers
+        client_address = aioppspp.connection.Address(
+            '127.0.0.1', multiplexer.local_address.port)
+
+        channel_ids = []
+        for server in servers:
+            channel_id = aioppspp.channel_ids.new()
+            channel_ids.append(channel_id)
+            datagram = aioppspp.datagrams.Datagram(channel_id, [])
+            await server.send(datagram, client_address)
+        for client, channel_id in zip(clients, channel_ids):
+            datagram, _ = await client.recv()
+            self.assertEqual(datagram.channel_id, channel_id)
+
+        connector.close()
+        servers_connector.close()
@@ -20,6 +20,7 @@ import hypothesis
 import aioppspp.messages.protocol_options as protocol_options
 from aioppspp.messages import (
     MessageType,
+    MessageTypeSet,
 )
 from . import strategies as st
 
@@ -56,9 +57,10 @@ class ProtocolOptionsTestCase(unittest.TestCase):
 
     @hypothesis.given(st.raw_swarm_id())
     def test_swarm_identifier(self, data):
-        value, _ = protocol_options.decode_swarm_id(
-            memoryview(data), 0, ...)
-        self.assertIsInstance(value, bytes)
+        data = memoryview(data)
+        value, _ = protocol_options.decode_swarm_id(data, 0, ...)
+        self.assertIsInstance(value, memoryview)
+        self.assertIs(value.obj, data.obj)
         result = protocol_options.encode_swarm_id(value, ...)
         self.assertEqual(data, result)
 
@@ -126,14 +128,19 @@ class ProtocolOptionsTestCase(unittest.TestCase):
     @hypothesis.given(st.raw_option_ldw())
     def test_live_discard_window(self, cam_ldw):
         cam, data = cam_ldw
-        options = {'chunk_addressing_method': cam}
+        options = protocol_options.ProtocolOptions(
+            chunk_addressing_method=cam)
         value, _ = protocol_options.decode_live_discard_window(
             memoryview(data), 0, options)
         self.assertIsInstance(value, int)
-        result = protocol_options.encode_live_discard_window(
-            value, protocol_options.ProtocolOptions(**options))
+        result = protocol_options.encode_live_discard_window(value, options)
         self.assertEqual(data, result)
 
+    def test_cannot_decode_ldw_without_cam(self):
+        data = b'\x07\x00\x00\x00\x2a\x06\x00\xff'
+        with self.assertRaises(ValueError):
+            protocol_options.decode(memoryview(data))
+
     def test_cannot_encode_ldw_without_cam(self):
         expected = b'\xff'
         options = protocol_options.ProtocolOptions(live_discard_window=42)
@@ -146,7 +153,7 @@ class ProtocolOptionsTestCase(unittest.TestCase):
         self.assertIsInstance(data, bytes)
         result, _ = protocol_options.decode_supported_messages(
             memoryview(data), 0, ...)
-        self.assertIsInstance(result, set)
+        self.assertIsInstance(result, MessageTypeSet)
         self.assertEqual(messages, result)
 
     def test_supported_messages_spec(self):
@@ -158,7 +165,7 @@ class ProtocolOptionsTestCase(unittest.TestCase):
         offset = 0
         supported_messages, _ = protocol_options.decode_supported_messages(
             memoryview(data), offset, ...)
-        self.assertIsInstance(supported_messages, set)
+        self.assertIsInstance(supported_messages, MessageTypeSet)
         not_supported = [MessageType.ACK, MessageType.PEX_REQ,
                          MessageType.PEX_REScert, MessageType.PEX_RESv4,
                          MessageType.PEX_RESv6]
@@ -172,6 +179,11 @@ class ProtocolOptionsTestCase(unittest.TestCase):
             supported_messages, ...)
         self.assertEqual(data, result)
 
+    def test_supported_messages_truncated_bitmap(self):
+        messages = {MessageType.HANDSHAKE, MessageType.DATA}
+        data = protocol_options.encode_supported_messages(messages, ...)
+        self.assertEqual(data, b'\x01\xc0')
+
     @hypothesis.given(st.dword())
     def test_chunk_size(self, data):
         value, _ = protocol_options.decode_chunk_size(
@@ -188,6 +200,61 @@ class ProtocolOptionsTestCase(unittest.TestCase):
         from pprint import pformat
         self.assertEqual(result, options, pformat(list(zip(result, options))))
 
+    @hypothesis.given(st.generic_protocol_options())
+    def test_encode_into(self, options):
+        data = protocol_options.encode(options)
+        buffer = bytearray(len(data))
+        size = protocol_options.encode_into(options, memoryview(buffer))
+        self.assertEqual(size, len(data))
+        self.assertEqual(buffer, data)
+
+    def test_encode_memoized(self):
+        options = protocol_options.ProtocolOptions(
+            version=protocol_options.Version.rfc7574,
+            swarm_identifier=b'swarm')
+        protocol_options._encode_cached.cache_clear()
+        data0 = protocol_options.encode(options)
+        data1 = protocol_options.encode(options)
+        self.assertEqual(data0, data1)
+        self.assertIsNot(data0, data1)
+        info = protocol_options._encode_cached.cache_info()
+        self.assertEqual(info.hits, 1)
+        self.assertEqual(info.misses, 1)
+
+    def test_encode_memoryview(self):
+        buffer = bytearray(b'swarm')
+        options = protocol_options.ProtocolOptions(
+            swarm_identifier=memoryview(buffer))
+        protocol_options._encode_cached.cache_clear()
+        data = protocol_options.encode(options)
+        result, _ = protocol_options.decode(memoryview(data))
+        self.assertEqual(result, options)
+        # The view is cached by value
+        options = options._replace(swarm_identifier=b'swarm')
+        self.assertEqual(protocol_options.encode(options), data)
+        info = protocol_options._encode_cached.cache_info()
+        self.assertEqual(info.hits, 1)
+        self.assertEqual(info.misses, 1)
+        # and the cache doesn't keep the buffer exported
+        del options, result
+        buffer.clear()
+
+    def test_encode_unhashable(self):
+        options = protocol_options.ProtocolOptions(
+            swarm_identifier=b'swarm',
+            supported_messages=[MessageType.HANDSHAKE, MessageType.DATA])
+        expected = protocol_options.encode(options)
+        options = options._replace(
+            supported_messages={MessageType.HANDSHAKE, MessageType.DATA})
+        protocol_options._encode_cached.cache_clear()
+        self.assertEqual(protocol_options.encode(options), expected)
+        buffer = bytearray(len(expected))
+        size = protocol_options.encode_into(options, buffer)
+        self.assertEqual(size, len(expected))
+        self.assertEqual(buffer, expected)
+        info = protocol_options._encode_cached.cache_info()
+        self.assertEqual(info.currsize, 0)
+
     def test_encode_decode_empty(self):
         data = b'\xff'
         options, _ = protocol_options.decode(memoryview(data))
@@ -196,11 +263,62 @@ class ProtocolOptionsTestCase(unittest.TestCase):
         result = protocol_options.encode(options)
         self.assertEqual(result, data)
 
+    @hypothesis.given(st.generic_protocol_options())
+    def test_decode_from(self, options):
+        data = b'\xcc\xcc' + protocol_options.encode(options) + b'\xcc'
+        result, offset = protocol_options.decode_from(memoryview(data), 2)
+        self.assertEqual(result, options)
+        self.assertEqual(offset, len(data) - 1)
+
+    @hypothesis.given(st.generic_protocol_options())
+    def test_skip_from(self, options):
+        data = b'\xcc\xcc' + protocol_options.encode(options) + b'\xcc'
+        offset = protocol_options.skip_from(memoryview(data), 2)
+        self.assertEqual(offset, len(data) - 1)
+
+    def test_skip_truncated(self):
+        for data in (b'', b'\x00\x01', b'\x09\x00\x00', b'\x02\x00',
+                     b'\x02\x00\x05\xff'):
+            with self.assertRaises(ValueError):
+                protocol_options.skip_from(memoryview(data))
+
+    def test_skip_unknown_option(self):
+        with self.assertRaises(ValueError):
+            protocol_options.skip_from(memoryview(b'\x0a\x00\xff'))
+
+    def test_skip_ldw_without_cam(self):
+        data = b'\x07\x00\x00\x00\x2a\x06\x00\xff'
+        with self.assertRaises(ValueError):
+            protocol_options.skip_from(memoryview(data))
+
     def test_decode_duplicate_options(self):
         data = b'\x00\x01\x00\x01'
         with self.assertRaises(ValueError):
             protocol_options.decode(memoryview(data))
 
+    def test_decode_unknown_option(self):
+        with self.assertRaises(ValueError):
+            protocol_options.decode(memoryview(b'\x0a\x00\xff'))
+
+    def test_decode_bad_option_value(self):
+        with self.assertRaisesRegex(ValueError, 'ChunkAddressingMethod'):
+            protocol_options.decode(memoryview(b'\x06\x2a\xff'))
+
+    def test_decode_truncated(self):
+        for data in (b'', b'\x00\x01', b'\x09\x00\x00', b'\x02\x00'):
+            with self.assertRaises(ValueError):
+                protocol_options.decode(memoryview(data))
+
+    def test_init_swarm_identifier_types(self):
+        view = memoryview(b'swarm')
+        options = protocol_options.ProtocolOptions(swarm_identifier=view)
+        self.assertIs(options.swarm_identifier, view)
+        # Other types are cast to the first of the accepted ones
+        options = protocol_options.ProtocolOptions(
+            swarm_identifier=bytearray(b'swarm'))
+        self.assertIs(type(options.swarm_identifier), bytes)
+        self.assertEqual(options.swarm_identifier, b'swarm')
+
     def test_init_bad_type(self):
         with self.assertRaises(TypeError):
             protocol_options.ProtocolOptions(version='42')
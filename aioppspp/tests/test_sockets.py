@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+#
+
+import socket
+import sys
+import unittest.mock
+
+import aioppspp.sockets
+
+
+class GSOTestCase(unittest.TestCase):
+
+    def test_batches_equal_size(self):
+        datagrams = [b'a' * 10] * 3
+        self.assertEqual(list(aioppspp.sockets.gso_batches(datagrams)),
+                         [(10, datagrams)])
+
+    def test_batches_shorter_tail(self):
+        datagrams = [b'a' * 10, b'b' * 10, b'c' * 5, b'd' * 10]
+        self.assertEqual(list(aioppspp.sockets.gso_batches(datagrams)),
+                         [(10, datagrams[:3]), (10, datagrams[3:])])
+
+    def test_batches_larger_datagram(self):
+        datagrams = [b'a' * 10, b'b' * 20, b'c' * 20]
+        self.assertEqual(list(aioppspp.sockets.gso_batches(datagrams)),
+                         [(10, datagrams[:1]), (20, datagrams[1:])])
+
+    def test_batches_limits(self):
+        datagrams = [b'a'] * (aioppspp.sockets.GSO_MAX_SEGMENTS + 1)
+        batches = list(aioppspp.sockets.gso_batches(datagrams))
+        self.assertEqual([len(batch) for _, batch in batches],
+                         [aioppspp.sockets.GSO_MAX_SEGMENTS, 1])
+
+        datagrams = [b'a' * 1500] * 50
+        batches = list(aioppspp.sockets.gso_batches(datagrams))
+        self.assertEqual([len(batch) for _, batch in batches], [43, 7])
+
+    def test_batches_empty(self):
+        self.assertEqual(list(aioppspp.sockets.gso_batches([])), [])
+
+    def test_not_supported_off_linux(self):
+        with unittest.mock.patch('sys.platform', 'darwin'):
+            self.assertFalse(aioppspp.sockets.gso_supported())
+
+    def test_send_segments(self):
+        sock = unittest.mock.Mock()
+        aioppspp.sockets.send_segments(sock, 10, [b'a' * 10], ('::1', 42))
+        sock.sendmsg.assert_called_once_with(
+            [b'a' * 10],
+            [(aioppspp.sockets.SOL_UDP, aioppspp.sockets.UDP_SEGMENT,
+              (10).to_bytes(2, sys.byteorder))],
+            0, ('::1', 42))
+
+
+class GROTestCase(unittest.TestCase):
+
+    def test_segment_size(self):
+        ancdata = [(0, 0, b''),
+                   (aioppspp.sockets.SOL_UDP, aioppspp.sockets.UDP_GRO,
+                    (1200).to_bytes(4, sys.byteorder))]
+        self.assertEqual(aioppspp.sockets.gro_segment_size(ancdata), 1200)
+        self.assertIsNone(aioppspp.sockets.gro_segment_size([]))
+
+    def test_split_segments(self):
+        data = b'a' * 10 + b'b' * 10 + b'c' * 5
+        segments = aioppspp.sockets.split_segments(data, 10)
+        self.assertEqual([segment.tobytes() for segment in segments],
+                         [b'a' * 10, b'b' * 10, b'c' * 5])
+        self.assertTrue(all(segment.obj is data for segment in segments))
+
+    def test_split_not_coalesced(self):
+        data = b'a' * 10
+        self.assertEqual(aioppspp.sockets.split_segments(data, None), [data])
+        self.assertEqual(aioppspp.sockets.split_segments(data, 10), [data])
+        self.assertIs(aioppspp.sockets.split_segments(data, None)[0], data)
+
+    def test_enable_gro_refused(self):
+        sock = unittest.mock.Mock()
+        sock.setsockopt.side_effect = OSError
+        self.assertFalse(aioppspp.sockets.enable_gro(sock))
+
+    def test_enable_gro_not_supported(self):
+        sock = unittest.mock.Mock()
+        with unittest.mock.patch('aioppspp.sockets.gso_supported',
+                                 return_value=False):
+            self.assertFalse(aioppspp.sockets.enable_gro(sock))
+        self.assertFalse(sock.setsockopt.called)
+
+
+class SocketOptionsTestCase(unittest.TestCase):
+
+    def new_socket(self, family=socket.AF_INET):
+        sock = socket.socket(family, socket.SOCK_DGRAM)
+        self.addCleanup(sock.close)
+        return sock
+
+    def test_apply(self):
+        sock = self.new_socket()
+        options = aioppspp.sockets.SocketOptions(rcvbuf=65536, sndbuf=65536,
+                                                 tos=0x20)
+        aioppspp.sockets.apply_socket_options(sock, options)
+        self.assertGreaterEqual(
+            sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF), 65536)
+        self.assertGreaterEqual(
+            sock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF), 65536)
+        self.assertEqual(
+            sock.getsockopt(socket.IPPROTO_IP, socket.IP_TOS), 0x20)
+
+    @unittest.skipUnless(socket.has_ipv6, 'IPv6 is not supported')
+    def test_apply_tos_ipv6(self):
+        sock = self.new_socket(socket.AF_INET6)
+        options = aioppspp.sockets.SocketOptions(tos=0x20)
+        aioppspp.sockets.apply_socket_options(sock, options)
+        self.assertEqual(
+            sock.getsockopt(socket.IPPROTO_IPV6,
+                            aioppspp.sockets.IPV6_TCLASS), 0x20)
+
+    def test_apply_nothing(self):
+        sock = unittest.mock.Mock()
+        aioppspp.sockets.apply_socket_options(
+            sock, aioppspp.sockets.SocketOptions())
+        self.assertFalse(sock.setsockopt.called)
+
+    @unittest.skipUnless(sys.platform.startswith('linux'), 'Linux only')
+    def test_force_buffer_size_not_permitted(self):
+        sock = unittest.mock.Mock()
+        sock.setsockopt.side_effect = [PermissionError, None]
+        aioppspp.sockets.apply_socket_options(
+            sock, aioppspp.sockets.SocketOptions(rcvbuf=1 << 20))
+        self.assertEqual(sock.setsockopt.call_args_list, [
+            unittest.mock.call(socket.SOL_SOCKET,
+                               aioppspp.sockets.SO_RCVBUFFORCE, 1 << 20),
+            unittest.mock.call(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20),
+        ])
+
+    def test_apply_busy_poll(self):
+        sock = unittest.mock.Mock()
+        aioppspp.sockets.apply_socket_options(
+            sock, aioppspp.sockets.SocketOptions(busy_poll=50))
+        sock.setsockopt.assert_called_once_with(
+            socket.SOL_SOCKET, aioppspp.sockets.SO_BUSY_POLL, 50)
+
+    def test_buffer_size_off_linux(self):
+        sock = unittest.mock.Mock()
+        with unittest.mock.patch('sys.platform', 'darwin'):
+            aioppspp.sockets.apply_socket_options(
+                sock, aioppspp.sockets.SocketOptions(sndbuf=1 << 20))
+        sock.setsockopt.assert_called_once_with(
+            socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 20)
+
+    def test_enable_rxq_ovfl(self):
+        self.assertTrue(aioppspp.sockets.enable_rxq_ovfl(self.new_socket()))
+        sock = unittest.mock.Mock()
+        sock.setsockopt.side_effect = OSError
+        self.assertFalse(aioppspp.sockets.enable_rxq_ovfl(sock))
+        # Platform without recvmsg()
+        with unittest.mock.patch('socket.socket', object):
+            self.assertFalse(aioppspp.sockets.enable_rxq_ovfl(sock))
+
+    def test_parse_ancdata(self):
+        ancdata = [(socket.SOL_SOCKET, aioppspp.sockets.SO_RXQ_OVFL,
+                    (42).to_bytes(4, sys.byteorder))]
+        self.assertEqual(aioppspp.sockets.parse_ancdata(ancdata), (None, 42))
+        self.assertEqual(aioppspp.sockets.parse_ancdata([]), (None, None))
@@ -13,7 +13,14 @@
 # the License.
 #
 
+import asyncio
+import errno
+import socket
+import unittest.mock
+
+import aioppspp.buffers
 import aioppspp.connection
+import aioppspp.sockets
 import aioppspp.tests.utils
 import aioppspp.udp
 
@@ -41,3 +48,793 @@ class TestUDP(aioppspp.tests.utils.TestCase):
 
         server.close()
         client.close()
+
+    async def test_bounded_buffer(self):
+        connector = aioppspp.udp.Connector(
+            maxsize=2, drop_policy=aioppspp.buffers.DropPolicy.newest,
+            loop=self.loop)
+        server_address = aioppspp.connection.Address('127.0.0.1', 0)
+        server = await connector.listen(server_address)
+        client = await connector.connect(server.protocol.local_address)
+
+        for data in (b'1', b'2', b'3'):
+            await client.send(data)
+        while server.protocol.dropped_count < 1:
+            await asyncio.sleep(0.01, loop=self.loop)
+        self.assertEqual(server.protocol.queue_depth, 2)
+        data, _ = await server.recv()
+        self.assertEqual(data, b'1')
+        data, _ = await server.recv()
+        self.assertEqual(data, b'2')
+        self.assertEqual(server.protocol.queue_depth, 0)
+
+        server.close()
+        client.close()
+        connector.close()
+
+    async def test_handler_mode(self):
+        connector = self.new_connector()
+        server_address = aioppspp.connection.Address('127.0.0.1', 0)
+        server = await connector.listen(server_address)
+        client = await connector.connect(server.protocol.local_address)
+
+        received = asyncio.Future(loop=self.loop)
+        server.protocol.set_handler(
+            lambda data, addr: received.set_result((data, addr)))
+        await client.send(b'ping')
+        data, addr = await received
+        self.assertEqual(data, b'ping')
+        self.assertEqual(addr, client.local_address)
+        self.assertEqual(server.protocol.queue_depth, 0)
+
+        server.protocol.set_handler(None)
+        self.assertIsNone(server.protocol.handler)
+        await client.send(b'pong')
+        data, _ = await server.recv()
+        self.assertEqual(data, b'pong')
+
+        server.close()
+        client.close()
+        connector.close()
+
+    def test_bad_handler(self):
+        with self.assertRaises(TypeError):
+            aioppspp.udp.Protocol(handler=object(), loop=self.loop)
+
+    async def test_send_many(self):
+        connector = aioppspp.udp.Connector(gso=True, loop=self.loop)
+        server_address = aioppspp.connection.Address('127.0.0.1', 0)
+        server = await connector.listen(server_address)
+        client = await connector.connect(server.protocol.local_address)
+
+        datagrams = [b'a' * 100, b'b' * 100, b'c' * 50, b'd' * 10]
+        await client.send_many(datagrams)
+        batch = []
+        while len(batch) < len(datagrams):
+            batch.extend(await server.recv_many(10))
+        self.assertEqual([data for data, _ in batch], datagrams)
+
+        server.close()
+        client.close()
+        connector.close()
+
+    async def test_send_many_gso_refused(self):
+        connector = aioppspp.udp.Connector(gso=True, loop=self.loop)
+        server_address = aioppspp.connection.Address('127.0.0.1', 0)
+        server = await connector.listen(server_address)
+        client = await connector.connect(server.protocol.local_address)
+        client.protocol._gso = True
+
+        datagrams = [b'a' * 100, b'b' * 100]
+        with unittest.mock.patch('aioppspp.sockets.send_segments',
+                                 side_effect=OSError(errno.EIO, 'EIO')):
+            await client.send_many(datagrams)
+        self.assertFalse(client.protocol.gso)
+        self.assertEqual(client.protocol.gso_sends, 0)
+        batch = []
+        while len(batch) < len(datagrams):
+            batch.extend(await server.recv_many(10))
+        self.assertEqual([data for data, _ in batch], datagrams)
+
+        server.close()
+        client.close()
+        connector.close()
+
+    async def test_send_many_keeps_order_after_eagain(self):
+        protocol = aioppspp.udp.Protocol(gso=True, loop=self.loop)
+        protocol._gso = True
+        buffered = []
+        transport = unittest.mock.Mock()
+        transport.get_write_buffer_size.side_effect = lambda: len(buffered)
+        transport.sendto.side_effect = lambda data, addr: buffered.append(data)
+        protocol.connection_made(transport)
+
+        datagrams = [b'a' * 50, b'b' * 50, b'c' * 100, b'd' * 100]
+        with unittest.mock.patch(
+                'aioppspp.sockets.send_segments',
+                side_effect=BlockingIOError(errno.EAGAIN, 'EAGAIN')) as mock:
+            await protocol.send_many(datagrams)
+        # The second batch is not sent past the buffered first one
+        self.assertEqual(mock.call_count, 1)
+        self.assertEqual(protocol.gso_sends, 0)
+        # Transport flushes its buffer in order
+        self.assertEqual(buffered, datagrams)
+
+    async def test_send_many_counters(self):
+        protocol = aioppspp.udp.Protocol(gso=True, loop=self.loop)
+        protocol._gso = True
+        transport = unittest.mock.Mock()
+        transport.get_write_buffer_size.return_value = 0
+        protocol.connection_made(transport)
+        datagrams = [b'a' * 100, b'b' * 100, b'c' * 10]
+        with unittest.mock.patch('aioppspp.sockets.send_segments') as mock:
+            await protocol.send_many(datagrams)
+        self.assertEqual(mock.call_count, 1)
+        self.assertEqual(protocol.gso_sends, 1)
+        self.assertEqual(protocol.gso_segments, 3)
+        self.assertFalse(transport.sendto.called)
+
+    async def test_send_many_error(self):
+        protocol = aioppspp.udp.Protocol(gso=True, loop=self.loop)
+        protocol._gso = True
+        transport = unittest.mock.Mock()
+        transport.get_write_buffer_size.return_value = 0
+        protocol.connection_made(transport)
+        datagrams = [b'a' * 100, b'b' * 100]
+        error = OSError(errno.ECONNREFUSED, 'ECONNREFUSED')
+        with unittest.mock.patch('aioppspp.sockets.send_segments',
+                                 side_effect=error):
+            await protocol.send_many(datagrams)
+        # Transport reports errors other than GSO refusal as usual
+        self.assertTrue(protocol.gso)
+        self.assertEqual(protocol.gso_sends, 0)
+        self.assertEqual(transport.sendto.call_args_list,
+                         [unittest.mock.call(data, None)
+                          for data in datagrams])
+
+    async def test_gro(self):
+        connector = aioppspp.udp.Connector(gso=True, gro=True, loop=self.loop)
+        server_address = aioppspp.connection.Address('127.0.0.1', 0)
+        server = await connector.listen(server_address)
+        client = await connector.connect(server.protocol.local_address)
+        await asyncio.sleep(0, loop=self.loop)
+
+        datagrams = [b'a' * 100, b'b' * 100, b'c' * 50]
+        await client.send_many(datagrams)
+        batch = []
+        while len(batch) < len(datagrams):
+            batch.extend(await server.recv_many(10))
+        self.assertEqual([bytes(data) for data, _ in batch], datagrams)
+        self.assertEqual({addr for _, addr in batch}, {client.local_address})
+
+        server.close()
+        client.close()
+        connector.close()
+
+    async def test_gro_not_supported(self):
+        connector = aioppspp.udp.Connector(gro=True, loop=self.loop)
+        with unittest.mock.patch('aioppspp.sockets.enable_gro',
+                                 return_value=False):
+            server = await connector.listen(
+                aioppspp.connection.Address('127.0.0.1', 0))
+            await asyncio.sleep(0, loop=self.loop)
+        self.assertFalse(server.protocol.gro)
+        client = await connector.connect(server.protocol.local_address)
+
+        await client.send(b'ping')
+        data, _ = await server.recv()
+        self.assertEqual(data, b'ping')
+
+        server.close()
+        client.close()
+        connector.close()
+
+    def test_gro_reader_errors(self):
+        protocol = aioppspp.udp.Protocol(gro=True, loop=self.loop)
+        protocol.connection_made(unittest.mock.Mock())
+        protocol.error_received = unittest.mock.Mock()
+        sock = unittest.mock.Mock()
+        sock.recvmsg.side_effect = BlockingIOError
+        protocol._read_msg(sock)
+        self.assertFalse(protocol.error_received.called)
+        sock.recvmsg.side_effect = ConnectionRefusedError
+        protocol._read_msg(sock)
+        self.assertTrue(protocol.error_received.called)
+        self.assertEqual(protocol.queue_depth, 0)
+
+    def test_gro_reader_connection_lost(self):
+        protocol = aioppspp.udp.Protocol(gro=True, loop=self.loop)
+        protocol.connection_made(unittest.mock.Mock())
+        protocol.connection_lost(None)
+        loop, sock = unittest.mock.Mock(), unittest.mock.Mock()
+        # Connection is lost before the reader is installed or called
+        protocol._start_reader(loop)
+        self.assertFalse(loop.add_reader.called)
+        protocol._read_msg(sock)
+        self.assertFalse(sock.recvmsg.called)
+
+    async def test_ring_reader(self):
+        connector = aioppspp.udp.Connector(ring_slots=2, loop=self.loop)
+        server_address = aioppspp.connection.Address('127.0.0.1', 0)
+        server = await connector.listen(server_address)
+        client = await connector.connect(server.protocol.local_address)
+        await asyncio.sleep(0, loop=self.loop)
+
+        datagrams = [b'a' * 100, b'b' * 10, b'c' * 50]
+        await client.send_many(datagrams)
+        batch = []
+        while len(batch) < len(datagrams):
+            batch.extend(await server.recv_many(10))
+        # Queued datagrams are copied out of the ring
+        self.assertEqual([data for data, _ in batch], datagrams)
+        self.assertTrue(all(type(data) is bytes for data, _ in batch))
+
+        received = []
+        server.protocol.set_handler(
+            lambda data, addr: received.append(type(data)))
+        await client.send(b'ping')
+        while not received:
+            await asyncio.sleep(0.01, loop=self.loop)
+        self.assertEqual(received, [memoryview])
+
+        server.close()
+        client.close()
+        connector.close()
+
+    def test_ring_reads_per_wakeup(self):
+        protocol = aioppspp.udp.Protocol(ring_slots=4, reads_per_wakeup=2,
+                                         loop=self.loop)
+        protocol.connection_made(unittest.mock.Mock())
+        sock = unittest.mock.Mock()
+        sock.recvfrom_into.return_value = (1, ('127.0.0.1', 1))
+        protocol._read_ring(sock)
+        self.assertEqual(sock.recvfrom_into.call_count, 2)
+        self.assertEqual(protocol.queue_depth, 2)
+
+        sock.recvfrom_into.side_effect = BlockingIOError
+        protocol._read_ring(sock)
+        self.assertEqual(protocol.queue_depth, 2)
+
+    def test_ring_reader_connection_lost(self):
+        protocol = aioppspp.udp.Protocol(ring_slots=4, loop=self.loop)
+        protocol.connection_made(unittest.mock.Mock())
+        sock = unittest.mock.Mock()
+        sock.recvfrom_into.return_value = (1, ('127.0.0.1', 1))
+        # Handler may close the connection in the middle of the drain
+        protocol.set_handler(lambda data, addr: protocol.connection_lost(None))
+        protocol._read_ring(sock)
+        self.assertEqual(sock.recvfrom_into.call_count, 1)
+
+    def test_ring_reader_error(self):
+        protocol = aioppspp.udp.Protocol(ring_slots=4, loop=self.loop)
+        protocol.connection_made(unittest.mock.Mock())
+        protocol.error_received = unittest.mock.Mock()
+        sock = unittest.mock.Mock()
+        sock.recvfrom_into.side_effect = ConnectionRefusedError
+        protocol._read_ring(sock)
+        self.assertTrue(protocol.error_received.called)
+
+    async def test_ring_slot_size(self):
+        connector = aioppspp.udp.Connector(ring_slots=2, ring_slot_size=1500,
+                                           loop=self.loop)
+        server_address = aioppspp.connection.Address('127.0.0.1', 0)
+        server = await connector.listen(server_address)
+        self.assertEqual(len(server.protocol._ring), 2)
+        self.assertEqual(server.protocol._ring.slot_size, 1500)
+        client = await connector.connect(server.protocol.local_address)
+        await client.send(b'x' * 1500)
+        data, _ = await server.recv()
+        self.assertEqual(data, b'x' * 1500)
+        server.close()
+        client.close()
+        connector.close()
+
+        connector = aioppspp.udp.Connector(ring_slots=2, ring_slot_size=1500,
+                                           shared_sockets=1, loop=self.loop)
+        await connector.connect(server_address._replace(port=1))
+        multiplexer, = connector.multiplexers
+        self.assertEqual(multiplexer._ring.slot_size, 1500)
+        connector.close()
+
+    async def test_ring_slot_overflow(self):
+        for rxq_ovfl in (False, True):
+            connector = aioppspp.udp.Connector(
+                ring_slots=2, ring_slot_size=100, rxq_ovfl=rxq_ovfl,
+                loop=self.loop)
+            server = await connector.listen(
+                aioppspp.connection.Address('127.0.0.1', 0))
+            client = await connector.connect(server.protocol.local_address)
+            await asyncio.sleep(0, loop=self.loop)
+            self.assertEqual(server.protocol.truncated_count, 0)
+            # Datagrams which don't fit into the slot are not delivered cut
+            await client.send_many([b'x' * 101, b'y' * 100])
+            data, _ = await server.recv()
+            self.assertEqual(data, b'y' * 100)
+            self.assertEqual(server.protocol.truncated_count, 1)
+            server.close()
+            client.close()
+            connector.close()
+
+    def test_ring_reader_public_loop_methods(self):
+        protocol = aioppspp.udp.Protocol(ring_slots=4, loop=self.loop)
+        transport = unittest.mock.Mock()
+        transport._sock.fileno.return_value = 42
+        protocol.connection_made(transport)
+        # Loops which don't guard transport file descriptors
+        loop = unittest.mock.Mock(spec=['add_reader', 'remove_reader'])
+        protocol._start_reader(loop)
+        loop.remove_reader.assert_called_once_with(42)
+        loop.add_reader.assert_called_once_with(
+            42, protocol._read_ring, transport._sock)
+        # Reader scheduled on the test loop must not touch the fake socket
+        protocol.connection_lost(None)
+
+    def test_ring_reader_bad_params(self):
+        with self.assertRaises(ValueError):
+            aioppspp.udp.Protocol(gro=True, ring_slots=4, loop=self.loop)
+        with self.assertRaises(ValueError):
+            aioppspp.udp.Protocol(ring_slots=4, ring_slot_size=0,
+                                  loop=self.loop)
+        with self.assertRaises(ValueError):
+            aioppspp.udp.Protocol(reads_per_wakeup=0, loop=self.loop)
+
+    async def test_kernel_drops(self):
+        connector = aioppspp.udp.Connector(rxq_ovfl=True, loop=self.loop)
+        await self.check_kernel_drops(connector)
+
+    async def test_ring_reader_kernel_drops(self):
+        connector = aioppspp.udp.Connector(ring_slots=4, rxq_ovfl=True,
+                                           loop=self.loop)
+        await self.check_kernel_drops(connector)
+
+    async def check_kernel_drops(self, connector):
+        server = await connector.listen(
+            aioppspp.connection.Address('127.0.0.1', 0),
+            socket_options=aioppspp.sockets.SocketOptions(rcvbuf=1024))
+        await asyncio.sleep(0, loop=self.loop)
+        self.assertEqual(server.protocol.kernel_dropped_count, 0)
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.addCleanup(sock.close)
+        # Overrun the socket buffer without letting the loop read it
+        for _ in range(100):
+            sock.sendto(b'x' * 1000, server.local_address)
+        await server.recv_many(100, 0.1)
+        # The kernel reports drops with the datagrams queued after them
+        sock.sendto(b'y', server.local_address)
+        data = None
+        while data != b'y':
+            data, _ = await server.recv()
+            # Datagrams read with recvmsg or into the ring are still bytes
+            self.assertIs(type(data), bytes)
+        self.assertGreater(server.protocol.kernel_dropped_count, 0)
+
+        server.close()
+        connector.close()
+
+    def test_kernel_drops_not_tracked(self):
+        protocol = aioppspp.udp.Protocol(loop=self.loop)
+        self.assertIsNone(protocol.kernel_dropped_count)
+
+    async def test_kernel_drops_not_supported(self):
+        connector = aioppspp.udp.Connector(rxq_ovfl=True, loop=self.loop)
+        with unittest.mock.patch('aioppspp.sockets.enable_rxq_ovfl',
+                                 return_value=False):
+            server = await connector.listen(
+                aioppspp.connection.Address('127.0.0.1', 0))
+            await asyncio.sleep(0, loop=self.loop)
+        self.assertIsNone(server.protocol.kernel_dropped_count)
+        client = await connector.connect(server.protocol.local_address)
+        await client.send(b'ping')
+        data, _ = await server.recv()
+        self.assertEqual(data, b'ping')
+        server.close()
+        client.close()
+        connector.close()
+
+    async def test_bad_socket_options(self):
+        connector = aioppspp.udp.Connector(
+            socket_options=aioppspp.sockets.SocketOptions(busy_poll=10),
+            loop=self.loop)
+        with unittest.mock.patch('aioppspp.sockets.apply_socket_options',
+                                 side_effect=PermissionError):
+            with self.assertRaises(ConnectionError):
+                await connector.listen(
+                    aioppspp.connection.Address('127.0.0.1', 0))
+        connector.close()
+
+    async def test_send_waits_while_paused(self):
+        protocol = aioppspp.udp.Protocol(write_high_water=1024,
+                                         write_low_water=256,
+                                         loop=self.loop)
+        transport = unittest.mock.Mock()
+        protocol.connection_made(transport)
+        transport.set_write_buffer_limits.assert_called_once_with(1024, 256)
+
+        protocol.pause_writing()
+        self.assertTrue(protocol.writing_paused)
+        tasks = [self.loop.create_task(protocol.send(b'data'))
+                 for _ in range(2)]
+        await asyncio.sleep(0, loop=self.loop)
+        self.assertFalse(any(task.done() for task in tasks))
+        self.assertFalse(transport.sendto.called)
+
+        protocol.send_nowait(b'urgent')
+        transport.sendto.assert_called_once_with(b'urgent', None)
+
+        protocol.resume_writing()
+        await asyncio.wait(tasks, loop=self.loop)
+        self.assertFalse(protocol.writing_paused)
+        self.assertEqual(transport.sendto.call_count, 3)
+
+    async def test_send_cancelled_while_paused(self):
+        protocol = aioppspp.udp.Protocol(loop=self.loop)
+        transport = unittest.mock.Mock()
+        protocol.connection_made(transport)
+        self.assertFalse(transport.set_write_buffer_limits.called)
+
+        protocol.pause_writing()
+        task1 = self.loop.create_task(protocol.send(b'1'))
+        task2 = self.loop.create_task(protocol.send(b'2'))
+        await asyncio.sleep(0, loop=self.loop)
+        task1.cancel()
+        protocol.resume_writing()
+        await task2
+        transport.sendto.assert_called_once_with(b'2', None)
+
+    async def test_send_connection_lost_while_paused(self):
+        protocol = aioppspp.udp.Protocol(loop=self.loop)
+        protocol.connection_made(unittest.mock.Mock())
+        protocol.pause_writing()
+        task = self.loop.create_task(protocol.send(b'data'))
+        await asyncio.sleep(0, loop=self.loop)
+        protocol.connection_lost(None)
+        with self.assertRaises(ConnectionError):
+            await task
+        self.assertFalse(protocol.writing_paused)
+
+
+class TestSharedSockets(aioppspp.tests.utils.TestCase):
+
+    async def listen(self, connector, count):
+        address = aioppspp.connection.Address('127.0.0.1', 0)
+        return [await connector.listen(address) for _ in range(count)]
+
+    def test_bad_shared_sockets(self):
+        with self.assertRaises(ValueError):
+            aioppspp.udp.Connector(shared_sockets=-1, loop=self.loop)
+
+    async def test_route_by_source_address(self):
+        servers_connector = aioppspp.udp.Connector(loop=self.loop)
+        servers = await self.listen(servers_connector, 3)
+        connector = aioppspp.udp.Connector(shared_sockets=1, loop=self.loop)
+        self.assertEqual(connector.shared_sockets, 1)
+        clients = [await connector.connect(server.local_address)
+                   for server in servers]
+        multiplexer, = connector.multiplexers
+        self.assertEqual(len(multiplexer), 3)
+
+        for index, (client, server) in enumerate(zip(clients, servers)):
+            self.assertEqual(client.local_address, multiplexer.local_address)
+            self.assertEqual(client.remote_address, server.local_address)
+            await client.send(str(index).encode())
+            data, client_address = await server.recv()
+            self.assertEqual(data, str(index).encode())
+            self.assertEqual(client_address.port,
+                             multiplexer.local_address.port)
+        for index, server in reversed(list(enumerate(servers))):
+            await server.send(b'reply' + str(index).encode(), client_address)
+        for index, client in enumerate(clients):
+            data, address = await client.recv()
+            self.assertEqual(data, b'reply' + str(index).encode())
+            self.assertEqual(address, servers[index].local_address)
+            self.assertEqual(client.protocol.queue_depth, 0)
+
+        clients[0].close()
+        await asyncio.sleep(0, loop=self.loop)
+        self.assertEqual(len(multiplexer), 2)
+        await servers[0].send(b'unrouted', client_address)
+        while not multiplexer.unrouted_count:
+            await asyncio.sleep(0.01, loop=self.loop)
+
+        connector.close()
+        self.assertTrue(multiplexer.closed)
+        self.assertFalse(connector.multiplexers)
+        connector.close()
+        self.assertFalse(connector.multiplexers)
+        servers_connector.close()
+
+    async def test_send_many(self):
+        servers_connector = aioppspp.udp.Connector(loop=self.loop)
+        server, = await self.listen(servers_connector, 1)
+        connector = aioppspp.udp.Connector(shared_sockets=1, gso=True,
+                                           loop=self.loop)
+        client = await connector.connect(server.local_address)
+        datagrams = [b'x' * 100] * 4
+        await client.send_many(datagrams)
+        received = []
+        while len(received) < 4:
+            received.extend(await server.recv_many(4))
+        self.assertEqual([data for data, _ in received], datagrams)
+        connector.close()
+        servers_connector.close()
+
+    async def test_same_peer_spread(self):
+        servers_connector = aioppspp.udp.Connector(loop=self.loop)
+        server, = await self.listen(servers_connector, 1)
+        connector = aioppspp.udp.Connector(shared_sockets=2, loop=self.loop)
+        endpoints = [await connector.create_endpoint(
+            remote_address=server.local_address) for _ in range(3)]
+        multiplexers = [multiplexer.local_address
+                        for multiplexer in connector.multiplexers]
+        self.assertEqual(len(multiplexers), 2)
+        self.assertEqual(sorted(endpoint.local_address
+                                for endpoint in endpoints[:2]),
+                         sorted(multiplexers))
+        # All shared sockets serve the peer, so it gets a dedicated one
+        dedicated = endpoints[2]
+        self.assertNotIn(dedicated.local_address, multiplexers)
+        await dedicated.send(b'data')
+        data, address = await server.recv()
+        self.assertEqual(data, b'data')
+        await server.send(b'reply', address)
+        data, _ = await dedicated.recv()
+        self.assertEqual(data, b'reply')
+        for endpoint in endpoints:
+            endpoint.close()
+        connector.close()
+        servers_connector.close()
+
+    async def test_limit_after_transport_lost(self):
+        servers_connector = aioppspp.udp.Connector(loop=self.loop)
+        server, = await self.listen(servers_connector, 1)
+        for shared_sockets in (0, 1):
+            connector = aioppspp.udp.Connector(
+                limit=1, connection_timeout=1, shared_sockets=shared_sockets,
+                loop=self.loop)
+            for _ in range(3):
+                client = await connector.connect(server.local_address)
+                if shared_sockets:
+                    connector.multiplexers[0].transport.close()
+                else:
+                    client.protocol.transport.close()
+                await asyncio.sleep(0, loop=self.loop)
+                self.assertTrue(client.closed)
+                client.close()
+            connector.close()
+        servers_connector.close()
+
+    async def test_same_peer_dedicated_socket(self):
+        servers_connector = aioppspp.udp.Connector(loop=self.loop)
+        server, = await self.listen(servers_connector, 1)
+        connector = aioppspp.udp.Connector(shared_sockets=1, loop=self.loop)
+        client0 = await connector.connect(server.local_address)
+        client1 = await connector.connect(server.local_address)
+        multiplexer, = connector.multiplexers
+        self.assertEqual(len(multiplexer), 1)
+        self.assertEqual(client0.local_address, multiplexer.local_address)
+        # The shared socket already serves the peer
+        self.assertIsNot(client1.protocol, client0.protocol)
+        self.assertNotEqual(client1.local_address, multiplexer.local_address)
+        self.assertNotIsInstance(client1.protocol.transport,
+                                 aioppspp.udp._BoundTransport)
+
+        receivers = [self.loop.create_task(client.recv())
+                     for client in (client0, client1)]
+        await asyncio.sleep(0, loop=self.loop)
+        for index, client in enumerate((client0, client1)):
+            await client.send(str(index).encode())
+            data, address = await server.recv()
+            self.assertEqual(data, str(index).encode())
+            await server.send(b'reply' + data, address)
+        received = await asyncio.gather(*receivers, loop=self.loop)
+        self.assertEqual([data for data, _ in received],
+                         [b'reply0', b'reply1'])
+        self.assertEqual(client0.protocol.queue_depth, 0)
+        self.assertEqual(client1.protocol.queue_depth, 0)
+
+        client0.close()
+        client1.close()
+        connector.close()
+        servers_connector.close()
+
+    async def test_concurrent_connects_to_same_peer(self):
+        servers_connector = aioppspp.udp.Connector(loop=self.loop)
+        server, = await self.listen(servers_connector, 1)
+        connector = aioppspp.udp.Connector(shared_sockets=2, loop=self.loop)
+        clients = await asyncio.gather(
+            *[connector.connect(server.local_address) for _ in range(2)],
+            loop=self.loop)
+        # Each connection gets its own endpoint on another shared socket
+        self.assertIsNot(clients[0].protocol, clients[1].protocol)
+        self.assertEqual(sorted(client.local_address for client in clients),
+                         sorted(multiplexer.local_address
+                                for multiplexer in connector.multiplexers))
+        for multiplexer in connector.multiplexers:
+            self.assertEqual(len(multiplexer), 1)
+
+        receivers = [self.loop.create_task(client.recv())
+                     for client in clients]
+        await asyncio.sleep(0, loop=self.loop)
+        for index, client in enumerate(clients):
+            await client.send(str(index).encode())
+            data, address = await server.recv()
+            self.assertEqual(data, str(index).encode())
+            await server.send(b'reply' + data, address)
+        received = await asyncio.gather(*receivers, loop=self.loop)
+        self.assertEqual([data for data, _ in received],
+                         [b'reply0', b'reply1'])
+
+        for client in clients:
+            client.close()
+        await asyncio.sleep(0, loop=self.loop)
+        for multiplexer in connector.multiplexers:
+            self.assertEqual(len(multiplexer), 0)
+        connector.close()
+        servers_connector.close()
+
+    async def test_per_connection_options_rejected(self):
+        connector = aioppspp.udp.Connector(shared_sockets=1, loop=self.loop)
+        address = aioppspp.connection.Address('127.0.0.1', 1)
+        with self.assertRaises(ValueError):
+            await connector.connect(address, reuse_port=True)
+        with self.assertRaises(ValueError):
+            await connector.connect(
+                address,
+                socket_options=aioppspp.sockets.SocketOptions(tos=0x10))
+        self.assertFalse(connector.multiplexers)
+        connector.close()
+
+    async def test_listen_is_not_shared(self):
+        connector = aioppspp.udp.Connector(shared_sockets=1, loop=self.loop)
+        server, = await self.listen(connector, 1)
+        self.assertNotIsInstance(server.protocol.transport,
+                                 aioppspp.udp._BoundTransport)
+        self.assertFalse(connector.multiplexers)
+        connector.close()
+
+    async def test_multiplexer_lost(self):
+        servers_connector = aioppspp.udp.Connector(loop=self.loop)
+        server, = await self.listen(servers_connector, 1)
+        connector = aioppspp.udp.Connector(shared_sockets=1, loop=self.loop)
+        client = await connector.connect(server.local_address)
+        multiplexer, = connector.multiplexers
+        multiplexer.transport.close()
+        await asyncio.sleep(0, loop=self.loop)
+        self.assertTrue(client.closed)
+        client.close()
+        # New shared socket is created on demand
+        client = await connector.connect(server.local_address)
+        self.assertIsNot(connector.multiplexers[0], multiplexer)
+        connector.close()
+        servers_connector.close()
+
+    async def test_bound_transport(self):
+        servers_connector = aioppspp.udp.Connector(loop=self.loop)
+        server, = await self.listen(servers_connector, 1)
+        connector = aioppspp.udp.Connector(shared_sockets=1, loop=self.loop)
+        client = await connector.connect(server.local_address)
+        multiplexer, = connector.multiplexers
+        shared = multiplexer.transport
+        transport = client.protocol.transport
+        self.assertIsInstance(transport, aioppspp.udp._BoundTransport)
+
+        self.assertEqual(transport.get_extra_info('peername'),
+                         server.local_address)
+        self.assertEqual(transport.get_extra_info('sockname'),
+                         shared.get_extra_info('sockname'))
+        self.assertIsNone(transport.get_extra_info('unknown'))
+        sock = transport.get_extra_info('socket')
+        self.assertEqual(sock.getpeername(), server.local_address)
+        self.assertEqual(sock.fileno(),
+                         shared.get_extra_info('socket').fileno())
+        sock.sendmsg([b'bound'])
+        sock.sendmsg([b'addressed'], (), 0, server.local_address)
+        transport.sendto(b'sent', server.local_address)
+        for expected in (b'bound', b'addressed', b'sent'):
+            data, _ = await server.recv()
+            self.assertEqual(data, expected)
+
+        self.assertEqual(transport.get_write_buffer_size(), 0)
+        limits = shared.get_write_buffer_limits()
+        self.assertEqual(transport.get_write_buffer_limits(), limits)
+        # Limits belong to the shared transport
+        transport.set_write_buffer_limits(high=1, low=0)
+        self.assertEqual(shared.get_write_buffer_limits(), limits)
+
+        multiplexer.pause_writing()
+        self.assertTrue(client.protocol.writing_paused)
+        sender = self.loop.create_task(client.send(b'resumed'))
+        await asyncio.sleep(0, loop=self.loop)
+        self.assertFalse(sender.done())
+        multiplexer.resume_writing()
+        await sender
+        data, _ = await server.recv()
+        self.assertEqual(data, b'resumed')
+
+        self.assertFalse(transport.is_closing())
+        transport.abort()
+        self.assertTrue(transport.is_closing())
+        self.assertNotIn(server.local_address, multiplexer)
+        transport.sendto(b'dropped')
+        transport.close()
+        shared.sendto(b'shared', server.local_address)
+        data, _ = await server.recv()
+        self.assertEqual(data, b'shared')
+        self.assertTrue(client.closed)
+        client.close()
+        connector.close()
+        servers_connector.close()
+
+    async def test_attach_to_closed_multiplexer(self):
+        servers_connector = aioppspp.udp.Connector(loop=self.loop)
+        server, = await self.listen(servers_connector, 1)
+        connector = aioppspp.udp.Connector(shared_sockets=1, loop=self.loop)
+        client = await connector.connect(server.local_address)
+        transport = client.protocol.transport
+        multiplexer, = connector.multiplexers
+        multiplexer.transport.close()
+        self.assertTrue(transport.is_closing())
+        await asyncio.sleep(0, loop=self.loop)
+        self.assertTrue(multiplexer.closed)
+        self.assertTrue(transport.is_closing())
+        with self.assertRaises(ConnectionError):
+            multiplexer.attach(server.local_address,
+                               aioppspp.udp.Protocol(loop=self.loop))
+        # Multiplexer has already detached and closed the protocol
+        transport.close()
+        self.assertTrue(transport.is_closing())
+        client.close()
+        connector.close()
+        servers_connector.close()
+
+    def test_bound_transport_without_is_closing(self):
+        multiplexer = aioppspp.udp.Multiplexer(loop=self.loop)
+        # Transports have no is_closing() before Python 3.5.1
+        multiplexer.connection_made(unittest.mock.Mock(spec=['_sock']))
+        protocol = aioppspp.udp.Protocol(loop=self.loop)
+        multiplexer.attach(aioppspp.connection.Address('127.0.0.1', 1),
+                           protocol)
+        self.assertFalse(protocol.transport.is_closing())
+        protocol.transport.close()
+        self.assertTrue(protocol.transport.is_closing())
+
+    async def test_ipv6(self):
+        servers_connector = aioppspp.udp.Connector(loop=self.loop)
+        server = await servers_connector.listen(
+            aioppspp.connection.Address('::1', 0), family=socket.AF_INET6)
+        connector = aioppspp.udp.Connector(shared_sockets=1, loop=self.loop)
+        client = await connector.connect(server.local_address,
+                                         family=socket.AF_INET6)
+        multiplexer, = connector.multiplexers
+        self.assertEqual(multiplexer.transport.get_extra_info('socket').family,
+                         socket.AF_INET6)
+        self.assertEqual(client.local_address, multiplexer.local_address)
+        await client.send(b'ping')
+        data, address = await server.recv()
+        self.assertEqual(data, b'ping')
+        await server.send(b'pong', address)
+        data, address = await client.recv()
+        self.assertEqual(data, b'pong')
+        self.assertEqual(address, server.local_address)
+        client.close()
+        connector.close()
+        servers_connector.close()
+
+    def test_write_flow_control(self):
+        multiplexer = aioppspp.udp.Multiplexer(loop=self.loop)
+        multiplexer.connection_made(unittest.mock.Mock())
+        address0 = aioppspp.connection.Address('127.0.0.1', 1)
+        address1 = aioppspp.connection.Address('127.0.0.1', 2)
+        protocol0 = aioppspp.udp.Protocol(loop=self.loop)
+        protocol1 = aioppspp.udp.Protocol(loop=self.loop)
+        multiplexer.attach(address0, protocol0)
+        multiplexer.pause_writing()
+        multiplexer.attach(address1, protocol1)
+        self.assertTrue(protocol0.writing_paused)
+        self.assertTrue(protocol1.writing_paused)
+        multiplexer.resume_writing()
+        self.assertFalse(protocol0.writing_paused)
+        self.assertFalse(protocol1.writing_paused)
+        with self.assertRaises(ValueError):
+            multiplexer.attach(address0, protocol1)
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+#
+
+import unittest
+
+import hypothesis
+
+import aioppspp.channel_ids
+import aioppspp.datagrams
+import aioppspp.messages
+import aioppspp.validation
+from aioppspp.messages.protocol_options import (
+    ProtocolOptions,
+)
+from . import strategies as st
+
+
+class ValidationTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(aioppspp.validation.set_strict,
+                        aioppspp.validation.is_strict())
+
+    def test_fast_by_default(self):
+        self.assertFalse(aioppspp.validation.is_strict())
+
+    def test_set_strict(self):
+        aioppspp.validation.set_strict()
+        self.assertTrue(aioppspp.validation.is_strict())
+        aioppspp.validation.set_strict(False)
+        self.assertFalse(aioppspp.validation.is_strict())
+
+    def test_trusted_skips_checks(self):
+        aioppspp.validation.set_strict(False)
+        channel_id = aioppspp.channel_ids.ChannelID._from_trusted(b'12')
+        self.assertEqual(channel_id, b'12')
+        options = ProtocolOptions._from_trusted(*(['42'] * 10))
+        self.assertEqual(options.version, '42')
+        message = aioppspp.messages.Handshake._from_trusted(b'12', {})
+        self.assertEqual(message.source_channel_id, b'12')
+        datagram = aioppspp.datagrams.Datagram._from_trusted(b'12', [42])
+        self.assertEqual(datagram.messages, [42])
+
+    def test_strict_validates(self):
+        aioppspp.validation.set_strict()
+        with self.assertRaises(ValueError):
+            aioppspp.channel_ids.ChannelID._from_trusted(b'12')
+        with self.assertRaises(TypeError):
+            ProtocolOptions._from_trusted(*(['42'] * 10))
+        with self.assertRaises(ValueError):
+            aioppspp.messages.Handshake._from_trusted(b'12', {})
+        with self.assertRaises(AssertionError):
+            aioppspp.datagrams.Datagram._from_trusted(b'1234', [42])
+
+    @hypothesis.given(st.handshake())
+    def test_decode_strict_and_fast(self, message):
+        datagram = aioppspp.datagrams.Datagram(
+            aioppspp.channel_ids.ZeroChannelID, [message])
+        data = memoryview(aioppspp.datagrams.encode(datagram))
+        aioppspp.validation.set_strict(False)
+        fast = aioppspp.datagrams.decode(data)
+        aioppspp.validation.set_strict(True)
+        strict = aioppspp.datagrams.decode(data)
+        self.assertEqual(fast, strict)
+        self.assertEqual(fast, datagram)
+        self.assertIsInstance(fast.channel_id, aioppspp.channel_ids.ChannelID)
+        self.assertIsInstance(fast.messages, tuple)
@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+#
+
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import time
+import unittest.mock
+
+import aioppspp.channel_ids
+import aioppspp.connection
+import aioppspp.datagrams
+import aioppspp.ppspp
+import aioppspp.tests.utils
+import aioppspp.workers
+
+
+# Worker targets run in child processes, out of the coverage reach
+
+async def echo(connection, stats):  # pragma: no cover
+    while True:
+        datagram, address = await connection.recv()
+        stats['received'] = stats.get('received', 0) + 1
+        await connection.send(datagram, address)
+
+
+async def crash(connection, stats):  # pragma: no cover
+    os._exit(1)
+
+
+async def crash_later(connection, stats):  # pragma: no cover
+    await asyncio.sleep(0.3)
+    os._exit(1)
+
+
+def free_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+    finally:
+        sock.close()
+
+
+@unittest.skipUnless(hasattr(socket, 'SO_REUSEPORT'),
+                     'SO_REUSEPORT is not supported')
+class SupervisorTestCase(aioppspp.tests.utils.TestCase):
+
+    timeout = 15
+
+    def new_supervisor(self, workers=2, target=echo, **kwargs):
+        address = aioppspp.connection.Address('127.0.0.1', free_port())
+        supervisor = aioppspp.workers.Supervisor(
+            address, target, workers=workers,
+            multiprocessing_context=multiprocessing.get_context('fork'),
+            **kwargs)
+        self.addCleanup(supervisor.stop, 5)
+        return supervisor
+
+    def wait_for_stats(self, supervisor, count):
+        deadline = time.monotonic() + 10
+        stats = supervisor.stats()
+        # Workers usually report in time for the first request
+        while len(stats) != count:  # pragma: no cover
+            self.assertLess(time.monotonic(), deadline,
+                            'workers did not report stats')
+            time.sleep(0.05)
+            stats = supervisor.stats()
+        return stats
+
+    def wait_for_check(self, supervisor):
+        deadline = time.monotonic() + 10
+        # Crashed worker may be already gone by the first check
+        while not supervisor.check():  # pragma: no cover
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+    def test_random_port(self):
+        with self.assertRaises(ValueError):
+            aioppspp.workers.Supervisor(
+                aioppspp.connection.Address('127.0.0.1', 0), echo)
+
+    def test_bad_workers(self):
+        with self.assertRaises(ValueError):
+            aioppspp.workers.Supervisor(
+                aioppspp.connection.Address('127.0.0.1', 1), echo, workers=0)
+
+    def test_defaults(self):
+        supervisor = aioppspp.workers.Supervisor(
+            aioppspp.connection.Address('127.0.0.1', 1), echo)
+        self.assertEqual(len(supervisor), os.cpu_count() or 1)
+        self.assertFalse(supervisor.running)
+        self.assertEqual(supervisor.check(), 0)
+        self.assertEqual(supervisor.stats(), {})
+
+    def test_bad_restart_backoff(self):
+        address = aioppspp.connection.Address('127.0.0.1', 1)
+        with self.assertRaises(ValueError):
+            aioppspp.workers.Supervisor(address, echo, restart_backoff=-1)
+        with self.assertRaises(ValueError):
+            aioppspp.workers.Supervisor(address, echo, restart_backoff=2,
+                                        max_restart_backoff=1)
+
+    async def test_serve(self):
+        supervisor = self.new_supervisor()
+        supervisor.start()
+        self.assertTrue(supervisor.running)
+        with self.assertRaises(RuntimeError):
+            supervisor.start()
+        stats = self.wait_for_stats(supervisor, 2)
+        self.assertEqual(len({item['pid'] for item in stats.values()}), 2)
+
+        connector = aioppspp.ppspp.Connector(loop=self.loop)
+        peers = []
+        for _ in range(8):
+            peers.append(await connector.connect(supervisor.address))
+        for peer in peers:
+            datagram = aioppspp.datagrams.Datagram(
+                aioppspp.channel_ids.new(), [])
+            await peer.send(datagram)
+            result, _ = await peer.recv()
+            self.assertEqual(result, datagram)
+        connector.close()
+
+        stats = supervisor.stats()
+        self.assertEqual(sum(item.get('received', 0)
+                             for item in stats.values()), 8)
+        self.assertTrue(all(item['restarts'] == 0
+                            for item in stats.values()))
+        self.assertEqual(supervisor.check(), 0)
+
+        supervisor.stop(5)
+        self.assertFalse(supervisor.running)
+        self.assertEqual(supervisor.stats(), {})
+        self.assertEqual(supervisor.check(), 0)
+
+    def test_restart_crashed(self):
+        supervisor = self.new_supervisor(1)
+        supervisor.start()
+        pid = self.wait_for_stats(supervisor, 1)[0]['pid']
+        os.kill(pid, signal.SIGKILL)
+        self.wait_for_check(supervisor)
+        self.assertEqual(supervisor.restarts, (1,))
+        stats = self.wait_for_stats(supervisor, 1)
+        self.assertNotEqual(stats[0]['pid'], pid)
+        self.assertEqual(stats[0]['restarts'], 1)
+
+    def test_restart_backoff(self):
+        supervisor = self.new_supervisor(1, crash, restart_backoff=0.2,
+                                         max_restart_backoff=10)
+        supervisor.start()
+        # The first crash is restarted right away
+        self.wait_for_check(supervisor)
+        self.assertEqual(supervisor.restarts, (1,))
+        self.assertEqual(supervisor.pending_restarts, 0)
+
+        # The next one waits for the backoff
+        deadline = time.monotonic() + 10
+        while not supervisor.pending_restarts:
+            self.assertEqual(supervisor.check(), 0)
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+        stats = supervisor.stats()
+        self.assertEqual(stats[0]['restarts'], 1)
+        self.assertGreater(stats[0]['restart_in'], 0.1)
+        crashed_at = time.monotonic()
+        self.wait_for_check(supervisor)
+        self.assertGreaterEqual(time.monotonic() - crashed_at, 0.1)
+        self.assertEqual(supervisor.restarts, (2,))
+        self.assertEqual(supervisor.pending_restarts, 0)
+
+        # and it doubles on each crash
+        while not supervisor.pending_restarts:
+            supervisor.check()
+            time.sleep(0.01)
+        self.assertGreater(supervisor.stats()[0]['restart_in'], 0.3)
+        supervisor.stop(5)
+        self.assertEqual(supervisor.pending_restarts, 0)
+        self.assertEqual(supervisor.stats(), {})
+
+    def test_no_backoff_after_long_run(self):
+        supervisor = self.new_supervisor(1, crash_later,
+                                         restart_backoff=0.2,
+                                         max_restart_backoff=0.2)
+        supervisor.start()
+        deadline = time.monotonic() + 10
+        while supervisor.restarts != (2,):
+            # Each crash comes after a long enough run
+            supervisor.check()
+            self.assertEqual(supervisor.pending_restarts, 0)
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+    def test_stats_unresponsive(self):
+        supervisor = self.new_supervisor(4)
+        late, broken, silent, gone = pipes = [unittest.mock.Mock()
+                                              for _ in range(4)]
+        # Late reply to the previous request is dropped
+        late.poll.side_effect = [True, False, True]
+        late.recv.side_effect = [{'late': True}, {'pid': 1}]
+        broken.poll.return_value = False
+        broken.send.side_effect = OSError
+        silent.poll.return_value = False
+        gone.poll.side_effect = [False, True]
+        gone.recv.side_effect = EOFError
+        supervisor._pipes = pipes
+        supervisor._processes = [unittest.mock.Mock() for _ in pipes]
+        self.assertEqual(supervisor.stats(0), {0: {'pid': 1, 'restarts': 0}})
+        supervisor._processes = [None] * 4
+
+    def test_run_forever(self):
+        supervisor = self.new_supervisor(1)
+        supervisor.start()
+        with unittest.mock.patch('time.sleep',
+                                 side_effect=KeyboardInterrupt) as sleep:
+            supervisor.run_forever(0.5)
+        sleep.assert_called_once_with(0.5)
+        self.assertFalse(supervisor.running)
+
+        supervisor.start()
+        supervisor.check = unittest.mock.Mock(side_effect=supervisor.stop)
+        supervisor.run_forever(0)
+        self.assertFalse(supervisor.running)
+
+
+@unittest.skipUnless(hasattr(socket, 'SO_REUSEPORT'),
+                     'SO_REUSEPORT is not supported')
+class WorkerTestCase(aioppspp.tests.utils.TestCase):
+
+    def tearDown(self):
+        asyncio.set_event_loop(self.loop)
+        super().tearDown()
+
+    def test_run_worker(self):
+        address = aioppspp.connection.Address('127.0.0.1', free_port())
+        pipe, child_pipe = multiprocessing.Pipe()
+        reports = []
+
+        async def target(connection, stats):
+            self.assertEqual(connection.local_address, address)
+            stats['custom'] = 42
+            pipe.send(None)
+            while not pipe.poll():
+                await asyncio.sleep(0.01)
+            reports.append(pipe.recv())
+            # Worker stops reporting once the supervisor is gone
+            pipe.close()
+            await asyncio.sleep(0.05)
+
+        aioppspp.workers._run_worker(address, target, {'maxsize': 8},
+                                     child_pipe)
+        self.assertTrue(child_pipe.closed)
+        report, = reports
+        self.assertEqual(report['custom'], 42)
+        self.assertEqual(report['pid'], os.getpid())
+        self.assertEqual(report['dropped'], 0)
+        self.assertEqual(report['malformed'], 0)
+        self.assertEqual(report['queue_depth'], 0)
+        self.assertIsNone(report['kernel_dropped'])
+
+    def test_report_stats_closed_connection(self):
+        pipe, child_pipe = multiprocessing.Pipe()
+        self.addCleanup(pipe.close)
+        self.addCleanup(child_pipe.close)
+        connection = unittest.mock.Mock(protocol=None)
+        pipe.send(None)
+        aioppspp.workers._report_stats(child_pipe, connection, {'custom': 1})
+        self.assertEqual(pipe.recv(), {'custom': 1, 'pid': os.getpid()})
@@ -14,11 +14,20 @@
 #
 
 import asyncio
+import errno
 import functools
 import socket
 
+from . import sockets
+from .buffers import (
+    MAX_DATAGRAM_SIZE,
+    DatagramQueue,
+    DropPolicy,
+    RecvRing,
+)
 from .connection import (
     Address,
+    intern_address,
 )
 from .connector import (
     BaseProtocol,
@@ -27,20 +36,294 @@ from .connector import (
 
 __all__ = (
     'Connector',
+    'Multiplexer',
     'Protocol',
 )
 
+# Errors which tell that the kernel or the device doesn't support GSO
+_GSO_REFUSED_ERRNOS = frozenset((
+    errno.EINVAL,
+    errno.EIO,
+    errno.ENOPROTOOPT,
+    errno.EOPNOTSUPP,
+))
+
+# Makes the kernel report the real size of the datagram which doesn't fit
+# into the buffer, Linux only
+_MSG_TRUNC = getattr(socket, 'MSG_TRUNC', 0)
+
 
 class Protocol(asyncio.DatagramProtocol, BaseProtocol):
-    """UDP protocol implementation."""
+    """UDP protocol implementation.
+
+    Received datagrams are buffered till :meth:`recv` call. When the buffer
+    is full, datagrams are dropped according to the drop policy.
 
-    def __init__(self, *, loop=None):
+    In handler mode received datagrams are not buffered, but passed to the
+    handler right from :meth:`datagram_received`, in the same event loop
+    iteration. The handler is called with received data and remote peer
+    address and must not block.
+
+    :param int maxsize: Maximum number of buffered datagrams, ``0`` means
+                        no limit
+    :param aioppspp.buffers.DropPolicy drop_policy: What to drop when
+                                                    the buffer is full
+    :param callable handler: Datagrams handler to use instead of buffering
+    :param bool gso: Use UDP generic segmentation offload in
+                     :meth:`send_many` when it is supported
+    :param bool gro: Receive datagrams coalesced by the kernel with UDP
+                     generic receive offload when it is supported. Such
+                     datagrams are passed to :meth:`datagram_received` as
+                     :class:`memoryview` segments of the received data
+    :param int ring_slots: Read datagrams with ``recvfrom_into`` into the
+                           ring of preallocated buffers with that many
+                           slots instead of allocating them per datagram.
+                           Such datagrams are passed to
+                           :meth:`datagram_received` as :class:`memoryview`
+                           of the ring slot, which is valid only during
+                           the call, so the handler must copy what it keeps.
+                           ``0`` disables the ring reader
+    :param int ring_slot_size: Size of each ring slot in bytes. Datagrams
+                               larger than that are dropped and counted by
+                               :attr:`truncated_count`, so it may be lowered
+                               to the path MTU only when peers never send
+                               more
+    :param int reads_per_wakeup: Maximum number of datagrams the ring
+                                 reader drains from the socket at once
+    :param bool rxq_ovfl: Track the number of datagrams dropped by the
+                          kernel with ``SO_RXQ_OVFL``, see
+                          :attr:`kernel_dropped_count`
+    :param int write_high_water: Size of the transport write buffer in
+                                 bytes at which :meth:`send` starts waiting
+    :param int write_low_water: Size of the transport write buffer in bytes
+                                at which waiting :meth:`send` calls resume
+    """
+
+    def __init__(self, *, maxsize=0, drop_policy=DropPolicy.oldest,
+                 handler=None, gso=False, gro=False, ring_slots=0,
+                 ring_slot_size=MAX_DATAGRAM_SIZE, reads_per_wakeup=32,
+                 rxq_ovfl=False, write_high_water=None, write_low_water=None,
+                 loop=None):
         super().__init__(loop=loop)
-        self._buffer = asyncio.Queue()
+        if gro and ring_slots:
+            raise ValueError('GRO and ring reader cannot be used together')
+        if reads_per_wakeup <= 0:
+            raise ValueError('reads per wakeup must be positive')
+        self._buffer = DatagramQueue(maxsize, drop_policy, loop=loop)
+        self._handler = None
+        self.set_handler(handler)
+        self._gso = gso and sockets.gso_supported()
+        self._gso_sends = 0
+        self._gso_segments = 0
+        self._gro = gro and sockets.gso_supported()
+        self._ring = None
+        self._truncated_count = 0
+        if ring_slots:
+            self._ring = RecvRing(ring_slots, ring_slot_size)
+        self._reads_per_wakeup = reads_per_wakeup
+        self._rxq_ovfl = rxq_ovfl
+        self._write_limits = (write_high_water, write_low_water)
+        self._writing_paused = False
+        self._drain_waiter = None
+
+    @property
+    def gso(self):
+        """Tells if generic segmentation offload is in use. It gets turned
+        off once the kernel refuses it."""
+        return self._gso
+
+    @property
+    def gro(self):
+        """Tells if generic receive offload is requested or in use."""
+        return self._gro
+
+    @property
+    def gso_sends(self):
+        """Returns the number of segmented sends."""
+        return self._gso_sends
+
+    @property
+    def gso_segments(self):
+        """Returns the number of datagrams sent by segmented sends."""
+        return self._gso_segments
+
+    @property
+    def handler(self):
+        """Returns datagrams handler or :const:`None` if datagrams are
+        buffered for :meth:`recv`."""
+        return self._handler
+
+    def set_handler(self, handler):
+        """Switches protocol into handler mode.
+
+        Datagrams which are already buffered remain available for
+        :meth:`recv`.
+
+        :param callable handler: Datagrams handler or :const:`None` to
+                                 buffer datagrams for :meth:`recv` again
+        """
+        if handler is not None and not callable(handler):
+            raise TypeError('handler must be callable, got {!r}'
+                            ''.format(handler))
+        self._handler = handler
+
+    @property
+    def dropped_count(self):
+        """Returns the number of datagrams dropped by the full buffer."""
+        return self._buffer.dropped
+
+    @property
+    def truncated_count(self):
+        """Returns the number of datagrams dropped by the ring reader since
+        they didn't fit into the ring slot."""
+        return self._truncated_count
+
+    @property
+    def queue_depth(self):
+        """Returns the number of buffered datagrams."""
+        return len(self._buffer)
+
+    def connection_made(self, transport):
+        """Called when a connection is made."""
+        super().connection_made(transport)
+        if self._write_limits != (None, None):
+            high, low = self._write_limits
+            transport.set_write_buffer_limits(high, low)
+        if self._gro or self._rxq_ovfl or self._ring is not None:
+            # Transport starts reading right after this call, so replace
+            # its reader on the next loop iteration
+            loop = self._loop or asyncio.get_event_loop()
+            loop.call_soon(self._start_reader, loop)
+
+    def connection_lost(self, exc):
+        """Called when the connection is lost or closed."""
+        super().connection_lost(exc)
+        self._writing_paused = False
+        waiter, self._drain_waiter = self._drain_waiter, None
+        if waiter is not None and not waiter.done():
+            waiter.set_exception(ConnectionError('connection lost'))
+
+    def pause_writing(self):
+        """Called when the transport write buffer exceeds the high water
+        mark."""
+        self._writing_paused = True
+
+    def resume_writing(self):
+        """Called when the transport write buffer drains below the low water
+        mark."""
+        self._writing_paused = False
+        waiter, self._drain_waiter = self._drain_waiter, None
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    @property
+    def writing_paused(self):
+        """Tells if the transport write buffer is over the high water mark."""
+        return self._writing_paused
+
+    async def drain(self):
+        """Waits till the transport write buffer drains below the low water
+        mark if writing is paused.
+
+        :raises ConnectionError: If connection is lost meanwhile
+
+        This method is :term:`awaitable`.
+        """
+        if not self._writing_paused:
+            return
+        if self._drain_waiter is None:
+            self._drain_waiter = asyncio.Future(loop=self._loop)
+        # All the senders share the waiter, so shield it from cancellation
+        # of any single one of them
+        await asyncio.shield(self._drain_waiter)
+
+    def _start_reader(self, loop):
+        if self._transport is None:
+            return
+        sock = self._transport._sock
+        if self._gro and not sockets.enable_gro(sock):
+            self._gro = False
+        if self._rxq_ovfl and not sockets.enable_rxq_ovfl(sock):
+            self._rxq_ovfl = False
+        if self._ring is not None:
+            reader = self._read_ring
+        elif self._gro or self._rxq_ovfl:
+            reader = self._read_msg
+        else:
+            return
+        if self._rxq_ovfl:
+            self._kernel_dropped = 0
+        fd = sock.fileno()
+        try:
+            loop.remove_reader(fd)
+            loop.add_reader(fd, reader, sock)
+        except RuntimeError:
+            # Since Python 3.7 public reader methods refuse to touch file
+            # descriptors owned by transports, and datagram transports
+            # have no other way to stop reading
+            loop._remove_reader(fd)
+            loop._add_reader(fd, reader, sock)
+
+    def _read_msg(self, sock):
+        if self._transport is None:
+            return
+        try:
+            segments, addr, dropped = sockets.recv_segments(sock)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as exc:
+            self.error_received(exc)
+            return
+        if dropped is not None:
+            self._kernel_dropped = dropped
+        for data in segments:
+            self.datagram_received(data, addr)
+
+    def _read_ring(self, sock):
+        next_slot = self._ring.next_slot
+        slot_size = self._ring.slot_size
+        recvfrom_into = sock.recvfrom_into
+        rxq_ovfl = self._rxq_ovfl
+        for _ in range(self._reads_per_wakeup):
+            if self._transport is None:
+                return
+            slot = next_slot()
+            try:
+                if rxq_ovfl:
+                    size, ancdata, _, addr = sock.recvmsg_into(
+                        [slot], sockets.ANCBUFSIZE, _MSG_TRUNC)
+                else:
+                    size, addr = recvfrom_into(slot, 0, _MSG_TRUNC)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as exc:
+                self.error_received(exc)
+                return
+            if rxq_ovfl:
+                _, dropped = sockets.parse_ancdata(ancdata)
+                if dropped is not None:
+                    self._kernel_dropped = dropped
+            if size <= slot_size:
+                self.datagram_received(slot[:size], addr)
+            else:
+                self._truncated_count += 1
+
+    def _detach(self, data):
+        # Ring slot will be overwritten by the next reads
+        if self._ring is None:
+            return data
+        return self._ring.detach(data)
+
+    def _enqueue(self, data, addr):
+        self._buffer.put_nowait((self._detach(data), intern_address(addr)))
 
     def datagram_received(self, data, addr):
         """Called when some datagram is received."""
-        self._buffer.put_nowait((data, Address(*addr)))
+        handler = self._handler
+        if handler is None:
+            self._enqueue(data, addr)
+        else:
+            handler(data, intern_address(addr))
 
     async def recv(self):
         """Receives datagram from remote Peer.
@@ -52,40 +335,447 @@ class Protocol(asyncio.DatagramProtocol, BaseProtocol):
         """
         return await self._buffer.get()
 
+    async def recv_many(self, max_count, timeout=None):
+        """Receives all the buffered datagrams, but no more than
+        `max_count`, at once. Waits for the first datagram no longer than
+        `timeout` seconds if there are none buffered.
+
+        :param int max_count: Maximum number of datagrams to receive
+        :param float timeout: Seconds to wait for, :const:`None` means
+                              no limit
+        :returns: List of pairs of received data and remote peer address,
+                  empty one on timeout
+        :rtype: list
+
+        This method is :term:`awaitable`.
+        """
+        return await self._buffer.get_many(max_count, timeout)
+
     async def send(self, data, remote_address=None):
         """Sends datagram to remote peer.
 
+        Waits for the transport write buffer to drain if writing is paused.
+
         :param bytes data: Data to send
         :param aioppspp.connection.Address remote_address: Recipient address
 
         This method is :term:`awaitable`.
         """
+        await self.drain()
         self._transport.sendto(data, remote_address)
 
+    def send_nowait(self, data, remote_address=None):
+        """Sends datagram to remote peer without waiting for the transport
+        write buffer to drain, which is then growing unbounded.
+
+        :param bytes data: Data to send
+        :param aioppspp.connection.Address remote_address: Recipient address
+        """
+        self._transport.sendto(data, remote_address)
+
+    async def send_many(self, datagrams, remote_address=None):
+        """Sends a sequence of datagrams to remote peer.
+
+        With GSO enabled runs of equally sized datagrams are passed to the
+        kernel with a single system call. If the kernel refuses that, GSO
+        gets turned off and datagrams are sent one by one.
+
+        :param list datagrams: Data to send
+        :param aioppspp.connection.Address remote_address: Recipient address
+
+        This method is :term:`awaitable`.
+        """
+        await self.drain()
+        transport = self._transport
+        if not self._gso or transport.get_write_buffer_size():
+            # Keep the order of datagrams buffered by the transport
+            for data in datagrams:
+                transport.sendto(data, remote_address)
+            return
+        sock = transport._sock
+        for segment_size, batch in sockets.gso_batches(datagrams):
+            # Once some batch is buffered, the rest must queue behind it
+            if (self._gso and len(batch) > 1
+                    and not transport.get_write_buffer_size()):
+                try:
+                    sockets.send_segments(sock, segment_size, batch,
+                                          remote_address)
+                except (BlockingIOError, InterruptedError):
+                    pass
+                except OSError as exc:
+                    if exc.errno in _GSO_REFUSED_ERRNOS:
+                        self._gso = False
+                else:
+                    self._gso_sends += 1
+                    self._gso_segments += len(batch)
+                    continue
+            # Transport buffers the data or reports the error as usual
+            for data in batch:
+                transport.sendto(data, remote_address)
+
+
+class Multiplexer(Protocol):
+    """Protocol of the unconnected UDP socket shared by many remote peers.
+
+    Each remote peer is served by its own protocol, which is attached to
+    the multiplexer with a virtual transport bound to the peer address.
+    Datagrams received by the socket are routed to these protocols by the
+    source address, the ones from unknown peers are dropped and counted by
+    :attr:`unrouted_count`. Protocols may use neither GRO nor ring reader
+    themselves, the multiplexer reads the socket for them.
+
+    Accepts the same parameters as :class:`Protocol`.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._routes = {}
+        self._unrouted_count = 0
+
+    def __contains__(self, address):
+        return address in self._routes
+
+    def __len__(self):
+        return len(self._routes)
+
+    @property
+    def unrouted_count(self):
+        """Returns the number of dropped datagrams from unknown peers."""
+        return self._unrouted_count
+
+    def attach(self, remote_address, protocol):
+        """Attaches protocol which serves the specified remote peer.
+
+        :param aioppspp.connection.Address remote_address: Remote peer address
+        :param Protocol protocol: Protocol to route datagrams of the peer to
+        :raises ValueError: If some protocol is already attached for the peer
+        """
+        if self._transport is None:
+            raise ConnectionError('multiplexer is closed')
+        if remote_address in self._routes:
+            raise ValueError('{} is already attached'.format(remote_address))
+        self._routes[remote_address] = protocol
+        protocol.connection_made(_BoundTransport(self, remote_address))
+        if self._writing_paused:
+            protocol.pause_writing()
+
+    def detach(self, remote_address):
+        """Detaches protocol of the specified remote peer if there is any.
+
+        :param aioppspp.connection.Address remote_address: Remote peer address
+        """
+        self._routes.pop(remote_address, None)
+
+    def datagram_received(self, data, addr):
+        """Called when some datagram is received."""
+        address = intern_address(addr)
+        protocol = self._routes.get(address)
+        if protocol is None:
+            self._unrouted_count += 1
+            return
+        protocol.datagram_received(self._detach(data), address)
+
+    def connection_lost(self, exc):
+        """Called when the connection is lost or closed."""
+        super().connection_lost(exc)
+        routes, self._routes = self._routes, {}
+        for protocol in routes.values():
+            protocol.connection_lost(exc)
+
+    def pause_writing(self):
+        """Called when the transport write buffer exceeds the high water
+        mark."""
+        super().pause_writing()
+        for protocol in self._routes.values():
+            protocol.pause_writing()
+
+    def resume_writing(self):
+        """Called when the transport write buffer drains below the low water
+        mark."""
+        super().resume_writing()
+        for protocol in list(self._routes.values()):
+            protocol.resume_writing()
+
+
+class _BoundSocket(object):
+    # Unconnected socket which looks like the one connected to single peer
+
+    def __init__(self, sock, remote_address):
+        self._sock = sock
+        self._remote_address = remote_address
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
+    def getpeername(self):
+        return self._remote_address
+
+    def sendmsg(self, buffers, ancdata=(), flags=0, address=None):
+        if address is None:
+            address = self._remote_address
+        return self._sock.sendmsg(buffers, ancdata, flags, address)
+
+
+class _BoundTransport(asyncio.DatagramTransport):
+    # Virtual transport of the multiplexed socket bound to single peer
+
+    def __init__(self, multiplexer, remote_address):
+        super().__init__({'peername': remote_address})
+        self._multiplexer = multiplexer
+        self._transport = multiplexer.transport
+        self._sock = _BoundSocket(self._transport._sock, remote_address)
+        self._remote_address = remote_address
+        self._closing = False
+
+    def get_extra_info(self, name, default=None):
+        if name == 'socket':
+            return self._sock
+        if name in self._extra:
+            return self._extra[name]
+        return self._transport.get_extra_info(name, default)
+
+    def is_closing(self):
+        if self._closing or self._multiplexer.closed:
+            return True
+        # Transports have no is_closing() before Python 3.5.1
+        is_closing = getattr(self._transport, 'is_closing', None)
+        return is_closing is not None and is_closing()
+
+    def close(self):
+        if self._closing:
+            return
+        self._closing = True
+        multiplexer = self._multiplexer
+        protocol = multiplexer._routes.get(self._remote_address)
+        multiplexer.detach(self._remote_address)
+        if protocol is not None:
+            loop = multiplexer._loop or asyncio.get_event_loop()
+            loop.call_soon(protocol.connection_lost, None)
+
+    def abort(self):
+        self.close()
+
+    def sendto(self, data, addr=None):
+        if self._closing:
+            return
+        if addr is None:
+            addr = self._remote_address
+        self._transport.sendto(data, addr)
+
+    def get_write_buffer_size(self):
+        return self._transport.get_write_buffer_size()
+
+    def get_write_buffer_limits(self):
+        return self._transport.get_write_buffer_limits()
+
+    def set_write_buffer_limits(self, high=None, low=None):
+        # Limits belong to the shared transport
+        pass
+
 
 class Connector(BaseConnector):
-    """UDP connector."""
+    """UDP connector.
+
+    In shared sockets mode outgoing connections don't get their own
+    sockets. Instead, they are attached to one of a few unconnected
+    sockets by means of :class:`Multiplexer`, which routes received
+    datagrams to connections by the source address, so connections must
+    be made to IP addresses rather than host names. Each socket serves a
+    single connection to the same peer at a time, so once all of them
+    are taken by connections to some peer, further connections to it get
+    dedicated sockets.
+
+    :param int maxsize: Maximum number of datagrams buffered by each
+                        endpoint, ``0`` means no limit
+    :param aioppspp.buffers.DropPolicy drop_policy: What to drop when
+                                                    the buffer is full
+    :param bool gso: Use UDP generic segmentation offload for batched
+                     sends on Linux
+    :param bool gro: Use UDP generic receive offload on Linux
+    :param int ring_slots: Number of slots in the preallocated receive ring
+                           of each endpoint, ``0`` disables the ring reader
+    :param int ring_slot_size: Size of each receive ring slot in bytes,
+                               larger datagrams are truncated
+    :param int reads_per_wakeup: Maximum number of datagrams the ring
+                                 reader drains from the socket at once
+    :param bool rxq_ovfl: Track the number of datagrams dropped by the
+                          kernel on each endpoint
+    :param aioppspp.sockets.SocketOptions socket_options: Default tuning
+                                                          options of the
+                                                          endpoint sockets
+    :param int write_high_water: Size of the endpoint write buffer in bytes
+                                 at which sends start waiting
+    :param int write_low_water: Size of the endpoint write buffer in bytes
+                                at which sends resume
+    :param int shared_sockets: Number of unconnected sockets shared by
+                               outgoing connections, ``0`` gives each
+                               connection its own socket
+    """
 
     #: UDP protocol implementation
     protocol_class = Protocol
+    #: Shared socket protocol implementation
+    multiplexer_class = Multiplexer
+
+    def __init__(self, *, maxsize=0, drop_policy=DropPolicy.oldest,
+                 gso=False, gro=False, ring_slots=0,
+                 ring_slot_size=MAX_DATAGRAM_SIZE, reads_per_wakeup=32,
+                 rxq_ovfl=False, socket_options=None, write_high_water=None,
+                 write_low_water=None, shared_sockets=0, **kwargs):
+        if shared_sockets < 0:
+            raise ValueError('number of shared sockets must not be negative')
+        super().__init__(**kwargs)
+        self._maxsize = maxsize
+        self._drop_policy = DropPolicy(drop_policy)
+        self._gso = gso
+        self._gro = gro
+        self._ring_slots = ring_slots
+        self._ring_slot_size = ring_slot_size
+        self._reads_per_wakeup = reads_per_wakeup
+        self._rxq_ovfl = rxq_ovfl
+        self._socket_options = socket_options
+        self._write_limits = (write_high_water, write_low_water)
+        self._shared_sockets = shared_sockets
+        self._multiplexers = {}
+        self._multiplexers_lock = asyncio.Lock(loop=self._loop)
+
+    @property
+    def shared_sockets(self):
+        """Returns the number of sockets shared by outgoing connections."""
+        return self._shared_sockets
+
+    @property
+    def multiplexers(self):
+        """Returns protocols of the open shared sockets."""
+        return [multiplexer
+                for multiplexers in self._multiplexers.values()
+                for multiplexer in multiplexers
+                if not multiplexer.closed]
+
+    def close(self):
+        """Closes connector, all served connections and shared sockets."""
+        closed = self.closed
+        try:
+            super().close()
+        finally:
+            if not closed and not self._loop.is_closed():
+                for multiplexer in self.multiplexers:
+                    multiplexer.close()
+            self._multiplexers.clear()
+
+    def multiplexer_factory(self) -> functools.partial:
+        """Produces factory for shared socket protocol."""
+        return functools.partial(self.multiplexer_class,
+                                 gro=self._gro,
+                                 ring_slots=self._ring_slots,
+                                 ring_slot_size=self._ring_slot_size,
+                                 reads_per_wakeup=self._reads_per_wakeup,
+                                 rxq_ovfl=self._rxq_ovfl,
+                                 write_high_water=self._write_limits[0],
+                                 write_low_water=self._write_limits[1],
+                                 loop=self._loop)
 
     def protocol_factory(self) -> functools.partial:
         """Produces factory for protocol implementation."""
-        return functools.partial(self.protocol_class, loop=self._loop)
+        return functools.partial(self.protocol_class,
+                                 maxsize=self._maxsize,
+                                 drop_policy=self._drop_policy,
+                                 gso=self._gso,
+                                 gro=self._gro,
+                                 ring_slots=self._ring_slots,
+                                 ring_slot_size=self._ring_slot_size,
+                                 reads_per_wakeup=self._reads_per_wakeup,
+                                 rxq_ovfl=self._rxq_ovfl,
+                                 write_high_water=self._write_limits[0],
+                                 write_low_water=self._write_limits[1],
+                                 loop=self._loop)
 
     async def create_endpoint(self, local_address=None, remote_address=None, *,
-                              family=socket.AF_INET):
+                              family=socket.AF_INET, reuse_port=None,
+                              socket_options=None):
         """Creates datagram endpoint.
 
         :param aioppspp.connection.Address local_address: Local peer address
         :param aioppspp.connection.Address remote_address: Remote peer address
         :param socket.AddressFamily family: Socket address family
+        :param bool reuse_port: Allow other endpoints to bind the same local
+                                address with ``SO_REUSEPORT``, so the kernel
+                                spreads incoming datagrams between them
+        :param aioppspp.sockets.SocketOptions socket_options: Socket tuning
+                                                              options,
+                                                              connector ones
+                                                              by default
+        :raises OSError: If socket options cannot be set
+
+        In shared sockets mode the endpoint for the remote peer is attached
+        to a shared socket, which is created with the connector options.
+        Such endpoints accept neither `reuse_port` nor `socket_options`.
+        If every shared socket already serves the remote peer, the endpoint
+        gets a dedicated socket instead.
+
+        :raises ValueError: If `reuse_port` or `socket_options` is given
+                            for the shared socket endpoint
 
         This method is :term:`awaitable`.
         """
-        _, protocol = await self._loop.create_datagram_endpoint(
+        if (self._shared_sockets and remote_address is not None
+                and local_address is None):
+            if reuse_port is not None or socket_options is not None:
+                raise ValueError('shared sockets use the connector options,'
+                                 ' reuse_port and socket_options cannot be'
+                                 ' set per connection')
+            protocol = await self._attach_endpoint(remote_address, family)
+            if protocol is not None:
+                return protocol
+        transport, protocol = await self._loop.create_datagram_endpoint(
             self.protocol_factory(),
             family=family,
             local_addr=local_address,
-            remote_addr=remote_address)
+            remote_addr=remote_address,
+            reuse_port=reuse_port)
+        self._apply_socket_options(transport, socket_options)
+        return protocol
+
+    def _apply_socket_options(self, transport, socket_options):
+        if socket_options is None:
+            socket_options = self._socket_options
+        if socket_options is not None:
+            sock = transport.get_extra_info('socket')
+            try:
+                sockets.apply_socket_options(sock, socket_options)
+            except OSError:
+                transport.close()
+                raise
+
+    async def _attach_endpoint(self, remote_address, family):
+        remote_address = Address(*remote_address[:2])
+        multiplexers = [multiplexer
+                        for multiplexer in await self._get_multiplexers(family)
+                        if remote_address not in multiplexer]
+        if not multiplexers:
+            return None
+        multiplexer = min(multiplexers, key=len)
+        # Multiplexer reads the socket on behalf of the endpoint
+        protocol = self.protocol_factory()(gro=False, ring_slots=0,
+                                           rxq_ovfl=False)
+        multiplexer.attach(remote_address, protocol)
         return protocol
+
+    async def _get_multiplexers(self, family):
+        async with self._multiplexers_lock:
+            multiplexers = self._multiplexers.setdefault(family, [])
+            multiplexers[:] = [multiplexer for multiplexer in multiplexers
+                               if not multiplexer.closed]
+            while len(multiplexers) < self._shared_sockets:
+                if family == socket.AF_INET6:
+                    local_address = ('::', 0)
+                else:
+                    local_address = ('0.0.0.0', 0)
+                endpoint = self._loop.create_datagram_endpoint(
+                    self.multiplexer_factory(),
+                    family=family,
+                    local_addr=local_address)
+                transport, multiplexer = await endpoint
+                self._apply_socket_options(transport, None)
+                multiplexers.append(multiplexer)
+            return multiplexers
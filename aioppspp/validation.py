@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+#
+
+"""Validation mode of the codec records.
+
+Records like :class:`~aioppspp.datagrams.Datagram` or
+:class:`~aioppspp.messages.protocol_options.ProtocolOptions` validate and
+cast their fields on construction. Decoders build records from the values
+which are already validated while parsing, so they use trusted constructors
+which skip these checks.
+
+In strict mode trusted constructors fall back to the regular ones, so
+decoded records get validated the same way as the user-made ones. This is
+useful to debug codecs. User-facing construction is always strict.
+"""
+
+__all__ = (
+    'is_strict',
+    'set_strict',
+)
+
+_strict = False
+
+
+def is_strict():
+    """Returns :const:`True` if strict validation mode is enabled.
+
+    :rtype: bool
+    """
+    return _strict
+
+
+def set_strict(strict=True):
+    """Enables or disables strict validation mode globally.
+
+    :param bool strict: Whenever decoded records should be validated
+    """
+    global _strict
+    _strict = bool(strict)
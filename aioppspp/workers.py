@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+#
+
+"""Multi-process PPSPP server.
+
+Each worker process runs its own event loop with its own
+:class:`aioppspp.ppspp.Connector` and listens on the same address with
+``SO_REUSEPORT``, so the kernel spreads remote peers between the workers by
+the flow hash. The :class:`Supervisor` starts the workers, restarts the
+crashed ones and collects their statistics. Workers which keep crashing
+right after the start are restarted with exponential backoff.
+
+The worker target is a coroutine function which receives the listening
+:class:`aioppspp.connection.Connection` and a :class:`dict` of custom
+statistics to fill::
+
+    async def serve(connection, stats):
+        while True:
+            datagram, address = await connection.recv()
+            stats['received'] = stats.get('received', 0) + 1
+            ...
+
+    supervisor = Supervisor(Address('0.0.0.0', 7777), serve, workers=4)
+    supervisor.start()
+    supervisor.run_forever()
+"""
+
+import asyncio
+import multiprocessing
+import os
+import time
+
+from . import ppspp
+
+__all__ = (
+    'Supervisor',
+)
+
+
+class Supervisor(object):
+    """Starts and watches worker processes which serve the same address.
+
+    :param aioppspp.connection.Address address: Address to listen on. Port
+                                                must be set explicitly
+    :param target: Coroutine function to run in each worker
+    :param int workers: Number of worker processes, defaults to the number
+                        of CPUs
+    :param dict connector_options: Keyword arguments for
+                                   :class:`aioppspp.ppspp.Connector`
+    :param multiprocessing_context: Context to create processes with,
+                                    see :func:`multiprocessing.get_context`
+    :param float restart_backoff: Seconds to wait before restarting the
+                                  worker which has crashed again right
+                                  after the previous restart. The delay
+                                  doubles on each such crash
+    :param float max_restart_backoff: Upper limit of the restart delay.
+                                      Worker which has run this long
+                                      before the crash is restarted
+                                      immediately
+    """
+
+    def __init__(self, address, target, *, workers=None,
+                 connector_options=None, multiprocessing_context=None,
+                 restart_backoff=1.0, max_restart_backoff=60.0):
+        if not address[1]:
+            raise ValueError('workers cannot share random port')
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers <= 0:
+            raise ValueError('number of workers must be positive')
+        if restart_backoff < 0 or max_restart_backoff < restart_backoff:
+            raise ValueError('restart backoff must be in range'
+                             ' [0, max_restart_backoff]')
+        if multiprocessing_context is None:
+            multiprocessing_context = multiprocessing.get_context()
+        self._address = address
+        self._target = target
+        self._connector_options = connector_options or {}
+        self._context = multiprocessing_context
+        self._processes = [None] * workers
+        self._pipes = [None] * workers
+        self._restarts = [0] * workers
+        self._restart_backoff = restart_backoff
+        self._max_restart_backoff = max_restart_backoff
+        # Start times of the workers, consecutive crashes right after the
+        # start and times of the delayed restarts
+        self._started_at = [None] * workers
+        self._crashes = [0] * workers
+        self._restart_at = [None] * workers
+        self._running = False
+
+    def __len__(self):
+        return len(self._processes)
+
+    @property
+    def address(self):
+        """Address the workers listen on."""
+        return self._address
+
+    @property
+    def running(self):
+        """Tells if the workers are started."""
+        return self._running
+
+    @property
+    def restarts(self):
+        """Returns the number of restarts of each worker."""
+        return tuple(self._restarts)
+
+    @property
+    def pending_restarts(self):
+        """Returns the number of crashed workers waiting for the restart
+        backoff to expire."""
+        return sum(1 for restart_at in self._restart_at
+                   if restart_at is not None)
+
+    def start(self):
+        """Starts the worker processes."""
+        if self._running:
+            raise RuntimeError('workers are already started')
+        self._running = True
+        for index in range(len(self._processes)):
+            self._spawn(index)
+
+    def stop(self, timeout=None):
+        """Terminates the worker processes and waits for them to exit.
+
+        :param float timeout: Seconds to wait for each worker
+        """
+        self._running = False
+        for process in self._processes:
+            if process is not None and process.is_alive():
+                process.terminate()
+        for index, process in enumerate(self._processes):
+            if process is not None:
+                process.join(timeout)
+            if self._pipes[index] is not None:
+                self._pipes[index].close()
+        self._processes = [None] * len(self._processes)
+        self._pipes = [None] * len(self._pipes)
+        self._restart_at = [None] * len(self._restart_at)
+
+    def check(self):
+        """Restarts the workers which have crashed.
+
+        Workers which target has returned normally are not restarted.
+        A worker which crashes again before running for
+        `max_restart_backoff` seconds is restarted after the backoff delay
+        by one of the later checks.
+
+        :returns: Number of restarted workers
+        :rtype: int
+        """
+        if not self._running:
+            return 0
+        now = time.monotonic()
+        return sum(self._check_worker(index, now)
+                   for index in range(len(self._processes)))
+
+    def _check_worker(self, index, now):
+        # Returns True if the worker is restarted
+        process = self._processes[index]
+        if process is None:
+            if self._restart_at[index] > now:
+                return False
+            self._restart_at[index] = None
+        elif process.is_alive() or process.exitcode == 0:
+            return False
+        else:
+            process.join()
+            self._pipes[index].close()
+            self._processes[index] = self._pipes[index] = None
+            delay = self._next_backoff(index, now)
+            if delay:
+                self._restart_at[index] = now + delay
+                return False
+        self._restarts[index] += 1
+        self._spawn(index)
+        return True
+
+    def _next_backoff(self, index, now):
+        uptime = now - self._started_at[index]
+        if uptime >= self._max_restart_backoff:
+            self._crashes[index] = 0
+        crashes = self._crashes[index]
+        self._crashes[index] += 1
+        if not crashes:
+            return 0
+        return min(self._restart_backoff * 2 ** (crashes - 1),
+                   self._max_restart_backoff)
+
+    def run_forever(self, interval=1.0):
+        """Watches the workers and restarts the crashed ones till
+        :meth:`stop` call or keyboard interrupt.
+
+        :param float interval: Seconds between checks
+        """
+        try:
+            while self._running:
+                self.check()
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stats(self, timeout=1.0):
+        """Collects statistics of the running workers.
+
+        Each worker reports its process ID, the number of restarts, receive
+        buffer counters and the custom statistics set by the target.
+        Workers which wait for the restart report just the number of
+        restarts and the seconds left till the next one as
+        ``restart_in``. Workers which don't respond in time are omitted.
+
+        :param float timeout: Seconds to wait for each worker
+        :returns: Mapping of worker index to its statistics
+        :rtype: dict
+        """
+        pipes = {}
+        for index, pipe in enumerate(self._pipes):
+            process = self._processes[index]
+            if (process is not None and process.is_alive()
+                    and _request_stats(pipe)):
+                pipes[index] = pipe
+        result = {}
+        deadline = time.monotonic() + timeout
+        for index, pipe in pipes.items():
+            try:
+                if not pipe.poll(max(0, deadline - time.monotonic())):
+                    continue
+                stats = pipe.recv()
+            except (EOFError, OSError):
+                continue
+            stats['restarts'] = self._restarts[index]
+            result[index] = stats
+        now = time.monotonic()
+        for index, restart_at in enumerate(self._restart_at):
+            if restart_at is not None:
+                result[index] = {'restarts': self._restarts[index],
+                                 'restart_in': max(0, restart_at - now)}
+        return result
+
+    def _spawn(self, index):
+        parent_pipe, child_pipe = self._context.Pipe()
+        process = self._context.Process(
+            target=_run_worker,
+            args=(self._address, self._target, self._connector_options,
+                  child_pipe),
+            name='aioppspp-worker-{}'.format(index),
+            daemon=True)
+        process.start()
+        child_pipe.close()
+        self._processes[index] = process
+        self._pipes[index] = parent_pipe
+        self._started_at[index] = time.monotonic()
+
+
+def _request_stats(pipe):
+    try:
+        # Drop late replies to the previous requests
+        while pipe.poll():
+            pipe.recv()
+        pipe.send(None)
+    except (EOFError, OSError):
+        return False
+    return True
+
+
+def _run_worker(address, target, connector_options, pipe):
+    # Worker process entry point
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    connector = ppspp.Connector(loop=loop, **connector_options)
+    try:
+        connection = loop.run_until_complete(
+            connector.listen(address, reuse_port=True))
+        stats = {}
+        loop.add_reader(pipe.fileno(), _report_stats, pipe, connection, stats)
+        try:
+            loop.run_until_complete(target(connection, stats))
+        finally:
+            loop.remove_reader(pipe.fileno())
+            connection.close()
+    finally:
+        connector.close()
+        loop.close()
+        pipe.close()
+
+
+def _report_stats(pipe, connection, stats):
+    try:
+        pipe.recv()
+    except EOFError:
+        # Supervisor is gone
+        asyncio.get_event_loop().remove_reader(pipe.fileno())
+        return
+    protocol = connection.protocol
+    report = dict(stats)
+    report['pid'] = os.getpid()
+    if protocol is not None:
+        report['dropped'] = protocol.dropped_count
+        report['malformed'] = protocol.malformed_count
+        report['queue_depth'] = protocol.queue_depth
+        report['kernel_dropped'] = protocol.kernel_dropped_count
+    pipe.send(report)
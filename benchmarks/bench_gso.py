@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+#
+
+"""Compares batched sends over loopback with and without UDP generic
+segmentation offload.
+
+Reports the number of send system calls and the elapsed time for sending
+the same amount of equally sized datagrams.
+
+Usage::
+
+    python benchmarks/bench_gso.py [datagrams] [size]
+"""
+
+import asyncio
+import sys
+import time
+
+import aioppspp.connection
+import aioppspp.udp
+
+
+async def run(loop, gso, count, size, batch_size=64):
+    connector = aioppspp.udp.Connector(gso=gso, loop=loop)
+    server = await connector.listen(
+        aioppspp.connection.Address('127.0.0.1', 0))
+    client = await connector.connect(server.local_address)
+    batch = [b'x' * size] * batch_size
+
+    sent = received = 0
+    started = time.perf_counter()
+    for _ in range(count // batch_size):
+        await client.send_many(batch)
+        sent += batch_size
+        # Drain the receiver to keep the socket buffer from overflowing
+        while received < sent:
+            items = await server.recv_many(batch_size, 1)
+            if not items:
+                # Some datagrams were lost
+                break
+            received += len(items)
+    elapsed = time.perf_counter() - started
+
+    protocol = client.protocol
+    if protocol.gso:
+        syscalls = protocol.gso_sends + sent - protocol.gso_segments
+    else:
+        syscalls = sent
+    connector.close()
+    return sent, received, syscalls, elapsed
+
+
+def main(count, size):
+    loop = asyncio.new_event_loop()
+    for gso in (False, True):
+        sent, received, syscalls, elapsed = loop.run_until_complete(
+            run(loop, gso, count, size))
+        sys.stdout.write(
+            'gso={!s:<5} sent={} received={} syscalls={} {:.3f} sec\n'
+            ''.format(gso, sent, received, syscalls, elapsed))
+    loop.close()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 64000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 1200)
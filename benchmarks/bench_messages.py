@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+#
+
+"""Measures per-message dispatch cost of the messages codec.
+
+The "legacy" variants reproduce the former dispatching which built handlers
+mapping and MessageType enum object for every message. The "registry"
+variants use the module-level codec tables. The "dispatch only" cases
+swap the HANDSHAKE decoder for a no-op one to leave the dispatch cost alone.
+
+Usage::
+
+    python benchmarks/bench_messages.py [number]
+"""
+
+import contextlib
+import sys
+import timeit
+from itertools import (
+    chain,
+)
+
+import aioppspp.channel_ids
+import aioppspp.messages
+from aioppspp.constants import (
+    BYTE,
+)
+from aioppspp.messages import (
+    MessageType,
+    handshake,
+)
+from aioppspp.messages.protocol_options import (
+    ProtocolOptions,
+)
+
+
+def legacy_decode_message(data):
+    handlers = {MessageType.HANDSHAKE: handshake.decode}
+    return handlers[MessageType(data[0])](data[BYTE:])
+
+
+def legacy_encode_message(message):
+    handlers = {MessageType.HANDSHAKE: handshake.encode}
+    return bytearray(chain.from_iterable([
+        [message.type.value],
+        handlers[message.type](message),
+    ]))
+
+
+def noop_decode(data):
+    return None, data
+
+
+def noop_decode_from(data, offset):
+    return None, offset
+
+
+@contextlib.contextmanager
+def noop_decoder(msgtype):
+    messages = aioppspp.messages
+    codecs = (messages._decoders[msgtype],
+              messages._encoders[msgtype],
+              messages._encoders_into[msgtype],
+              messages._skippers[msgtype])
+    messages.register(msgtype, noop_decode_from, *codecs[1:])
+    try:
+        yield
+    finally:
+        messages.register(msgtype, *codecs)
+
+
+def legacy_dispatch(data):
+    handlers = {MessageType.HANDSHAKE: noop_decode}
+    return handlers[MessageType(data[0])](data[BYTE:])
+
+
+def registry_dispatch(data):
+    return aioppspp.messages.decode_message(data)
+
+
+def run(cases, number):
+    for name, func in cases:
+        elapsed = min(timeit.repeat(func, number=number, repeat=5))
+        sys.stdout.write('{:<28} {:>8.3f} usec/message\n'.format(
+            name, elapsed / number * 1e6))
+
+
+def main(number):
+    message = handshake.new(aioppspp.channel_ids.new(),
+                            ProtocolOptions(version=1,
+                                            minimum_version=1,
+                                            swarm_identifier=b'swarm',
+                                            chunk_size=1024))
+    data = memoryview(aioppspp.messages.encode_message(message))
+
+    with noop_decoder(MessageType.HANDSHAKE):
+        run([
+            ('dispatch only (legacy)',
+             lambda: legacy_dispatch(data)),
+            ('dispatch only (registry)',
+             lambda: registry_dispatch(data)),
+        ], number)
+    run([
+        ('decode_message (legacy)',
+         lambda: legacy_decode_message(data)),
+        ('decode_message (registry)',
+         lambda: aioppspp.messages.decode_message(data)),
+        ('encode_message (legacy)',
+         lambda: legacy_encode_message(message)),
+        ('encode_message (registry)',
+         lambda: aioppspp.messages.encode_message(message)),
+    ], number)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)